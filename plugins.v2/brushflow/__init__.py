@@ -4,6 +4,7 @@ import random
 import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from typing import Any, List, Dict, Tuple, Optional, Union, Set
 from urllib.parse import urlparse, parse_qs, unquote, parse_qsl, urlencode, urlunparse
@@ -13,7 +14,6 @@ from app.helper.sites import SitesHelper
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from app import schemas
 from app.chain.torrents import TorrentsChain
 from app.core.config import settings
 from app.core.context import MediaInfo
@@ -25,12 +25,20 @@ from app.log import logger
 from app.modules.qbittorrent import Qbittorrent
 from app.modules.transmission import Transmission
 from app.plugins import _PluginBase
+from app.plugins.brushflow.bandwidth_sampler import BandwidthSampler
+from app.plugins.brushflow.subscribe_matcher import SubscribeMatcher
+from app.plugins.brushflow.task_store import BrushTaskStore
+from app.plugins.brushflow.torrent_sync import TorrentStateSync
 from app.schemas import NotificationType, TorrentInfo, MediaType, ServiceInfo
 from app.schemas.types import EventType
 from app.utils.http import RequestUtils
 from app.utils.string import StringUtils
 
-lock = threading.Lock()
+# 刷流与检查分别使用独立的锁，慢速的站点获取不会阻塞删种检查
+brush_lock = threading.Lock()
+check_lock = threading.Lock()
+# 任务存储的读取、提交以及保种体积等容量计算共用的临界区
+task_lock = threading.RLock()
 
 
 class BrushConfig:
@@ -50,6 +58,8 @@ class BrushConfig:
         self.maxupspeed = self.__parse_number(config.get("maxupspeed"))
         self.maxdlspeed = self.__parse_number(config.get("maxdlspeed"))
         self.maxdlcount = self.__parse_number(config.get("maxdlcount"))
+        self.bandwidth_window = self.__parse_number(config.get("bandwidth_window"))
+        self.bandwidth_stale = self.__parse_number(config.get("bandwidth_stale"))
         self.include = config.get("include")
         self.exclude = config.get("exclude")
         self.size = config.get("size")
@@ -66,6 +76,7 @@ class BrushConfig:
         self.up_speed = self.__parse_number(config.get("up_speed"))
         self.dl_speed = self.__parse_number(config.get("dl_speed"))
         self.auto_archive_days = self.__parse_number(config.get("auto_archive_days"))
+        self.archive_retention_days = self.__parse_number(config.get("archive_retention_days"))
         self.save_path = config.get("save_path")
         self.clear_task = config.get("clear_task", False)
         self.delete_except_tags = config.get("delete_except_tags")
@@ -241,6 +252,140 @@ class BrushConfig:
         return self.__str__()
 
 
+class BrushRulePlan:
+    """
+    站点刷流规则，根据BrushConfig预先解析数值范围并编译正则，刷流过程中只读
+    """
+    __slots__ = ("freeleech", "hr", "include", "exclude", "size", "seeder", "pubtime", "error")
+
+    def __init__(self, config: BrushConfig):
+        self.freeleech = config.freeleech
+        self.hr = config.hr
+        self.error = None
+        self.include = self.__compile(config.include, "包含规则")
+        self.exclude = self.__compile(config.exclude, "排除规则")
+        self.size = self.__parse_range(config.size, 1024 ** 3)
+        self.seeder = self.__parse_range(config.seeder)
+        self.pubtime = self.__parse_range(config.pubtime)
+
+    def __compile(self, pattern: Optional[str], desc: str) -> Optional[re.Pattern]:
+        if not pattern:
+            return None
+        try:
+            return re.compile(pattern, re.I)
+        except re.error as e:
+            # 规则无效时不再刷流该站点的种子，避免误下载
+            self.error = f"{desc}配置错误"
+            logger.error(f"站点刷流{desc} {pattern} 配置错误，错误详情: {e}")
+            return None
+
+    @staticmethod
+    def __parse_range(value: Optional[str], unit: float = 1) -> Optional[Tuple[float, ...]]:
+        if not value:
+            return None
+        return tuple(float(n) * unit for n in str(value).split("-"))
+
+    def evaluate(self, torrent: TorrentInfo, pubdate_minutes: float = 0) -> Tuple[bool, Optional[str]]:
+        """
+        过滤不符合条件的种子
+        """
+        if self.error:
+            return False, self.error
+
+        # 促销条件
+        if self.freeleech and torrent.downloadvolumefactor != 0:
+            return False, "非免费种子"
+        if self.freeleech == "2xfree" and torrent.uploadvolumefactor != 2:
+            return False, "非双倍上传种子"
+
+        # H&R
+        if self.hr == "yes" and torrent.hit_and_run:
+            return False, "存在H&R"
+
+        # 包含规则
+        if self.include and not (self.include.search(torrent.title) or self.include.search(torrent.description)):
+            return False, "不符合包含规则"
+
+        # 排除规则
+        if self.exclude and (self.exclude.search(torrent.title) or self.exclude.search(torrent.description)):
+            return False, "符合排除规则"
+
+        # 种子大小（GB）
+        if self.size:
+            if len(self.size) == 1 and torrent.size < self.size[0]:
+                return False, f"种子大小 {torrent.size / 1024 ** 3:.1f} GB，不符合条件"
+            elif len(self.size) > 1 and not self.size[0] <= torrent.size <= self.size[1]:
+                return False, f"种子大小 {torrent.size / 1024 ** 3:.1f} GB，不在指定范围内"
+
+        # 做种人数，仅指定一个数字时做种人数需要小于等于该数字，指定范围时需要在范围内（包括边界）
+        if self.seeder:
+            if len(self.seeder) == 1:
+                if torrent.seeders > self.seeder[0]:
+                    return False, f"做种人数 {torrent.seeders}，超过单个指定值"
+            elif not (self.seeder[0] <= torrent.seeders <= self.seeder[1]):
+                return False, f"做种人数 {torrent.seeders}，不在指定范围内"
+
+        # 发布时间
+        if self.pubtime:
+            if len(self.pubtime) == 1:
+                # 单个值：选择发布时间小于等于该值的种子
+                if pubdate_minutes > self.pubtime[0]:
+                    return False, f"发布时间 {torrent.pubdate}，{pubdate_minutes:.0f} 分钟前，不符合条件"
+            elif not (self.pubtime[0] <= pubdate_minutes <= self.pubtime[1]):
+                # 范围值：选择发布时间在范围内的种子
+                return False, f"发布时间 {torrent.pubdate}，{pubdate_minutes:.0f} 分钟前，不在指定范围内"
+
+        return True, None
+
+
+class BrushCycleState:
+    """
+    单次刷流周期的状态，全局前置条件在周期开始时计算一次，添加刷流任务时增量更新
+    """
+
+    def __init__(self, torrent_tasks: Dict[str, dict], torrents_size: float, downloading_count: int):
+        self.torrents_size = torrents_size
+        self.downloading_count = downloading_count
+        # 站点+标题、站点+详情地址，以及尚未开始做种的标题对应的站点，用于排除重复种子
+        self.task_keys = set()
+        self.page_urls = set()
+        self.unseeded_titles: Dict[str, Set[str]] = {}
+        for task in torrent_tasks.values():
+            self.__index_task(task)
+
+    def __index_task(self, task: dict):
+        site_name = f"{task.get('site_name')}"
+        self.task_keys.add(f"{site_name}{task.get('title')}")
+        self.page_urls.add(f"{site_name}{task.get('page_url')}")
+        if not task.get("seed_time"):
+            self.unseeded_titles.setdefault(f"{task.get('title')}", set()).add(site_name)
+
+    def add_task(self, task: dict, size: float):
+        """
+        记录新增的刷流任务
+        """
+        self.__index_task(task)
+        self.torrents_size += size or 0
+        self.downloading_count += 1
+
+    def get_duplicate_reason(self, torrent: TorrentInfo) -> Optional[str]:
+        """
+        判断是否为重复种子，返回排除原因
+        """
+        # 默认根据标题和站点名称进行排除
+        if f"{torrent.site_name}{torrent.title}" in self.task_keys:
+            return "重复种子"
+        # 部分站点标题会上新时携带后缀，这里进一步根据种子详情地址进行排除
+        if torrent.page_url and f"{torrent.site_name}{torrent.page_url}" in self.page_urls:
+            return "重复种子"
+        # 不同站点如果遇到相同种子，判断前一个种子是否已经在做种，否则排除处理
+        if torrent.title:
+            site_names = self.unseeded_titles.get(torrent.title)
+            if site_names and (len(site_names) > 1 or torrent.site_name not in site_names):
+                return "其他站点存在尚未下载完成的相同种子"
+        return None
+
+
 class BrushFlow(_PluginBase):
     # region 全局定义
 
@@ -251,7 +396,7 @@ class BrushFlow(_PluginBase):
     # 插件图标
     plugin_icon = "brush.jpg"
     # 插件版本
-    plugin_version = "4.3.1"
+    plugin_version = "5.0"
     # 插件作者
     plugin_author = "jxxghp,InfinityPacer"
     # 作者主页
@@ -275,10 +420,32 @@ class BrushFlow(_PluginBase):
     _task_brush_enable = False
     # 订阅缓存信息
     _subscribe_infos = None
+    # 订阅标题匹配器
+    _subscribe_matcher = None
     # Brush定时
     _brush_interval = 10
     # Check定时
     _check_interval = 5
+    # 站点种子并发获取数
+    _browse_max_workers = 8
+    # 单站点种子获取超时（秒）
+    _browse_timeout = 120
+    # 带宽采样间隔（秒）
+    _bandwidth_interval = 3
+    # 带宽采样器
+    _bandwidth_sampler = None
+    # 刷流任务存储
+    _task_store = None
+    # 下载器种子状态增量同步
+    _torrent_sync = None
+    # 正在添加到下载器、尚未提交任务的种子的随机标签
+    _adding_tags: Optional[Set[str]] = None
+    # 站点刷流规则，配置变化时重新生成
+    _rule_plans = None
+    # 详情页面最多展示的任务数
+    _page_size = 1000
+    # 归档记录默认保留天数
+    _archive_retention_days = 365
     # 退出事件
     _event = threading.Event()
     _scheduler = None
@@ -294,6 +461,11 @@ class BrushFlow(_PluginBase):
         self.subscribe_oper = SubscribeOper()
         self.downloader_helper = DownloaderHelper()
         self._task_brush_enable = False
+        self._rule_plans = {}
+        self._task_store = BrushTaskStore(db_path=self.get_data_path() / "tasks.db")
+        self.__migrate_task_data()
+        self._torrent_sync = TorrentStateSync()
+        self._adding_tags = set()
 
         if not config:
             logger.info("站点刷流任务出错，无法获取插件配置")
@@ -352,6 +524,12 @@ class BrushFlow(_PluginBase):
         if not self.service_info:
             return
 
+        # 启动后台带宽采样，刷流时直接读取滑动平均值
+        if brush_config.enabled:
+            self._bandwidth_sampler = BandwidthSampler(sample_func=self.__sample_bandwidth,
+                                                       interval=self._bandwidth_interval)
+            self._bandwidth_sampler.start()
+
         # 检查是否启用了一次性任务
         if brush_config.onlyonce:
             self._scheduler = BackgroundScheduler(timezone=settings.TZ)
@@ -799,11 +977,67 @@ class BrushFlow(_PluginBase):
         elements = [
             {
                 'component': 'VRow',
-                'content': self.__get_total_elements()
+                'content': self.__get_total_elements() + self.__get_bandwidth_elements()
             }
         ]
         return cols, attrs, elements
 
+    def __get_bandwidth_elements(self) -> List[dict]:
+        """
+        组装带宽历史元素
+        """
+        history = self._bandwidth_sampler.get_history() if self._bandwidth_sampler else []
+        if not history:
+            return []
+
+        return [
+            {
+                'component': 'VCol',
+                'props': {
+                    'cols': 12
+                },
+                'content': [
+                    {
+                        'component': 'VApexChart',
+                        'props': {
+                            'height': 300,
+                            'options': {
+                                'chart': {
+                                    'type': 'line',
+                                },
+                                'title': {
+                                    'text': '下载器带宽（KB/s）'
+                                },
+                                'xaxis': {
+                                    'categories': [time.strftime('%H:%M', time.localtime(timestamp))
+                                                   for timestamp, _, _ in history]
+                                },
+                                'stroke': {
+                                    'curve': 'smooth'
+                                },
+                                'legend': {
+                                    'show': True
+                                },
+                                'noData': {
+                                    'text': '暂无数据'
+                                }
+                            },
+                            'series': [
+                                {
+                                    'name': '上传',
+                                    'data': [round(upload_speed / 1024, 1) for _, upload_speed, _ in history]
+                                },
+                                {
+                                    'name': '下载',
+                                    'data': [round(download_speed / 1024, 1) for _, _, download_speed in history]
+                                }
+                            ]
+                        }
+                    }
+                ]
+            }
+        ]
+
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         """
         拼装插件配置页面，需要返回两块数据：1、页面配置；2、数据结构
@@ -1194,6 +1428,64 @@ class BrushFlow(_PluginBase):
                                                 ]
                                             }
                                         ]
+                                    },
+                                    {
+                                        'component': 'VRow',
+                                        'content': [
+                                            {
+                                                'component': 'VCol',
+                                                'props': {
+                                                    "cols": 12,
+                                                    "md": 4
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'VTextField',
+                                                        'props': {
+                                                            'model': 'bandwidth_window',
+                                                            'label': '带宽采样窗口（秒）',
+                                                            'placeholder': '取该时间内的平均带宽，默认60'
+                                                        }
+                                                    }
+                                                ]
+                                            },
+                                            {
+                                                'component': 'VCol',
+                                                'props': {
+                                                    "cols": 12,
+                                                    "md": 4
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'VTextField',
+                                                        'props': {
+                                                            'model': 'bandwidth_stale',
+                                                            'label': '带宽采样有效期（秒）',
+                                                            'placeholder': '超过后实时获取带宽，默认30'
+                                                        }
+                                                    }
+                                                ]
+                                            },
+                                            {
+                                                'component': 'VCol',
+                                                'props': {
+                                                    'cols': 12,
+                                                    'md': 4
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'VTextField',
+                                                        'props': {
+                                                            'model': 'archive_retention_days',
+                                                            'label': '归档记录保留天数',
+                                                            'placeholder': '默认365，0为永久保留',
+                                                            'type': 'number',
+                                                            "min": "0"
+                                                        }
+                                                    }
+                                                ]
+                                            }
+                                        ]
                                     }
                                 ]
                             },
@@ -1801,10 +2093,11 @@ class BrushFlow(_PluginBase):
         }
 
     def get_page(self) -> List[dict]:
-        # 种子明细
-        torrents = self.get_data("torrents") or {}
+        # 种子明细，按添加时间倒序
+        data_list = self._task_store.get_tasks_page(status=BrushTaskStore.ACTIVE,
+                                                    limit=self._page_size) if self._task_store else []
 
-        if not torrents:
+        if not data_list:
             return [
                 {
                     'component': 'div',
@@ -1814,10 +2107,6 @@ class BrushFlow(_PluginBase):
                     }
                 }
             ]
-        else:
-            data_list = torrents.values()
-            # 按time倒序排序
-            data_list = sorted(data_list, key=lambda x: x.get("time") or 0, reverse=True)
 
         # 表格标题
         headers = [
@@ -1891,6 +2180,9 @@ class BrushFlow(_PluginBase):
         退出插件
         """
         try:
+            if self._bandwidth_sampler:
+                self._bandwidth_sampler.stop()
+                self._bandwidth_sampler = None
             if self._scheduler:
                 self._scheduler.remove_all_jobs()
                 if self._scheduler.running:
@@ -1916,11 +2208,14 @@ class BrushFlow(_PluginBase):
             logger.info(f"当前不在指定的刷流时间区间内，刷流操作将暂时暂停")
             return
 
-        with lock:
+        with brush_lock:
             logger.info(f"开始执行刷流任务 ...")
+            start_time = time.time()
 
-            torrent_tasks: Dict[str, dict] = self.get_data("torrents") or {}
-            torrents_size = self.__calculate_seeding_torrents_size(torrent_tasks=torrent_tasks)
+            # 检查任务只会删除种子，周期内的保种体积及下载数只会偏大，不会超出限制
+            with task_lock:
+                torrent_tasks: Dict[str, dict] = self._task_store.get_tasks(status=BrushTaskStore.ACTIVE)
+                torrents_size = self.__calculate_seeding_torrents_size(torrent_tasks=torrent_tasks)
 
             # 判断能否通过保种体积前置条件
             size_condition_passed, reason = self.__evaluate_size_condition_for_brush(torrents_size=torrents_size)
@@ -1929,14 +2224,17 @@ class BrushFlow(_PluginBase):
                 logger.info(f"刷流任务执行完成")
                 return
 
-            # 判断能否通过刷流前置条件
-            pre_condition_passed, reason = self.__evaluate_pre_conditions_for_brush()
+            # 判断能否通过刷流前置条件，同时下载任务数在周期内只获取一次，后续随添加任务增量更新
+            downloading_count = self.__get_downloading_count()
+            pre_condition_passed, reason = self.__evaluate_pre_conditions_for_brush(
+                downloading_count=downloading_count)
             self.__log_brush_conditions(passed=pre_condition_passed, reason=reason)
             if not pre_condition_passed:
                 logger.info(f"刷流任务执行完成")
                 return
 
-            statistic_info = self.__get_statistic_info()
+            cycle_state = BrushCycleState(torrent_tasks=torrent_tasks, torrents_size=torrents_size,
+                                          downloading_count=downloading_count)
 
             # 获取所有站点的信息，并过滤掉不存在的站点
             site_infos = []
@@ -1951,38 +2249,108 @@ class BrushFlow(_PluginBase):
 
             logger.info(f"即将针对站点 {', '.join(site.name for site in site_infos)} 开始刷流")
 
-            # 获取订阅标题
-            subscribe_titles = self.__get_subscribe_titles()
+            # 获取订阅标题匹配器
+            subscribe_matcher = self.__get_subscribe_matcher()
+
+            # 并发获取站点种子，并按顺序逐个站点评估及添加刷流任务
+            browse_stats = self.__brush_sites(site_infos=site_infos, torrent_tasks=torrent_tasks,
+                                              cycle_state=cycle_state,
+                                              subscribe_matcher=subscribe_matcher)
 
-            # 处理所有站点
-            for site in site_infos:
+            # 保存刷流周期耗时
+            self.__save_brush_metrics(start_time=start_time, site_infos=site_infos, browse_stats=browse_stats)
+            logger.info(f"刷流任务执行完成")
+
+    def __brush_sites(self, site_infos: list, torrent_tasks: Dict[str, dict], cycle_state: BrushCycleState,
+                      subscribe_matcher: Optional[SubscribeMatcher]) -> Dict[int, dict]:
+        """
+        并发获取站点种子，获取完成后在当前线程中逐个站点评估刷流条件并添加下载任务
+        """
+        browse_stats: Dict[int, dict] = {}
+        if not site_infos:
+            return browse_stats
+
+        brush_config = self.__get_brush_config()
+        # 并发阶段只获取种子，所有刷流状态的读写均在当前线程中完成
+        for siteinfo in site_infos:
+            browse_stats[siteinfo.id] = {}
+        executor = ThreadPoolExecutor(max_workers=min(len(site_infos), self._browse_max_workers),
+                                      thread_name_prefix="BrushFlow-Browse")
+        try:
+            futures = {executor.submit(self.__browse_site_torrents, siteinfo, browse_stats[siteinfo.id]): siteinfo
+                       for siteinfo in site_infos}
+            # 顺序刷流时严格按站点顺序评估，否则按获取完成的先后顺序评估
+            for siteinfo, torrents in self.__iter_browse_results(futures=futures, browse_stats=browse_stats,
+                                                                 ordered=brush_config.brush_sequential):
                 # 如果站点刷流没有正确响应，说明没有通过前置条件，其他站点也不需要继续刷流了
-                if not self.__brush_site_torrents(siteid=site.id, torrent_tasks=torrent_tasks,
-                                                  statistic_info=statistic_info,
-                                                  subscribe_titles=subscribe_titles):
-                    logger.info(f"站点 {site.name} 刷流中途结束，停止后续刷流")
+                if not self.__brush_site_torrents(siteinfo=siteinfo, torrents=torrents,
+                                                  torrent_tasks=torrent_tasks,
+                                                  cycle_state=cycle_state,
+                                                  subscribe_matcher=subscribe_matcher):
+                    logger.info(f"站点 {siteinfo.name} 刷流中途结束，停止后续刷流")
                     break
                 else:
-                    logger.info(f"站点 {site.name} 刷流完成")
+                    logger.info(f"站点 {siteinfo.name} 刷流完成")
+        finally:
+            # 超时或无需继续的站点不再等待，未开始的获取任务直接取消
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            # 保存数据
-            self.save_data("torrents", torrent_tasks)
-            # 保存统计数据
-            self.save_data("statistic", statistic_info)
-            logger.info(f"刷流任务执行完成")
+        return browse_stats
 
-    def __brush_site_torrents(self, siteid, torrent_tasks: Dict[str, dict], statistic_info: Dict[str, int],
-                              subscribe_titles: Set[str]) -> bool:
+    def __iter_browse_results(self, futures: Dict[Future, Any], browse_stats: Dict[int, dict], ordered: bool):
         """
-        针对站点进行刷流
+        按站点顺序或获取完成的先后顺序返回站点种子，超过单站点超时时间的站点返回None
         """
-        siteinfo = self.site_oper.get(siteid)
-        if not siteinfo:
-            logger.warning(f"站点不存在：{siteid}")
-            return True
+        pending = list(futures)
+        while pending:
+            candidates = pending[:1] if ordered else pending
+            future = next((f for f in candidates if f.done()), None)
+            if future:
+                pending.remove(future)
+                yield futures[future], future.result()
+                continue
+
+            # 仅对已经开始获取的站点计算超时，排队中的站点从开始获取时计时
+            now = time.time()
+            remaining = 1.0
+            for future in candidates:
+                started = browse_stats[futures[future].id].get("start")
+                if not started:
+                    continue
+                remaining = min(remaining, started + self._browse_timeout - now)
+                if remaining <= 0:
+                    break
+            if remaining <= 0:
+                pending.remove(future)
+                future.cancel()
+                siteinfo = futures[future]
+                browse_stats[siteinfo.id]["timeout"] = True
+                logger.warning(f"站点 {siteinfo.name} 获取种子超时（{self._browse_timeout} 秒），跳过该站点")
+                yield siteinfo, None
+                continue
+
+            wait(candidates, timeout=remaining, return_when=FIRST_COMPLETED)
 
-        logger.info(f"开始获取站点 {siteinfo.name} 的新种子 ...")
-        torrents = self.torrents_chain.browse(domain=siteinfo.domain)
+    def __browse_site_torrents(self, siteinfo, browse_stat: dict) -> Optional[List[TorrentInfo]]:
+        """
+        获取站点的新种子，运行在并发获取线程中，不读写任何刷流状态
+        """
+        browse_stat["start"] = time.time()
+        try:
+            logger.info(f"开始获取站点 {siteinfo.name} 的新种子 ...")
+            return self.torrents_chain.browse(domain=siteinfo.domain)
+        except Exception as e:
+            logger.error(f"获取站点 {siteinfo.name} 的新种子失败，错误详情: {e}")
+            return None
+        finally:
+            browse_stat["elapsed"] = time.time() - browse_stat["start"]
+
+    def __brush_site_torrents(self, siteinfo, torrents: Optional[List[TorrentInfo]], torrent_tasks: Dict[str, dict],
+                              cycle_state: BrushCycleState,
+                              subscribe_matcher: Optional[SubscribeMatcher]) -> bool:
+        """
+        针对站点进行刷流
+        """
         if not torrents:
             logger.info(f"站点 {siteinfo.name} 没有获取到种子")
             return True
@@ -1994,19 +2362,19 @@ class BrushFlow(_PluginBase):
 
         # 排除包含订阅的种子
         if brush_config.except_subscribe:
-            torrents = self.__filter_torrents_contains_subscribe(torrents=torrents, subscribe_titles=subscribe_titles)
+            torrents = self.__filter_torrents_contains_subscribe(torrents=torrents,
+                                                                 subscribe_matcher=subscribe_matcher)
 
         # 按发布日期降序排列
         torrents.sort(key=lambda x: x.pubdate or '', reverse=True)
 
-        torrents_size = self.__calculate_seeding_torrents_size(torrent_tasks=torrent_tasks)
-
         logger.info(f"正在准备种子刷流，数量 {len(torrents)}")
 
         # 过滤种子
         for torrent in torrents:
             # 判断能否通过刷流前置条件
-            pre_condition_passed, reason = self.__evaluate_pre_conditions_for_brush(include_network_conditions=False)
+            pre_condition_passed, reason = self.__evaluate_pre_conditions_for_brush(
+                downloading_count=cycle_state.downloading_count, include_network_conditions=False)
             self.__log_brush_conditions(passed=pre_condition_passed, reason=reason)
             if not pre_condition_passed:
                 return False
@@ -2014,7 +2382,7 @@ class BrushFlow(_PluginBase):
             logger.debug(f"种子详情：{torrent}")
 
             # 判断能否通过保种体积刷流条件
-            size_condition_passed, reason = self.__evaluate_size_condition_for_brush(torrents_size=torrents_size,
+            size_condition_passed, reason = self.__evaluate_size_condition_for_brush(torrents_size=cycle_state.torrents_size,
                                                                                      add_torrent_size=torrent.size)
             self.__log_brush_conditions(passed=size_condition_passed, reason=reason, torrent=torrent)
             if not size_condition_passed:
@@ -2022,52 +2390,66 @@ class BrushFlow(_PluginBase):
 
             # 判断能否通过刷流条件
             condition_passed, reason = self.__evaluate_conditions_for_brush(torrent=torrent,
-                                                                            torrent_tasks=torrent_tasks)
+                                                                            cycle_state=cycle_state)
             self.__log_brush_conditions(passed=condition_passed, reason=reason, torrent=torrent)
             if not condition_passed:
                 continue
 
-            # 添加下载任务
-            hash_string = self.__download(torrent=torrent)
-            if not hash_string:
-                logger.warning(f"{torrent.title} 添加刷流任务失败！")
-                continue
+            # 下载种子及添加到下载器耗时较长，在任务临界区外执行
+            try:
+                hash_string = self.__download(torrent=torrent)
+                if not hash_string:
+                    logger.warning(f"{torrent.title} 添加刷流任务失败！")
+                    continue
 
-            # 触发刷流下载时间并保存任务信息
-            torrent_task = {
-                "site": siteinfo.id,
-                "site_name": siteinfo.name,
-                "title": torrent.title,
-                "size": torrent.size,
-                "pubdate": torrent.pubdate,
-                # "site_cookie": torrent.site_cookie,
-                # "site_ua": torrent.site_ua,
-                # "site_proxy": torrent.site_proxy,
-                # "site_order": torrent.site_order,
-                "description": torrent.description,
-                "imdbid": torrent.imdbid,
-                # "enclosure": torrent.enclosure,
-                "page_url": torrent.page_url,
-                # "seeders": torrent.seeders,
-                # "peers": torrent.peers,
-                # "grabs": torrent.grabs,
-                "date_elapsed": torrent.date_elapsed,
-                "freedate": torrent.freedate,
-                "uploadvolumefactor": torrent.uploadvolumefactor,
-                "downloadvolumefactor": torrent.downloadvolumefactor,
-                "hit_and_run": torrent.hit_and_run or brush_config.site_hr_active,
-                "volume_factor": torrent.volume_factor,
-                "freedate_diff": torrent.freedate_diff,
-                # "labels": torrent.labels,
-                # "pri_order": torrent.pri_order,
-                # "category": torrent.category,
-                "ratio": 0,
-                "downloaded": 0,
-                "uploaded": 0,
-                "seeding_time": 0,
-                "deleted": False,
-                "time": time.time()
-            }
+                # 种子信息，添加时间在提交时记录
+                torrent_task = {
+                    "site": siteinfo.id,
+                    "site_name": siteinfo.name,
+                    "title": torrent.title,
+                    "size": torrent.size,
+                    "pubdate": torrent.pubdate,
+                    # "site_cookie": torrent.site_cookie,
+                    # "site_ua": torrent.site_ua,
+                    # "site_proxy": torrent.site_proxy,
+                    # "site_order": torrent.site_order,
+                    "description": torrent.description,
+                    "imdbid": torrent.imdbid,
+                    # "enclosure": torrent.enclosure,
+                    "page_url": torrent.page_url,
+                    # "seeders": torrent.seeders,
+                    # "peers": torrent.peers,
+                    # "grabs": torrent.grabs,
+                    "date_elapsed": torrent.date_elapsed,
+                    "freedate": torrent.freedate,
+                    "uploadvolumefactor": torrent.uploadvolumefactor,
+                    "downloadvolumefactor": torrent.downloadvolumefactor,
+                    "hit_and_run": torrent.hit_and_run or brush_config.site_hr_active,
+                    "volume_factor": torrent.volume_factor,
+                    "freedate_diff": torrent.freedate_diff,
+                    # "labels": torrent.labels,
+                    # "pri_order": torrent.pri_order,
+                    # "category": torrent.category,
+                    "ratio": 0,
+                    "downloaded": 0,
+                    "uploaded": 0,
+                    "seeding_time": 0,
+                    "deleted": False
+                }
+
+                with task_lock:
+                    # 提交任务时才记录添加时间，检查任务据此补充读取同步期间提交的任务
+                    torrent_task["time"] = time.time()
+                    self._task_store.upsert_tasks(status=BrushTaskStore.ACTIVE, tasks={hash_string: torrent_task})
+                    statistic_info = self.__get_statistic_info()
+                    statistic_info["count"] = statistic_info.get("count", 0) + 1
+                    self.save_data("statistic", statistic_info)
+                    # 更新本周期的保种体积及下载数
+                    torrent_tasks[hash_string] = torrent_task
+                    cycle_state.add_task(task=torrent_task, size=torrent.size)
+            finally:
+                with task_lock:
+                    self._adding_tags.clear()
 
             self.eventmanager.send_event(etype=EventType.PluginTriggered, data={
                 "plugin_id": self.__class__.__name__,
@@ -2076,11 +2458,7 @@ class BrushFlow(_PluginBase):
                 "data": torrent_task,
                 "downloader": self.service_info.name
             })
-            torrent_tasks[hash_string] = torrent_task
 
-            # 统计数据
-            torrents_size += torrent.size
-            statistic_info["count"] += 1
             logger.info(f"站点 {siteinfo.name}，新增刷流种子下载：{torrent.title}|{torrent.description}")
             self.__send_add_message(torrent)
 
@@ -2131,123 +2509,55 @@ class BrushFlow(_PluginBase):
 
         return True, None
 
-    def __evaluate_pre_conditions_for_brush(self, include_network_conditions: bool = True) \
+    def __evaluate_pre_conditions_for_brush(self, downloading_count: int, include_network_conditions: bool = True) \
             -> Tuple[bool, Optional[str]]:
         """
         前置过滤不符合条件的种子
         """
-        reasons = [
-            ("maxdlcount", lambda config: self.__get_downloading_count() >= int(config),
-             lambda config: f"当前同时下载任务数已达到最大值 {config}，暂时停止新增任务")
-        ]
+        brush_config = self.__get_brush_config()
 
-        if include_network_conditions:
-            # 获取平均带宽
-            avg_upload_speed, avg_download_speed = self.__get_average_bandwidth()
-            if avg_upload_speed is not None and avg_download_speed is not None:
-                reasons.extend([
-                    ("maxupspeed", lambda config: avg_upload_speed >= float(config) * 1024,
-                     lambda config: f"当前总上传带宽 {StringUtils.str_filesize(avg_upload_speed)}，"
-                                    f"已达到最大值 {config} KB/s，暂时停止新增任务"),
-                    ("maxdlspeed", lambda config: avg_download_speed >= float(config) * 1024,
-                     lambda config: f"当前总下载带宽 {StringUtils.str_filesize(avg_download_speed)}，"
-                                    f"已达到最大值 {config} KB/s，暂时停止新增任务"),
-                ])
+        if brush_config.maxdlcount and downloading_count >= int(brush_config.maxdlcount):
+            return False, f"当前同时下载任务数已达到最大值 {brush_config.maxdlcount}，暂时停止新增任务"
 
-        brush_config = self.__get_brush_config()
-        for condition, check, message in reasons:
-            config_value = getattr(brush_config, condition, None)
-            if config_value and check(config_value):
-                reason = message(config_value)
-                return False, reason
+        if not include_network_conditions:
+            return True, None
+
+        # 获取平均带宽
+        avg_upload_speed, avg_download_speed = self.__get_average_bandwidth()
+        if avg_upload_speed is not None and avg_download_speed is not None:
+            if brush_config.maxupspeed and avg_upload_speed >= float(brush_config.maxupspeed) * 1024:
+                return False, (f"当前总上传带宽 {StringUtils.str_filesize(avg_upload_speed)}，"
+                               f"已达到最大值 {brush_config.maxupspeed} KB/s，暂时停止新增任务")
+            if brush_config.maxdlspeed and avg_download_speed >= float(brush_config.maxdlspeed) * 1024:
+                return False, (f"当前总下载带宽 {StringUtils.str_filesize(avg_download_speed)}，"
+                               f"已达到最大值 {brush_config.maxdlspeed} KB/s，暂时停止新增任务")
 
         return True, None
 
-    def __evaluate_conditions_for_brush(self, torrent, torrent_tasks) -> Tuple[bool, Optional[str]]:
+    def __evaluate_conditions_for_brush(self, torrent: TorrentInfo, cycle_state: BrushCycleState) \
+            -> Tuple[bool, Optional[str]]:
         """
         过滤不符合条件的种子
         """
-        brush_config = self.__get_brush_config(torrent.site_name)
-
         # 排除重复种子
-        # 默认根据标题和站点名称进行排除
-        task_key = f"{torrent.site_name}{torrent.title}"
-        if any(task_key == f"{task.get('site_name')}{task.get('title')}" for task in torrent_tasks.values()):
-            return False, "重复种子"
-
-        # 部分站点标题会上新时携带后缀，这里进一步根据种子详情地址进行排除
-        if torrent.page_url:
-            task_page_url = f"{torrent.site_name}{torrent.page_url}"
-            if any(task_page_url == f"{task.get('site_name')}{task.get('page_url')}" for task in
-                   torrent_tasks.values()):
-                return False, "重复种子"
-
-        # 不同站点如果遇到相同种子，判断前一个种子是否已经在做种，否则排除处理
-        if torrent.title:
-            if any(torrent.site_name != f"{task.get('site_name')}" and torrent.title == f"{task.get('title')}"
-                   and not task.get("seed_time") for task in torrent_tasks.values()):
-                return False, "其他站点存在尚未下载完成的相同种子"
-
-        # 促销条件
-        if brush_config.freeleech and torrent.downloadvolumefactor != 0:
-            return False, "非免费种子"
-        if brush_config.freeleech == "2xfree" and torrent.uploadvolumefactor != 2:
-            return False, "非双倍上传种子"
-
-        # H&R
-        if brush_config.hr == "yes" and torrent.hit_and_run:
-            return False, "存在H&R"
-
-        # 包含规则
-        if brush_config.include and not (
-                re.search(brush_config.include, torrent.title, re.I) or re.search(brush_config.include,
-                                                                                  torrent.description, re.I)):
-            return False, "不符合包含规则"
-
-        # 排除规则
-        if brush_config.exclude and (
-                re.search(brush_config.exclude, torrent.title, re.I) or re.search(brush_config.exclude,
-                                                                                  torrent.description, re.I)):
-            return False, "符合排除规则"
-
-        # 种子大小（GB）
-        if brush_config.size:
-            sizes = [float(size) * 1024 ** 3 for size in brush_config.size.split("-")]
-            if len(sizes) == 1 and torrent.size < sizes[0]:
-                return False, f"种子大小 {self.__bytes_to_gb(torrent.size):.1f} GB，不符合条件"
-            elif len(sizes) > 1 and not sizes[0] <= torrent.size <= sizes[1]:
-                return False, f"种子大小 {self.__bytes_to_gb(torrent.size):.1f} GB，不在指定范围内"
-
-        # 做种人数
-        if brush_config.seeder:
-            seeders_range = [float(n) for n in brush_config.seeder.split("-")]
-            # 检查是否仅指定了一个数字，即做种人数需要小于等于该数字
-            if len(seeders_range) == 1:
-                # 当做种人数大于该数字时，不符合条件
-                if torrent.seeders > seeders_range[0]:
-                    return False, f"做种人数 {torrent.seeders}，超过单个指定值"
-            # 如果指定了一个范围
-            elif len(seeders_range) > 1:
-                # 检查做种人数是否在指定的范围内（包括边界）
-                if not (seeders_range[0] <= torrent.seeders <= seeders_range[1]):
-                    return False, f"做种人数 {torrent.seeders}，不在指定范围内"
+        reason = cycle_state.get_duplicate_reason(torrent)
+        if reason:
+            return False, reason
 
-        # 发布时间
-        pubdate_minutes = self.__get_pubminutes(torrent.pubdate)
+        rule_plan = self.__get_rule_plan(torrent.site_name)
         # 已支持独立站点配置，取消单独适配站点时区逻辑，可通过配置项「pubtime」自行适配
         # pubdate_minutes = self.__adjust_site_pubminutes(pubdate_minutes, torrent)
-        if brush_config.pubtime:
-            pubtimes = [float(n) for n in brush_config.pubtime.split("-")]
-            if len(pubtimes) == 1:
-                # 单个值：选择发布时间小于等于该值的种子
-                if pubdate_minutes > pubtimes[0]:
-                    return False, f"发布时间 {torrent.pubdate}，{pubdate_minutes:.0f} 分钟前，不符合条件"
-            else:
-                # 范围值：选择发布时间在范围内的种子
-                if not (pubtimes[0] <= pubdate_minutes <= pubtimes[1]):
-                    return False, f"发布时间 {torrent.pubdate}，{pubdate_minutes:.0f} 分钟前，不在指定范围内"
+        pubdate_minutes = self.__get_pubminutes(torrent.pubdate) if rule_plan.pubtime else 0
+        return rule_plan.evaluate(torrent=torrent, pubdate_minutes=pubdate_minutes)
 
-        return True, None
+    def __get_rule_plan(self, sitename: str = None) -> BrushRulePlan:
+        """
+        获取站点刷流规则，每个站点在配置变化后只生成一次
+        """
+        rule_plan = self._rule_plans.get(sitename)
+        if not rule_plan:
+            rule_plan = self._rule_plans[sitename] = BrushRulePlan(self.__get_brush_config(sitename=sitename))
+        return rule_plan
 
     @staticmethod
     def __log_brush_conditions(passed: bool, reason: str, torrent: Any = None):
@@ -2273,22 +2583,34 @@ class BrushFlow(_PluginBase):
         if not brush_config.downloader or not self.downloader:
             return
 
-        with lock:
+        with check_lock:
             logger.info("开始检查刷流下载任务 ...")
-            torrent_tasks: Dict[str, dict] = self.get_data("torrents") or {}
-            unmanaged_tasks: Dict[str, dict] = self.get_data("unmanaged") or {}
+            with task_lock:
+                read_time = time.time()
+                torrent_tasks: Dict[str, dict] = self._task_store.get_tasks(status=BrushTaskStore.ACTIVE)
+                unmanaged_tasks: Dict[str, dict] = self._task_store.get_tasks(status=BrushTaskStore.UNMANAGED)
 
             downloader = self.downloader
-            seeding_torrents, error = downloader.get_torrents()
+            # 仅同步刷流管理中的种子，qBittorrent通过增量同步获取发生变化的种子
+            is_qbittorrent = self.downloader_helper.is_downloader("qbittorrent", service=self.service_info)
+            sync_time = time.time()
+            seeding_torrents_dict, changed_hashes, error = self._torrent_sync.sync(downloader=downloader,
+                                                                                   is_qbittorrent=is_qbittorrent,
+                                                                                   hashes=torrent_tasks.keys())
             if error:
                 logger.warning("连接下载器出错，将在下个时间周期重试")
                 return
 
-            seeding_torrents_dict = {self.__get_hash(torrent): torrent for torrent in seeding_torrents}
-
-            # 检查种子刷流标签变更情况
-            self.__update_seeding_tasks_based_on_tags(torrent_tasks=torrent_tasks, unmanaged_tasks=unmanaged_tasks,
-                                                      seeding_torrents_dict=seeding_torrents_dict)
+            with task_lock:
+                # 同步期间刷流任务可能已提交新的任务，补充读取后再检查种子刷流标签变更情况
+                torrent_tasks.update(self._task_store.get_tasks(status=BrushTaskStore.ACTIVE, since=read_time))
+                read_time = time.time()
+                self.__update_seeding_tasks_based_on_tags(torrent_tasks=torrent_tasks,
+                                                          unmanaged_tasks=unmanaged_tasks,
+                                                          seeding_torrents_dict=seeding_torrents_dict,
+                                                          changed_hashes=changed_hashes)
+            # 变化种子已处理完成，之后的同步不再返回
+            self._torrent_sync.commit()
 
             torrent_check_hashes = list(torrent_tasks.keys())
             if not torrent_tasks or not torrent_check_hashes:
@@ -2303,8 +2625,9 @@ class BrushFlow(_PluginBase):
             # 先更新刷流任务的最新状态，上下传，分享率
             self.__update_torrent_tasks_state(torrents=check_torrents, torrent_tasks=torrent_tasks)
 
-            # 更新刷流任务列表中在下载器中删除的种子为删除状态
-            self.__update_undeleted_torrents_missing_in_downloader(torrent_tasks, torrent_check_hashes, check_torrents)
+            # 更新刷流任务列表中在下载器中删除的种子为删除状态，同步开始后提交的任务不在同步结果中，不做判断
+            self.__update_undeleted_torrents_missing_in_downloader(torrent_tasks, torrent_check_hashes, check_torrents,
+                                                                   since=sync_time)
 
             # 根据配置的标签进行种子排除
             if check_torrents:
@@ -2356,12 +2679,12 @@ class BrushFlow(_PluginBase):
                             torrent_tasks[torrent_hash]["deleted"] = True
                             torrent_tasks[torrent_hash]["deleted_time"] = time.time()
 
-            # 归档数据
-            self.__auto_archive_tasks(torrent_tasks=torrent_tasks)
-
-            self.__update_and_save_statistic_info(torrent_tasks)
-
-            self.save_data("torrents", torrent_tasks)
+            with task_lock:
+                # 归档数据
+                self.__auto_archive_tasks(torrent_tasks=torrent_tasks)
+                # 检查期间刷流任务可能已提交新的任务，统计前补充读取
+                torrent_tasks.update(self._task_store.get_tasks(status=BrushTaskStore.ACTIVE, since=read_time))
+                self.__update_and_save_statistic_info(torrent_tasks)
 
             logger.info("刷流下载任务检查完成")
 
@@ -2387,7 +2710,11 @@ class BrushFlow(_PluginBase):
             })
 
     def __update_seeding_tasks_based_on_tags(self, torrent_tasks: Dict[str, dict], unmanaged_tasks: Dict[str, dict],
-                                             seeding_torrents_dict: Dict[str, Any]):
+                                             seeding_torrents_dict: Dict[str, Any],
+                                             changed_hashes: Optional[Set[str]] = None):
+        """
+        根据刷流标签同步刷流任务，增量同步时只检查发生变化的种子
+        """
         brush_config = self.__get_brush_config()
 
         if not self.downloader_helper.is_downloader("qbittorrent", service=self.service_info):
@@ -2398,6 +2725,12 @@ class BrushFlow(_PluginBase):
         added_tasks = []
         reset_tasks = []
         removed_tasks = []
+        if changed_hashes is not None:
+            if not changed_hashes:
+                return
+            seeding_torrents_dict = {torrent_hash: seeding_torrents_dict[torrent_hash] for torrent_hash in changed_hashes
+                                     if torrent_hash in seeding_torrents_dict}
+
         # 基于 seeding_torrents_dict 的信息更新或添加到 torrent_tasks
         for torrent_hash, torrent in seeding_torrents_dict.items():
             tags = self.__get_label(torrent=torrent)
@@ -2405,6 +2738,9 @@ class BrushFlow(_PluginBase):
             if brush_config.brush_tag in tags:
                 # 如果包含刷流标签又不在刷流任务中，则需要加入管理
                 if torrent_hash not in torrent_tasks:
+                    # 刷流任务正在添加、尚未提交的种子，由刷流任务提交
+                    if self._adding_tags.intersection(tags):
+                        continue
                     # 检查该种子是否在 unmanaged_tasks 中
                     if torrent_hash in unmanaged_tasks:
                         # 如果在 unmanaged_tasks 中，移除并转移到 torrent_tasks
@@ -2439,8 +2775,10 @@ class BrushFlow(_PluginBase):
                     logger.info(f"站点 {torrent_task.get('site_name')}，"
                                 f"刷流任务种子移除：{torrent_task.get('title')}|{torrent_task.get('description')}")
 
-        self.save_data("torrents", torrent_tasks)
-        self.save_data("unmanaged", unmanaged_tasks)
+        # 任务只会在刷流任务与非刷流管理任务之间转移，按Hash写入即可覆盖原状态，不会删除刷流期间新增的任务
+        with task_lock:
+            self._task_store.upsert_tasks(status=BrushTaskStore.ACTIVE, tasks=torrent_tasks)
+            self._task_store.upsert_tasks(status=BrushTaskStore.UNMANAGED, tasks=unmanaged_tasks)
 
         # 发送汇总消息
         if added_tasks:
@@ -2750,14 +3088,17 @@ class BrushFlow(_PluginBase):
         # 返回所有需要删除的种子的哈希列表
         return need_delete_hashes
 
-    def __update_undeleted_torrents_missing_in_downloader(self, torrent_tasks, torrent_check_hashes, torrents):
+    def __update_undeleted_torrents_missing_in_downloader(self, torrent_tasks, torrent_check_hashes, torrents,
+                                                          since: float = None):
         """
         处理已经被删除，但是任务记录中还没有被标记删除的种子
+        :param since: 下载器种子同步开始的时间，此后提交的任务可能未包含在同步结果中，跳过
         """
         # 先通过获取的全量种子，判断已经被删除，但是任务记录中还没有被标记删除的种子
         torrent_all_hashes = self.__get_all_hashes(torrents)
         missing_hashes = [hash_value for hash_value in torrent_check_hashes if hash_value not in torrent_all_hashes]
-        undeleted_hashes = [hash_value for hash_value in missing_hashes if not torrent_tasks[hash_value].get("deleted")]
+        undeleted_hashes = [hash_value for hash_value in missing_hashes if not torrent_tasks[hash_value].get("deleted")
+                            and (since is None or (torrent_tasks[hash_value].get("time") or 0) < since)]
 
         if not undeleted_hashes:
             return
@@ -2824,10 +3165,13 @@ class BrushFlow(_PluginBase):
         active_uploaded, active_downloaded, active_count, total_unarchived = 0, 0, 0, 0
 
         statistic_info = self.__get_statistic_info()
-        archived_tasks = self.get_data("archived") or {}
-        combined_tasks = {**torrent_tasks, **archived_tasks}
+        # 已归档任务直接在存储中汇总，不再加载全部归档数据
+        archived_summary = self._task_store.get_summary(status=BrushTaskStore.ARCHIVED)
+        total_deleted += archived_summary.get("deleted", 0)
+        total_downloaded += archived_summary.get("downloaded", 0)
+        total_uploaded += archived_summary.get("uploaded", 0)
 
-        for task in combined_tasks.values():
+        for task in torrent_tasks.values():
             if task.get("deleted", False):
                 total_deleted += 1
             total_downloaded += task.get("downloaded", 0)
@@ -2843,7 +3187,7 @@ class BrushFlow(_PluginBase):
                 total_unarchived += 1
 
         # 更新统计信息
-        total_count = len(combined_tasks)
+        total_count = len(torrent_tasks) + archived_summary.get("count", 0)
         statistic_info.update({
             "uploaded": total_uploaded,
             "downloaded": total_downloaded,
@@ -2863,7 +3207,7 @@ class BrushFlow(_PluginBase):
                     f"总下载量：{StringUtils.str_filesize(total_downloaded)}")
 
         self.save_data("statistic", statistic_info)
-        self.save_data("torrents", torrent_tasks)
+        self._task_store.upsert_tasks(status=BrushTaskStore.ACTIVE, tasks=torrent_tasks)
 
     def __get_brush_config(self, sitename: str = None) -> BrushConfig:
         """
@@ -2887,6 +3231,8 @@ class BrushFlow(_PluginBase):
             "maxupspeed": "总上传带宽",
             "maxdlspeed": "总下载带宽",
             "maxdlcount": "同时下载任务数",
+            "bandwidth_window": "带宽采样窗口",
+            "bandwidth_stale": "带宽采样有效期",
             "seed_time": "做种时间",
             "hr_seed_time": "H&R做种时间",
             "seed_ratio": "分享率",
@@ -2896,7 +3242,8 @@ class BrushFlow(_PluginBase):
             "seed_inactivetime": "未活动时间",
             "up_speed": "单任务上传限速",
             "dl_speed": "单任务下载限速",
-            "auto_archive_days": "自动清理记录天数"
+            "auto_archive_days": "自动清理记录天数",
+            "archive_retention_days": "归档记录保留天数"
         }
 
         config_range_number_attr_to_desc = {
@@ -2953,6 +3300,8 @@ class BrushFlow(_PluginBase):
             "maxupspeed": brush_config.maxupspeed,
             "maxdlspeed": brush_config.maxdlspeed,
             "maxdlcount": brush_config.maxdlcount,
+            "bandwidth_window": brush_config.bandwidth_window,
+            "bandwidth_stale": brush_config.bandwidth_stale,
             "include": brush_config.include,
             "exclude": brush_config.exclude,
             "size": brush_config.size,
@@ -2969,6 +3318,7 @@ class BrushFlow(_PluginBase):
             "up_speed": brush_config.up_speed,
             "dl_speed": brush_config.dl_speed,
             "auto_archive_days": brush_config.auto_archive_days,
+            "archive_retention_days": brush_config.archive_retention_days,
             "save_path": brush_config.save_path,
             "clear_task": brush_config.clear_task,
             "delete_except_tags": brush_config.delete_except_tags,
@@ -3131,6 +3481,9 @@ class BrushFlow(_PluginBase):
                 else:
                     logger.error("尝试通过MP下载种子失败，继续尝试传递种子地址到下载器进行下载")
             if torrent_content:
+                # 提交任务前检查任务不会按刷流标签将该种子纳入管理
+                with task_lock:
+                    self._adding_tags.add(tag)
                 state = downloader.add_torrent(content=torrent_content,
                                                download_dir=download_dir,
                                                cookie=cookies,
@@ -3501,57 +3854,51 @@ class BrushFlow(_PluginBase):
         获取任务中的种子总大小
         """
         # 读取种子记录
-        task_info = self.get_data("torrents") or {}
+        task_info = self._task_store.get_tasks(status=BrushTaskStore.ACTIVE)
         if not task_info:
             return 0
         total_size = sum([task.get("size") or 0 for task in task_info.values()])
         return total_size
 
-    def __get_average_bandwidth(self, sample_count: int = 5, interval: float = 3.0) \
-            -> Tuple[Optional[float], Optional[float]]:
-        """
-        多次采样上传和下载带宽，取平均值
-        """
-        upload_speeds = []
-        download_speeds = []
-        start_time = time.time()
-        for _ in range(sample_count):
-            downloader_info = self.__get_downloader_info()
-            if downloader_info:
-                upload_speeds.append(downloader_info.upload_speed or 0)
-                download_speeds.append(downloader_info.download_speed or 0)
-            # 采样间隔
-            time.sleep(interval)
-        end_time = time.time()
-        total_duration = end_time - start_time
-        if not upload_speeds or not download_speeds:
+    def __get_average_bandwidth(self) -> Tuple[Optional[float], Optional[float]]:
+        """
+        获取后台采样的平均上传和下载带宽，采样数据过期时实时获取一次
+        """
+        brush_config = self.__get_brush_config()
+        window = brush_config.bandwidth_window or 60
+        stale = brush_config.bandwidth_stale or 30
+        if self._bandwidth_sampler:
+            avg_upload_speed, avg_download_speed = self._bandwidth_sampler.get_average(window=window, stale=stale)
+            if avg_upload_speed is not None and avg_download_speed is not None:
+                logger.debug(f"平均上传带宽 {StringUtils.str_filesize(avg_upload_speed)}, "
+                             f"平均下载带宽 {StringUtils.str_filesize(avg_download_speed)}, "
+                             f"采样窗口={window} 秒")
+                return avg_upload_speed, avg_download_speed
+            logger.debug(f"带宽采样数据已超过 {stale} 秒未更新，实时获取带宽")
+
+        speeds = self.__sample_bandwidth()
+        if not speeds:
             return None, None
-        avg_upload_speed = sum(upload_speeds) / len(upload_speeds) if upload_speeds else 0
-        avg_download_speed = sum(download_speeds) / len(download_speeds) if download_speeds else 0
-        logger.debug(f"平均上传带宽 {StringUtils.str_filesize(avg_upload_speed)}, "
-                     f"平均下载带宽 {StringUtils.str_filesize(avg_download_speed)}, "
-                     f"采样次数={sample_count}, 时长={total_duration:.2f} 秒")
-        return avg_upload_speed, avg_download_speed
+        if self._bandwidth_sampler:
+            self._bandwidth_sampler.add_samples(speeds)
+        return sum(speed[0] for speed in speeds.values()), sum(speed[1] for speed in speeds.values())
 
-    def __get_downloader_info(self) -> schemas.DownloaderInfo:
+    def __sample_bandwidth(self) -> Dict[str, Tuple[float, float]]:
         """
-        获取下载器实时信息（所有下载器）
+        获取所有下载器的实时上传和下载带宽
         """
-        ret_info = schemas.DownloaderInfo()
-
-        downloader = self.downloader
-        if not downloader:
-            return ret_info
-
-        transfer_infos = self.chain.run_module("downloader_info")
-        if transfer_infos:
-            for transfer_info in transfer_infos:
-                ret_info.download_speed += transfer_info.download_speed
-                ret_info.upload_speed += transfer_info.upload_speed
-                ret_info.download_size += transfer_info.download_size
-                ret_info.upload_size += transfer_info.upload_size
-
-        return ret_info
+        speeds = {}
+        services = self.downloader_helper.get_services() or {}
+        if self._bandwidth_sampler:
+            # 移除已不在配置中的下载器的采样，避免其采样一直过期导致每次都实时获取
+            self._bandwidth_sampler.retain(services.keys())
+        for name in services:
+            transfer_infos = self.chain.run_module("downloader_info", downloader=name)
+            if not transfer_infos:
+                continue
+            speeds[name] = (sum(info.upload_speed or 0 for info in transfer_infos),
+                            sum(info.download_speed or 0 for info in transfer_infos))
+        return speeds
 
     def __get_downloading_count(self) -> int:
         """
@@ -3635,20 +3982,24 @@ class BrushFlow(_PluginBase):
                 filter_torrents.append(torrent)
         return filter_torrents
 
-    def __get_subscribe_titles(self) -> Set[str]:
+    def __get_subscribe_matcher(self) -> Optional[SubscribeMatcher]:
         """
-        获取当前订阅的所有标题，返回一个不包含None和空白字符的集合
+        获取当前订阅的所有标题的匹配器，订阅标题集合没有变化时复用已构建的匹配器
         """
         brush_config = self.__get_brush_config()
         if not brush_config.except_subscribe:
             logger.info("没有开启排除订阅，取消订阅标题匹配")
-            return set()
+            return None
 
         logger.info("已开启排除订阅，正在准备订阅标题匹配 ...")
 
-        if not self._subscribe_infos:
-            self._subscribe_infos = {}
+        # 重启后从持久化数据中恢复已识别的订阅标题，避免重新识别所有订阅
+        if self._subscribe_infos is None:
+            subscribe_data = self.get_data("subscribe_infos") or {}
+            self._subscribe_infos = subscribe_data.get("infos") or {}
+            self._subscribe_matcher = None
 
+        subscribe_infos_changed = False
         subscribes = self.subscribe_oper.list()
         if subscribes:
             # 遍历订阅
@@ -3676,23 +4027,36 @@ class BrushFlow(_PluginBase):
                         subscribe_titles.extend(mediainfo.names)
                         subscribe_titles = [title.strip() for title in subscribe_titles if title and title.strip()]
                         self._subscribe_infos[subscribe_key] = subscribe_titles
+                        subscribe_infos_changed = True
                     else:
                         logger.info(f"订阅 {subscribe.name} 没有识别到媒体信息，跳过订阅标题匹配")
                 except Exception as e:
                     logger.error(f"识别订阅 {subscribe.name} 媒体信息失败，错误详情: {e}")
 
-            # 移除不再存在的订阅
-            current_keys = {f"{subscribe.id}_{subscribe.name}" for subscribe in subscribes}
-            for key in set(self._subscribe_infos) - current_keys:
-                del self._subscribe_infos[key]
+        # 移除不再存在的订阅
+        current_keys = {f"{subscribe.id}_{subscribe.name}" for subscribe in subscribes or []}
+        for key in set(self._subscribe_infos) - current_keys:
+            del self._subscribe_infos[key]
+            subscribe_infos_changed = True
 
-        logger.info("订阅标题匹配完成")
         logger.debug(f"当前订阅的标题集合为：{self._subscribe_infos}")
         unique_titles = {title for titles in self._subscribe_infos.values() for title in titles}
-        return unique_titles
+        version = SubscribeMatcher.make_version(unique_titles)
+        # 仅在订阅标题集合发生变化时重新构建匹配器
+        if not self._subscribe_matcher or self._subscribe_matcher.version != version:
+            self._subscribe_matcher = SubscribeMatcher(titles=unique_titles, version=version)
+            logger.info(f"订阅标题匹配器已更新，标题数量 {len(self._subscribe_matcher)}")
+        if subscribe_infos_changed:
+            self.save_data("subscribe_infos", {"version": version, "infos": self._subscribe_infos})
+
+        logger.info("订阅标题匹配完成")
+        return self._subscribe_matcher
 
     @staticmethod
-    def __filter_torrents_contains_subscribe(torrents: Any, subscribe_titles: Set[str]):
+    def __filter_torrents_contains_subscribe(torrents: Any, subscribe_matcher: Optional[SubscribeMatcher]):
+        if not subscribe_matcher:
+            return torrents
+
         # 初始化两个列表，一个用于收集未被排除的种子，一个用于记录被排除的种子
         included_torrents = []
         excluded_torrents = []
@@ -3703,7 +4067,7 @@ class BrushFlow(_PluginBase):
             title = torrent.title or ''
             description = torrent.description or ''
 
-            if any(subscribe_title in title or subscribe_title in description for subscribe_title in subscribe_titles):
+            if subscribe_matcher.search(title) or subscribe_matcher.search(description):
                 # 如果种子的标题或描述包含订阅标题中的任一项，则记录为被排除
                 excluded_torrents.append(torrent)
                 logger.info(f"命中订阅内容，排除种子：{title}|{description}")
@@ -3762,46 +4126,74 @@ class BrushFlow(_PluginBase):
             logger.info("自动归档记录天数小于等于0，取消自动归档")
             return
 
-        # 用于存储已删除的数据
-        archived_tasks: Dict[str, dict] = self.get_data("archived") or {}
+        # 用于存储本次需要归档的数据
+        archived_tasks: Dict[str, dict] = {}
 
         current_time = time.time()
         archive_threshold_seconds = self._brush_config.auto_archive_days * 86400  # 将天数转换为秒数
 
-        # 准备一个列表，记录所有需要从原始数据中删除的键
-        keys_to_delete = set()
-
         # 遍历所有 torrent 条目
         for key, value in torrent_tasks.items():
             deleted_time = value.get("deleted_time")
             # 场景 1: 检查任务是否已被标记为删除且超出保留天数
             if (value.get("deleted") and isinstance(deleted_time, (int, float)) and
                     current_time - deleted_time > archive_threshold_seconds):
-                keys_to_delete.add(key)
                 archived_tasks[key] = value
                 continue
 
             # 场景 2: 检查没有明确删除时间的历史数据
             if value.get("deleted") and deleted_time is None:
-                keys_to_delete.add(key)
                 archived_tasks[key] = value
                 continue
 
-        # 从原始字典中移除已删除的条目
-        for key in keys_to_delete:
+        # 从原始字典中移除已归档的条目，仅写入本次归档的任务
+        for key in archived_tasks:
             del torrent_tasks[key]
+        self._task_store.upsert_tasks(status=BrushTaskStore.ARCHIVED, tasks=archived_tasks)
 
-        self.save_data("archived", archived_tasks)
+        self.__compact_archived_tasks()
+
+    def __compact_archived_tasks(self) -> None:
+        """
+        清理超过保留天数的归档记录，清理记录的上传下载量仍会计入统计数据
+        """
+        retention_days = self._brush_config.archive_retention_days
+        if retention_days is None or retention_days == "":
+            retention_days = self._archive_retention_days
+        if retention_days <= 0:
+            return
+
+        compacted_count = self._task_store.compact(status=BrushTaskStore.ARCHIVED,
+                                                   before=time.time() - retention_days * 86400)
+        if compacted_count:
+            logger.info(f"已清理超过 {retention_days} 天的归档记录 {compacted_count} 条")
+
+    def __migrate_task_data(self):
+        """
+        将原插件数据中的刷流任务一次性迁移到任务存储
+        """
+        if self._task_store.get_meta("migrated"):
+            return
+
+        # 同一任务存在多份记录时，以刷流任务为准
+        statuses = [BrushTaskStore.ARCHIVED, BrushTaskStore.UNMANAGED, BrushTaskStore.ACTIVE]
+        for status in statuses:
+            tasks = self.get_data(status) or {}
+            if tasks:
+                self._task_store.upsert_tasks(status=status, tasks=tasks)
+                logger.info(f"已迁移刷流任务数据 {status}，共 {len(tasks)} 条")
+        self._task_store.set_meta("migrated", time.time())
+        for status in statuses:
+            self.del_data(status)
 
     def __clear_tasks(self):
         """
         清除统计数据
         彻底重置所有刷流数据，如当前还存在正在做种的刷流任务，待定时检查任务执行后，会自动纳入刷流管理
         """
-        self.save_data("torrents", {})
-        self.save_data("archived", {})
-        self.save_data("unmanaged", {})
-        self.save_data("statistic", {})
+        with task_lock:
+            self._task_store.clear()
+            self.save_data("statistic", {})
 
     def __get_statistic_info(self) -> Dict[str, int]:
         """
@@ -3819,6 +4211,33 @@ class BrushFlow(_PluginBase):
         }
         return statistic_info
 
+    def __save_brush_metrics(self, start_time: float, site_infos: list, browse_stats: Dict[int, dict]):
+        """
+        记录并保存刷流周期耗时，browse_total为各站点获取耗时之和，即逐个站点获取时的预计耗时
+        """
+        cycle_time = time.time() - start_time
+        sites = {}
+        for siteinfo in site_infos:
+            browse_stat = browse_stats.get(siteinfo.id) or {}
+            elapsed = browse_stat.get("elapsed")
+            sites[siteinfo.name] = {
+                "elapsed": round(elapsed, 2) if elapsed is not None else None,
+                "timeout": browse_stat.get("timeout", False)
+            }
+        elapsed_list = [site.get("elapsed") for site in sites.values() if site.get("elapsed") is not None]
+        brush_metrics = {
+            "time": time.time(),
+            "cycle_time": round(cycle_time, 2),
+            "browse_total": round(sum(elapsed_list), 2),
+            "browse_max": round(max(elapsed_list, default=0), 2),
+            "sites": sites
+        }
+        logger.info(f"刷流周期耗时 {brush_metrics['cycle_time']} 秒，"
+                    f"站点种子获取最长耗时 {brush_metrics['browse_max']} 秒，"
+                    f"累计耗时 {brush_metrics['browse_total']} 秒")
+        logger.debug(f"站点种子获取耗时明细：{sites}")
+        self.save_data("brush_metrics", brush_metrics)
+
     @staticmethod
     def __is_valid_time_range(time_range: str) -> bool:
         """检查时间范围字符串是否有效：格式为"HH:MM-HH:MM"，且时间有效"""
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.log import logger
+
+
+class BandwidthSampler(object):
+    """
+    下载器带宽后台采样，按下载器保存最近一段时间的上传/下载速率，刷流时直接读取滑动平均值
+    """
+
+    def __init__(self, sample_func: Callable[[], Optional[Dict[str, Tuple[float, float]]]],
+                 interval: float = 3.0, history_size: int = 1200):
+        """
+        :param sample_func: 采样函数，返回 {下载器名称: (上传速率, 下载速率)}，单位 B/s
+        :param interval: 采样间隔（秒）
+        :param history_size: 每个下载器保留的采样数量
+        """
+        self._sample_func = sample_func
+        self._interval = interval
+        self._history_size = history_size
+        # 下载器名称 -> [(采样时间, 上传速率, 下载速率)]
+        self._samples: Dict[str, Deque[Tuple[float, float, float]]] = {}
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        启动后台采样线程
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._event.clear()
+        self._thread = threading.Thread(target=self.__run, name="BrushFlow-Bandwidth", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止后台采样线程
+        """
+        self._event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self._interval + 1)
+        self._thread = None
+
+    def __run(self):
+        while not self._event.is_set():
+            try:
+                speeds = self._sample_func()
+                if speeds:
+                    self.add_samples(speeds)
+            except Exception as e:
+                logger.debug(f"下载器带宽采样失败：{e}")
+            self._event.wait(self._interval)
+
+    def add_samples(self, speeds: Dict[str, Tuple[float, float]], timestamp: float = None):
+        """
+        记录一次采样，同一次采样的所有下载器使用相同的采样时间
+        """
+        timestamp = timestamp or time.time()
+        with self._lock:
+            for name, (upload_speed, download_speed) in speeds.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self._history_size)
+                samples.append((timestamp, upload_speed or 0, download_speed or 0))
+
+    def retain(self, names: Iterable[str]):
+        """
+        只保留指定下载器的采样，已从配置中移除的下载器不再参与平均值及过期判断
+        """
+        names = set(names)
+        with self._lock:
+            for name in [name for name in self._samples if name not in names]:
+                del self._samples[name]
+
+    def get_average(self, window: float, stale: float) -> Tuple[Optional[float], Optional[float]]:
+        """
+        获取所有下载器在最近window秒内的平均上传、下载速率之和
+        任一下载器的最新采样超过stale秒时，认为数据已过期，返回None
+        """
+        now = time.time()
+        total_upload, total_download = 0.0, 0.0
+        with self._lock:
+            if not self._samples:
+                return None, None
+            for samples in self._samples.values():
+                if not samples or now - samples[-1][0] > stale:
+                    return None, None
+                upload_speeds, download_speeds = [], []
+                for timestamp, upload_speed, download_speed in reversed(samples):
+                    if now - timestamp > window:
+                        break
+                    upload_speeds.append(upload_speed)
+                    download_speeds.append(download_speed)
+                if not upload_speeds:
+                    # 窗口内没有采样时，使用最新一次采样
+                    _, upload_speed, download_speed = samples[-1]
+                    upload_speeds, download_speeds = [upload_speed], [download_speed]
+                total_upload += sum(upload_speeds) / len(upload_speeds)
+                total_download += sum(download_speeds) / len(download_speeds)
+        return total_upload, total_download
+
+    def get_history(self, bucket: float = 60) -> List[Tuple[float, float, float]]:
+        """
+        获取所有下载器合计的带宽历史，按bucket秒分组取平均值
+        """
+        totals: Dict[float, List[float]] = {}
+        with self._lock:
+            for samples in self._samples.values():
+                for timestamp, upload_speed, download_speed in samples:
+                    total = totals.setdefault(timestamp, [0.0, 0.0])
+                    total[0] += upload_speed
+                    total[1] += download_speed
+
+        buckets: Dict[float, List[float]] = {}
+        for timestamp, (upload_speed, download_speed) in totals.items():
+            values = buckets.setdefault(timestamp - timestamp % bucket, [0.0, 0.0, 0])
+            values[0] += upload_speed
+            values[1] += download_speed
+            values[2] += 1
+        return [(key, values[0] / values[2], values[1] / values[2]) for key, values in sorted(buckets.items())]
+
+    def clear(self):
+        """
+        清空采样数据
+        """
+        with self._lock:
+            self._samples.clear()
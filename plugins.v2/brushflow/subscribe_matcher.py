@@ -0,0 +1,77 @@
+import hashlib
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class SubscribeMatcher(object):
+    """
+    订阅标题多模式匹配（Aho-Corasick自动机）
+    构建耗时与所有订阅标题的总长度成正比，单次匹配耗时只与待匹配文本长度相关，与订阅数量无关
+    """
+
+    def __init__(self, titles: Iterable[str], version: str = None):
+        self.titles = sorted({title for title in titles if title})
+        self.version = version or self.make_version(self.titles)
+        # 状态转移表、失败指针以及每个状态命中的订阅标题
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+        for title in self.titles:
+            self.__add(title)
+        self.__build()
+
+    @staticmethod
+    def make_version(titles: Iterable[str]) -> str:
+        """
+        根据订阅标题集合生成版本号，标题集合不变时版本号不变
+        """
+        return hashlib.sha1("\n".join(sorted(set(titles))).encode("utf-8")).hexdigest()
+
+    def __add(self, title: str):
+        state = 0
+        for char in title:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            state = next_state
+        if self._output[state] is None:
+            self._output[state] = title
+
+    def __build(self):
+        """
+        按层序计算失败指针，并将失败指针上的命中结果合并到当前状态
+        """
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                if self._output[next_state] is None:
+                    self._output[next_state] = self._output[self._fail[next_state]]
+
+    def search(self, text: str) -> Optional[str]:
+        """
+        返回文本中包含的任一订阅标题，没有命中时返回None
+        """
+        if not text or not self.titles:
+            return None
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+    def __len__(self):
+        return len(self.titles)
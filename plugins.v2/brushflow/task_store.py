@@ -0,0 +1,228 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class BrushTaskStore(object):
+    """
+    刷流任务存储，按种子Hash逐行保存任务，保存时只写入发生变化的任务
+    """
+    # 任务状态，与原插件数据的key保持一致
+    ACTIVE = "torrents"
+    ARCHIVED = "archived"
+    UNMANAGED = "unmanaged"
+
+    def __init__(self, db_path: Path):
+        self._db_path = db_path
+        self._lock = threading.RLock()
+        # 已写入数据库的任务快照，Hash -> (状态, 序列化后的任务)，用于判断任务是否发生变化
+        self._snapshots: Dict[str, tuple] = {}
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self):
+        with self._lock, closing(sqlite3.connect(str(self._db_path), timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def __init_db(self):
+        Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as conn:
+            # 需在建表前设置，删除归档任务后可增量回收空间
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    hash TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    site_name TEXT,
+                    time REAL,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    deleted_time REAL,
+                    uploaded REAL NOT NULL DEFAULT 0,
+                    downloaded REAL NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_time ON tasks (status, time)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_deleted_time ON tasks (status, deleted_time)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @staticmethod
+    def __dumps(task: dict) -> str:
+        return json.dumps(task, ensure_ascii=False, sort_keys=True, default=str)
+
+    def __rows(self, status: str, tasks: Dict[str, dict]) -> List[tuple]:
+        """
+        获取需要写入的任务行，跳过与快照一致的任务
+        """
+        rows = []
+        for torrent_hash, task in tasks.items():
+            data = self.__dumps(task)
+            if self._snapshots.get(torrent_hash) == (status, data):
+                continue
+            rows.append((torrent_hash, status, task.get("site_name"), task.get("time"),
+                         1 if task.get("deleted") else 0, task.get("deleted_time"),
+                         task.get("uploaded") or 0, task.get("downloaded") or 0, data))
+        return rows
+
+    def get_tasks(self, status: str, since: float = None) -> Dict[str, dict]:
+        """
+        获取指定状态的全部任务，指定since时仅获取添加时间不早于since的任务
+        """
+        tasks = {}
+        sql, params = "SELECT hash, data FROM tasks WHERE status = ?", (status,)
+        if since is not None:
+            sql, params = f"{sql} AND time >= ?", (status, since)
+        with self.__connect() as conn:
+            for torrent_hash, data in conn.execute(sql, params):
+                tasks[torrent_hash] = json.loads(data)
+                self._snapshots[torrent_hash] = (status, data)
+        return tasks
+
+    def get_tasks_page(self, status: str, limit: int, offset: int = 0) -> List[dict]:
+        """
+        按添加时间倒序分页获取任务
+        """
+        with self.__connect() as conn:
+            cursor = conn.execute("SELECT data FROM tasks WHERE status = ? ORDER BY time DESC LIMIT ? OFFSET ?",
+                                  (status, limit, offset))
+            return [json.loads(data) for data, in cursor]
+
+    def count(self, status: str) -> int:
+        """
+        获取指定状态的任务数量
+        """
+        with self.__connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tasks WHERE status = ?", (status,)).fetchone()[0]
+
+    def upsert_tasks(self, status: str, tasks: Dict[str, dict]) -> int:
+        """
+        按Hash新增或更新任务，任务原有的状态会被覆盖，返回实际写入的任务数
+        """
+        if not tasks:
+            return 0
+        with self.__connect() as conn:
+            return self.__upsert(conn=conn, status=status, tasks=tasks)
+
+    def save_tasks(self, status: str, tasks: Dict[str, dict]) -> int:
+        """
+        同步指定状态的全部任务，写入发生变化的任务，并删除该状态下已不存在的任务
+        """
+        with self.__connect() as conn:
+            stored_hashes = {torrent_hash for torrent_hash, in
+                             conn.execute("SELECT hash FROM tasks WHERE status = ?", (status,))}
+            self.__delete(conn=conn, hashes=stored_hashes - set(tasks))
+            return self.__upsert(conn=conn, status=status, tasks=tasks)
+
+    def delete_tasks(self, hashes: Iterable[str]):
+        """
+        删除任务
+        """
+        with self.__connect() as conn:
+            self.__delete(conn=conn, hashes=hashes)
+
+    def __upsert(self, conn: sqlite3.Connection, status: str, tasks: Dict[str, dict]) -> int:
+        rows = self.__rows(status=status, tasks=tasks)
+        if rows:
+            conn.executemany("""
+                INSERT INTO tasks (hash, status, site_name, time, deleted, deleted_time, uploaded, downloaded, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(hash) DO UPDATE SET
+                    status = excluded.status, site_name = excluded.site_name, time = excluded.time,
+                    deleted = excluded.deleted, deleted_time = excluded.deleted_time,
+                    uploaded = excluded.uploaded, downloaded = excluded.downloaded, data = excluded.data
+            """, rows)
+            for row in rows:
+                self._snapshots[row[0]] = (status, row[-1])
+        return len(rows)
+
+    def __delete(self, conn: sqlite3.Connection, hashes: Iterable[str]):
+        hashes = list(hashes)
+        if not hashes:
+            return
+        conn.executemany("DELETE FROM tasks WHERE hash = ?", [(torrent_hash,) for torrent_hash in hashes])
+        for torrent_hash in hashes:
+            self._snapshots.pop(torrent_hash, None)
+
+    def get_summary(self, status: str) -> Dict[str, float]:
+        """
+        汇总指定状态的任务数、已删除数、上传量、下载量，包含已压缩清理的历史任务
+        """
+        with self.__connect() as conn:
+            count, deleted, uploaded, downloaded = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(deleted), 0), COALESCE(SUM(uploaded), 0), "
+                "COALESCE(SUM(downloaded), 0) FROM tasks WHERE status = ?", (status,)).fetchone()
+            compacted = self.__get_meta(conn=conn, key=f"compacted_{status}") or {}
+        return {
+            "count": count + compacted.get("count", 0),
+            "deleted": deleted + compacted.get("deleted", 0),
+            "uploaded": uploaded + compacted.get("uploaded", 0),
+            "downloaded": downloaded + compacted.get("downloaded", 0)
+        }
+
+    def compact(self, status: str, before: float) -> int:
+        """
+        清理删除时间早于before的任务，清理前将其汇总数据累加保存，保证统计数据不变，返回清理的任务数
+        没有删除时间及添加时间的任务（旧版本数据），以首次检查到的时间作为删除时间，保留期满后再清理
+        """
+        compacted_key = f"compacted_{status}"
+        condition = "status = ? AND COALESCE(deleted_time, time) < ?"
+        with self.__connect() as conn:
+            conn.execute("UPDATE tasks SET deleted_time = ? WHERE status = ? AND deleted_time IS NULL AND time IS NULL",
+                         (time.time(), status))
+            count, deleted, uploaded, downloaded = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(deleted), 0), COALESCE(SUM(uploaded), 0), "
+                f"COALESCE(SUM(downloaded), 0) FROM tasks WHERE {condition}", (status, before)).fetchone()
+            if not count:
+                return 0
+            hashes = [torrent_hash for torrent_hash, in
+                      conn.execute(f"SELECT hash FROM tasks WHERE {condition}", (status, before))]
+            self.__delete(conn=conn, hashes=hashes)
+            compacted = self.__get_meta(conn=conn, key=compacted_key) or {}
+            self.__set_meta(conn=conn, key=compacted_key, value={
+                "count": compacted.get("count", 0) + count,
+                "deleted": compacted.get("deleted", 0) + deleted,
+                "uploaded": compacted.get("uploaded", 0) + uploaded,
+                "downloaded": compacted.get("downloaded", 0) + downloaded
+            })
+        self.__vacuum()
+        return count
+
+    def __vacuum(self):
+        """
+        回收已删除任务占用的空间，execute 只执行 incremental_vacuum 的第一步，仅释放一页，需通过 executescript 执行完毕
+        """
+        with self.__connect() as conn:
+            conn.executescript("PRAGMA incremental_vacuum")
+
+    def get_meta(self, key: str) -> Optional[Any]:
+        with self.__connect() as conn:
+            return self.__get_meta(conn=conn, key=key)
+
+    def set_meta(self, key: str, value: Any):
+        with self.__connect() as conn:
+            self.__set_meta(conn=conn, key=key, value=value)
+
+    @staticmethod
+    def __get_meta(conn: sqlite3.Connection, key: str) -> Optional[Any]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def __set_meta(conn: sqlite3.Connection, key: str, value: Any):
+        conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                     "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, json.dumps(value)))
+
+    def clear(self):
+        """
+        清空全部任务及汇总数据，保留迁移标记
+        """
+        with self.__connect() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM meta WHERE key LIKE 'compacted_%'")
+            self._snapshots.clear()
+        self.__vacuum()
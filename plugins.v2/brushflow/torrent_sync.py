@@ -0,0 +1,100 @@
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from app.log import logger
+
+
+class TorrentStateSync(object):
+    """
+    下载器种子状态增量同步，在多次检查之间缓存种子快照
+    - qBittorrent：基于 sync/maindata 的 rid 增量同步，仅在首次或服务端要求时全量同步
+    - Transmission：仅查询刷流管理中的种子
+    rid 随每次同步推进，发生变化的种子在检查任务调用 commit 确认处理完成前会在后续同步中继续返回
+    """
+
+    def __init__(self):
+        self._qbc = None
+        self._rid = 0
+        # 种子Hash -> 合并后的种子快照，字段与 torrents/info 返回的字段一致
+        self._torrents: Dict[str, dict] = {}
+        # 尚未确认处理完成的变化种子，None 表示需要全量检查
+        self._pending_hashes: Optional[Set[str]] = None
+
+    def reset(self):
+        """
+        清空缓存，下次同步时全量获取
+        """
+        self._qbc = None
+        self._rid = 0
+        self._torrents = {}
+        self._pending_hashes = None
+
+    def commit(self):
+        """
+        检查任务已处理完本次同步返回的变化种子
+        """
+        self._pending_hashes = set()
+
+    def sync(self, downloader: Any, is_qbittorrent: bool, hashes: Iterable[str]) \
+            -> Tuple[Dict[str, Any], Optional[Set[str]], bool]:
+        """
+        同步种子状态
+        :param downloader: 下载器实例
+        :param is_qbittorrent: 是否为qBittorrent
+        :param hashes: 刷流管理中的种子Hash
+        :return: 种子快照 {hash: torrent}，上次 commit 后发生变化的种子Hash（需全量检查时为None），是否出错
+        """
+        if is_qbittorrent:
+            if downloader.qbc:
+                try:
+                    torrents, changed_hashes = self.__sync_qbittorrent(qbc=downloader.qbc)
+                    return torrents, changed_hashes, False
+                except Exception as e:
+                    logger.warning(f"增量同步下载器种子状态失败，改为全量获取，错误详情: {e}")
+                    self.reset()
+            # 无法增量同步时全量获取，以便同步种子刷流标签
+            torrents, error = downloader.get_torrents()
+            if error:
+                return {}, None, True
+            self._pending_hashes = None
+            return {torrent.get("hash"): torrent for torrent in torrents or []}, None, False
+
+        hashes = list(hashes)
+        if not hashes:
+            return {}, None, False
+        torrents, error = downloader.get_torrents(ids=hashes)
+        if error:
+            return {}, None, True
+        return {torrent.hashString: torrent for torrent in torrents or []}, None, False
+
+    def __sync_qbittorrent(self, qbc: Any) -> Tuple[Dict[str, dict], Optional[Set[str]]]:
+        # 下载器重新连接后服务端会话已变化，需要重新全量同步
+        if qbc is not self._qbc:
+            self.reset()
+            self._qbc = qbc
+
+        maindata = qbc.sync_maindata(rid=self._rid)
+        full_update = bool(maindata.get("full_update"))
+        if full_update:
+            self._torrents = {}
+
+        changed_hashes = set()
+        for torrent_hash, changes in (maindata.get("torrents") or {}).items():
+            torrent = self._torrents.get(torrent_hash)
+            if torrent is None:
+                torrent = self._torrents[torrent_hash] = {"hash": torrent_hash}
+            torrent.update(changes)
+            changed_hashes.add(torrent_hash)
+        for torrent_hash in maindata.get("torrents_removed") or []:
+            self._torrents.pop(torrent_hash, None)
+            changed_hashes.add(torrent_hash)
+
+        # 合并到未确认的变化种子中，检查失败时下次同步继续返回
+        if full_update:
+            self._pending_hashes = None
+        elif self._pending_hashes is not None:
+            self._pending_hashes |= changed_hashes
+
+        self._rid = maindata.get("rid") or 0
+        logger.debug(f"增量同步下载器种子状态完成，rid={self._rid}，全量={full_update}，"
+                     f"变化种子数 {len(changed_hashes)}，缓存种子数 {len(self._torrents)}")
+        return dict(self._torrents), None if self._pending_hashes is None else set(self._pending_hashes)
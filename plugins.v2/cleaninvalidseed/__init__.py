@@ -1,6 +1,5 @@
 import glob
 import os
-import shutil
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -15,6 +14,9 @@ from app.core.event import eventmanager, Event
 
 from app.core.config import settings
 from app.plugins import _PluginBase
+from app.plugins.cleaninvalidseed.path_trie import PathTrie
+from app.plugins.cleaninvalidseed.size_scanner import SizeScanner
+from app.plugins.cleaninvalidseed.tracker_classifier import TrackerClassifier
 from typing import Any, List, Dict, Tuple, Optional
 from app.log import logger
 from app.schemas import NotificationType
@@ -28,7 +30,7 @@ class CleanInvalidSeed(_PluginBase):
     # 插件图标
     plugin_icon = "clean_a.png"
     # 插件版本
-    plugin_version = "2.0"
+    plugin_version = "2.3"
     # 插件作者
     plugin_author = "DzAvril"
     # 作者主页
@@ -65,6 +67,8 @@ class CleanInvalidSeed(_PluginBase):
         "err torrent banned",
     ]
     _custom_error_msg = ""
+    # 并发统计源文件体积的线程数
+    _scan_workers = 4
 
     def init_plugin(self, config: dict = None):
         self.downloader_helper = DownloaderHelper()
@@ -347,7 +351,9 @@ class CleanInvalidSeed(_PluginBase):
                 logger.error(f"{self.LOG_TAG} 获取下载器失败 {downloader_name}")
                 continue
             logger.info(f"开始清理 {downloader_name} 无效做种...")
+            start_time = time.time()
             all_torrents = self.get_all_torrents(service)
+            fetch_time = time.time() - start_time
             temp_invalid_torrents = []
             # tracker未工作，但暂时不能判定为失效做种，需人工判断
             tracker_not_working_torrents = []
@@ -361,30 +367,32 @@ class CleanInvalidSeed(_PluginBase):
             custom_msgs = (
                 self._custom_error_msg.split("\n") if self._custom_error_msg else []
             )
-            error_msgs = self._error_msg + custom_msgs
-            # 第一轮筛选出所有未工作的种子
+            classifier = TrackerClassifier(error_msgs=self._error_msg + custom_msgs)
+            classify_start = time.time()
+            # 第一轮筛选出所有未工作的种子，同时记录无效种子的tracker域名及信息，第二轮无需再次解析
             for torrent in all_torrents:
-                trackers = torrent.trackers
                 is_invalid = True
                 is_tracker_working = False
-                for tracker in trackers:
+                torrent_trackers = []
+                for tracker in torrent.trackers:
                     if tracker.get("tier") == -1:
                         continue
-                    tracker_domian = StringUtils.get_url_netloc((tracker.get("url")))[1]
+                    tracker_domian = classifier.get_domain(tracker.get("url"))
+                    tracker_status = tracker.get("status")
+                    tracker_msg = tracker.get("msg")
+                    torrent_trackers.append((tracker_domian, tracker_msg))
                     # 有一个tracker工作即为有效做种
-                    if (tracker.get("status") == 2) or (tracker.get("status") == 3):
+                    if tracker_status in (2, 3):
                         is_tracker_working = True
 
-                    if not (
-                        (tracker.get("status") == 4) and (tracker.get("msg") in error_msgs)
-                    ):
+                    if not (tracker_status == 4 and classifier.is_error_msg(tracker_msg)):
                         is_invalid = False
                         working_tracker_set.add(tracker_domian)
 
                     if self._more_logs:
-                        logger.info(f"处理 [{torrent.name}] tracker [{tracker_domian}]: 分类: [{torrent.category}], 标签: [{torrent.tags}], 状态: [{tracker.get('status')}], msg: [{tracker.get('msg')}], is_invalid: [{is_invalid}], is_working: [{is_tracker_working}]")
+                        logger.info(f"处理 [{torrent.name}] tracker [{tracker_domian}]: 分类: [{torrent.category}], 标签: [{torrent.tags}], 状态: [{tracker_status}], msg: [{tracker_msg}], is_invalid: [{is_invalid}], is_working: [{is_tracker_working}]")
                 if is_invalid:
-                    temp_invalid_torrents.append(torrent)
+                    temp_invalid_torrents.append((torrent, torrent_trackers))
                 elif not is_tracker_working:
                     # 排除已暂停的种子
                     if not torrent.state_enum.is_paused:
@@ -399,12 +407,10 @@ class CleanInvalidSeed(_PluginBase):
             # 将invalid_torrents基本信息保存起来，在种子被删除后依然可以打印这些信息
             invalid_torrent_tuple_list = []
             deleted_torrent_tuple_list = []
-            for torrent in temp_invalid_torrents:
-                trackers = torrent.trackers
-                for tracker in trackers:
-                    if tracker.get("tier") == -1:
-                        continue
-                    tracker_domian = StringUtils.get_url_netloc((tracker.get("url")))[1]
+            # 需要标记或删除的种子，批量处理
+            processed_hashes = []
+            for torrent, torrent_trackers in temp_invalid_torrents:
+                for tracker_domian, tracker_msg in torrent_trackers:
                     if tracker_domian in working_tracker_set:
                         # tracker是正常的，说明该种子是无效的
                         invalid_torrent_tuple_list.append(
@@ -414,7 +420,7 @@ class CleanInvalidSeed(_PluginBase):
                                 torrent.tags,
                                 torrent.size,
                                 tracker_domian,
-                                tracker.msg,
+                                tracker_msg,
                             )
                         )
                         if self._delete_invalid_torrents or self._label_only:
@@ -431,12 +437,7 @@ class CleanInvalidSeed(_PluginBase):
                                     is_excluded = True
                                     invalid_torrents_exclude_labels.append(torrent)
                             if not is_excluded:
-                                if self._label_only:
-                                    # 仅标记
-                                    downloader_obj.set_torrents_tag(ids=torrent.get("hash"), tags=[self._label if self._label != "" else "无效做种"])
-                                else:
-                                    # 只删除种子不删除文件，以防其它站点辅种
-                                    downloader_obj.delete_torrents(False, torrent.get("hash"))
+                                processed_hashes.append(torrent.get("hash"))
                                 # 标记已处理种子信息
                                 deleted_torrent_tuple_list.append(
                                         (
@@ -445,10 +446,22 @@ class CleanInvalidSeed(_PluginBase):
                                             torrent.tags,
                                             torrent.size,
                                             tracker_domian,
-                                            tracker.msg,
+                                            tracker_msg,
                                         )
                                     )
                         break
+            classify_time = time.time() - classify_start
+            process_start = time.time()
+            if processed_hashes:
+                if self._label_only:
+                    # 仅标记
+                    downloader_obj.set_torrents_tag(ids=processed_hashes, tags=[self._label if self._label != "" else "无效做种"])
+                else:
+                    # 只删除种子不删除文件，以防其它站点辅种
+                    downloader_obj.delete_torrents(False, processed_hashes)
+            process_time = time.time() - process_start
+            logger.info(f"下载器 {downloader_name} 共 {len(all_torrents)} 个种子，获取种子耗时 {fetch_time:.2f} 秒，"
+                        f"筛选耗时 {classify_time:.2f} 秒，标记或删除 {len(processed_hashes)} 个种子耗时 {process_time:.2f} 秒")
             invalid_msg = f"检测到{len(invalid_torrent_tuple_list)}个失效做种\n"
             tracker_not_working_msg = f"检测到{len(tracker_not_working_torrents)}个tracker未工作做种，请检查种子状态\n"
 
@@ -472,7 +485,7 @@ class CleanInvalidSeed(_PluginBase):
                 for tracker in trackers:
                     if tracker.get("tier") == -1:
                         continue
-                    tracker_domian = StringUtils.get_url_netloc((tracker.get("url")))[1]
+                    tracker_domian = classifier.get_domain(tracker.get("url"))
                     tracker_msg += f" {tracker_domian}：{tracker.msg} "
                 tracker_not_working_msg += f"{index + 1}. {torrent.name}，分类：{torrent.category}，标签：{torrent.tags}, 大小：{StringUtils.str_filesize(torrent.size)}，Trackers: {tracker_msg}\n"
 
@@ -483,7 +496,7 @@ class CleanInvalidSeed(_PluginBase):
                 for tracker in trackers:
                     if tracker.get("tier") == -1:
                         continue
-                    tracker_domian = StringUtils.get_url_netloc((tracker.get("url")))[1]
+                    tracker_domian = classifier.get_domain(tracker.get("url"))
                     tracker_msg += f" {tracker_domian}：{tracker.msg} "
                 exclude_categories_msg += f"{index + 1}. {torrent.name}，分类：{torrent.category}，标签：{torrent.tags}, 大小：{StringUtils.str_filesize(torrent.size)}，Trackers: {tracker_msg}\n"
 
@@ -494,7 +507,7 @@ class CleanInvalidSeed(_PluginBase):
                 for tracker in trackers:
                     if tracker.get("tier") == -1:
                         continue
-                    tracker_domian = StringUtils.get_url_netloc((tracker.get("url")))[1]
+                    tracker_domian = classifier.get_domain(tracker.get("url"))
                     tracker_msg += f" {tracker_domian}：{tracker.msg} "
                 exclude_labels_msg += f"{index + 1}. {torrent.name}，分类：{torrent.category}，标签：{torrent.tags}, 大小：{StringUtils.str_filesize(torrent.size)}，Trackers: {tracker_msg}\n"
 
@@ -582,12 +595,11 @@ class CleanInvalidSeed(_PluginBase):
             mp_path, qb_path = path.split(":")
             source_path_map[mp_path] = qb_path
             source_paths.append(mp_path)
-        # 所有做种源文件路径
-        content_path_set = set()
-        for torrent in all_torrents:
-            content_path_set.add(torrent.content_path)
+        # 所有做种源文件路径，按路径层级建立索引
+        content_path_trie = PathTrie(torrent.content_path for torrent in all_torrents)
 
         message = "检测未做种无效源文件：\n"
+        invalid_files = []
         for source_path_str in source_paths:
             source_path = Path(source_path_str)
             # 判断source_path是否存在
@@ -616,22 +628,23 @@ class CleanInvalidSeed(_PluginBase):
                 qb_path = (str(source_file)).replace(
                     source_path_str, source_path_map[source_path_str]
                 )
-                # todo: 优化性能
-                is_exist = False
-                for content_path in content_path_set:
-                    if qb_path in content_path:
-                        is_exist = True
-                        break
-
-                if not is_exist:
-                    deleted_file_cnt += 1
-                    message += f"{deleted_file_cnt}. {str(source_file)}\n"
-                    total_size += self.get_size(source_file)
-                    if self._delete_invalid_files:
-                        if source_file.is_file():
-                            source_file.unlink()
-                        elif source_file.is_dir():
-                            shutil.rmtree(source_file)
+                # 源文件本身或其下级路径为任一做种内容路径时，说明正在做种
+                if not content_path_trie.contains(qb_path):
+                    invalid_files.append(source_file)
+
+        # 并发统计无效源文件体积，删除时复用扫描结果
+        scan_start = time.time()
+        scanner = SizeScanner(max_workers=self._scan_workers)
+        scan_results = scanner.scan(invalid_files)
+        scan_time = time.time() - scan_start
+        for source_file in invalid_files:
+            scan_result = scan_results[source_file]
+            deleted_file_cnt += 1
+            message += f"{deleted_file_cnt}. {str(source_file)}\n"
+            total_size += scan_result.size
+            if self._delete_invalid_files:
+                scanner.delete(scan_result)
+        logger.info(f"统计 {len(invalid_files)} 个无效源文件体积耗时 {scan_time:.2f} 秒")
 
         message += f"检测到{deleted_file_cnt}个未做种的无效源文件，共占用{StringUtils.str_filesize(total_size)}空间。\n"
         if self._delete_invalid_files:
@@ -647,14 +660,7 @@ class CleanInvalidSeed(_PluginBase):
         logger.info("检测无效源文件任务结束")
 
     def get_size(self, path: Path):
-        total_size = 0
-        if path.is_file():
-            return path.stat().st_size
-        # rglob 方法用于递归遍历所有文件和目录
-        for entry in path.rglob("*"):
-            if entry.is_file():
-                total_size += entry.stat().st_size
-        return total_size
+        return SizeScanner.scan_path(path).size
 
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         return [
@@ -0,0 +1,52 @@
+from typing import Dict, Iterable, List
+
+
+class PathTrie(object):
+    """
+    按路径层级构建的前缀树，用于判断某个路径是否为任一做种内容路径本身或其上级目录
+    查询耗时只与待查询路径的层级深度相关，与做种数量无关
+    """
+
+    def __init__(self, paths: Iterable[str] = None):
+        self._root: Dict[str, dict] = {}
+        self._size = 0
+        for path in paths or []:
+            self.add(path)
+
+    @staticmethod
+    def split(path: str) -> List[str]:
+        """
+        规范化路径并按层级拆分，兼容Windows路径分隔符及末尾的分隔符
+        """
+        if not path:
+            return []
+        return [part for part in str(path).replace("\\", "/").split("/") if part and part != "."]
+
+    def add(self, path: str):
+        """
+        添加做种内容路径
+        """
+        parts = self.split(path)
+        if not parts:
+            return
+        node = self._root
+        for part in parts:
+            node = node.setdefault(part, {})
+        self._size += 1
+
+    def contains(self, path: str) -> bool:
+        """
+        判断路径本身或其下级路径是否为做种内容路径
+        """
+        parts = self.split(path)
+        if not parts:
+            return False
+        node = self._root
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                return False
+        return True
+
+    def __len__(self):
+        return self._size
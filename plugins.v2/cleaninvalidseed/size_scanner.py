@@ -0,0 +1,103 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from app.log import logger
+
+
+class ScanResult(object):
+    """
+    单个路径的扫描结果，删除时直接复用，无需再次遍历
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.size = 0
+        self.is_dir = False
+        # 文件及符号链接
+        self.files: List[str] = []
+        # 目录，子目录在前
+        self.dirs: List[str] = []
+
+
+class SizeScanner(object):
+    """
+    源文件体积统计，使用 os.scandir 遍历一次，多个路径并发扫描
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._max_workers = max(1, max_workers)
+
+    def scan(self, paths: Iterable[Path]) -> Dict[Path, ScanResult]:
+        """
+        并发扫描多个路径，返回每个路径的扫描结果
+        """
+        paths = list(paths)
+        if not paths:
+            return {}
+        if len(paths) == 1 or self._max_workers == 1:
+            return {path: self.scan_path(path) for path in paths}
+        with ThreadPoolExecutor(max_workers=min(len(paths), self._max_workers),
+                                thread_name_prefix="CleanInvalidSeed-Scan") as executor:
+            return dict(zip(paths, executor.map(self.scan_path, paths)))
+
+    @staticmethod
+    def scan_path(path: Path) -> ScanResult:
+        """
+        扫描单个路径，统计文件总大小，不跟随符号链接
+        """
+        result = ScanResult(path)
+        try:
+            if not path.is_dir() or path.is_symlink():
+                result.files.append(str(path))
+                if path.is_file() and not path.is_symlink():
+                    result.size = path.stat().st_size
+                return result
+        except OSError as e:
+            logger.warn(f"获取 {path} 信息失败：{e}")
+            return result
+
+        result.is_dir = True
+        # 栈中为 (目录, 是否已遍历子项)，子项遍历完成后再记录目录，保证子目录排在父目录之前
+        stack = [(str(path), False)]
+        while stack:
+            current, visited = stack.pop()
+            if visited:
+                result.dirs.append(current)
+                continue
+            stack.append((current, True))
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append((entry.path, False))
+                            else:
+                                result.files.append(entry.path)
+                                if entry.is_file(follow_symlinks=False):
+                                    result.size += entry.stat(follow_symlinks=False).st_size
+                        except OSError as e:
+                            logger.warn(f"获取 {entry.path} 信息失败：{e}")
+            except OSError as e:
+                logger.warn(f"遍历目录 {current} 失败：{e}")
+        return result
+
+    @staticmethod
+    def delete(result: ScanResult):
+        """
+        按扫描结果删除文件及目录，扫描后新增的文件导致目录无法删除时，再整体删除该目录
+        """
+        for file in result.files:
+            try:
+                os.unlink(file)
+            except FileNotFoundError:
+                pass
+        for directory in result.dirs:
+            try:
+                os.rmdir(directory)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,34 @@
+from typing import Dict, Iterable, Optional
+
+from app.utils.string import StringUtils
+
+
+class TrackerClassifier(object):
+    """
+    Tracker状态分类器，错误信息列表在创建时编译一次，并按Tracker返回的信息及地址缓存判断结果
+    大量种子的Tracker信息相同，同一信息只需判断一次
+    """
+
+    def __init__(self, error_msgs: Iterable[str]):
+        # 忽略大小写及首尾空白进行完整匹配
+        self._error_msgs = frozenset(msg.strip().lower() for msg in error_msgs if msg and msg.strip())
+        self._verdicts: Dict[Optional[str], bool] = {}
+        self._domains: Dict[Optional[str], str] = {}
+
+    def is_error_msg(self, msg: Optional[str]) -> bool:
+        """
+        判断Tracker返回的信息是否为种子失效的错误信息
+        """
+        verdict = self._verdicts.get(msg)
+        if verdict is None:
+            verdict = self._verdicts[msg] = bool(msg) and msg.strip().lower() in self._error_msgs
+        return verdict
+
+    def get_domain(self, url: Optional[str]) -> str:
+        """
+        获取Tracker地址的域名
+        """
+        domain = self._domains.get(url)
+        if domain is None:
+            domain = self._domains[url] = StringUtils.get_url_netloc(url)[1]
+        return domain
@@ -2,6 +2,7 @@ import hashlib
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Event
@@ -21,6 +22,8 @@ from app.helper.sites import SitesHelper
 from app.helper.torrent import TorrentHelper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.crossseed.seed_cache import SeedCaches
+from app.plugins.crossseed.torrent_index import TorrentIndex
 from app.schemas import NotificationType, ServiceInfo
 from app.schemas.types import EventType
 from app.utils.string import StringUtils
@@ -79,6 +82,8 @@ class TorInfo:
         self.pieces_hash = pieces_hash
         self.torrent_id = torrent_id
         self.torrent_announce = None
+        self.name = None
+        self.size = None
 
     @staticmethod
     def local(torrent_path: str, info_hash: str, pieces_hash: str):
@@ -105,10 +110,40 @@ class TorInfo:
             # 从种子中获取 announce, qb可能存在获取不到的情况，会存在于fastresume文件中
             if "announce" in torrent:
                 local_tor.torrent_announce = torrent["announce"]
+            name = info.get("name")
+            local_tor.name = name.decode("utf-8", "ignore") if isinstance(name, bytes) else name
+            if "length" in info:
+                local_tor.size = info["length"]
+            else:
+                local_tor.size = sum(file.get("length", 0) for file in info.get("files") or [])
             return local_tor, None
         except Exception as err:
             return None, str(err)
 
+    @staticmethod
+    def from_meta(meta: dict) -> "TorInfo":
+        """
+        从种子索引的元数据还原种子信息
+        """
+        local_tor = TorInfo(info_hash=meta.get("info_hash"), pieces_hash=meta.get("pieces_hash"))
+        local_tor.torrent_announce = meta.get("announce")
+        local_tor.name = meta.get("name")
+        local_tor.size = meta.get("size")
+        return local_tor
+
+    def to_meta(self) -> dict:
+        """
+        转换为种子索引的元数据
+        """
+        announce = self.torrent_announce
+        return {
+            "info_hash": self.info_hash,
+            "pieces_hash": self.pieces_hash,
+            "name": self.name,
+            "size": self.size,
+            "announce": announce.decode("utf-8", "ignore") if isinstance(announce, bytes) else announce
+        }
+
     def get_name_id_tag(self):
         return f"{self.site_name}:{self.torrent_id}"
 
@@ -120,28 +155,46 @@ class CrossSeedHelper(object):
     _version = "0.2.0"
 
     @staticmethod
-    def get_local_torrent_info(torrent_path: Path | str) -> Tuple[Optional[TorInfo], str]:
+    def get_local_torrent_info(torrent_path: Path | str,
+                               torrent_index: Optional[TorrentIndex] = None) -> Tuple[Optional[TorInfo], str]:
+        """
+        读取本地种子文件信息，指定种子索引时，文件未变化的种子直接从索引中获取
+        """
         try:
-            if isinstance(torrent_path, Path):
-                torrent_data = torrent_path.read_bytes()
+            file_size, mtime, meta = None, None, None
+            if torrent_index:
+                file_size, mtime = torrent_index.stat(str(torrent_path))
+                meta = torrent_index.get(str(torrent_path), file_size=file_size, mtime=mtime)
+            if meta:
+                local_tor = TorInfo.from_meta(meta)
             else:
-                with open(torrent_path, "rb") as f:
-                    torrent_data = f.read()
-            local_tor, err = TorInfo.from_data(torrent_data)
-            if not local_tor:
-                return None, err
+                if isinstance(torrent_path, Path):
+                    torrent_data = torrent_path.read_bytes()
+                else:
+                    with open(torrent_path, "rb") as f:
+                        torrent_data = f.read()
+                local_tor, err = TorInfo.from_data(torrent_data)
+                if not local_tor:
+                    return None, err
+                if torrent_index:
+                    torrent_index.put(str(torrent_path), file_size=file_size, mtime=mtime, meta=local_tor.to_meta())
             local_tor.torrent_path = str(torrent_path)
             return local_tor, ""
         except Exception as err:
             return None, str(err)
 
+    # 单个站点连续查询失败多少次后放弃该站点本次查询
+    _max_failures = 3
+
     @staticmethod
     def get_target_torrent(
             site: CSSiteConfig,
-            pieces_hash_set: List[str]
+            pieces_hash_set: List[str],
+            session: Optional[requests.Session] = None
     ) -> Tuple[Optional[List[TorInfo]], Optional[str]]:
         """
         返回pieces_hash对应的种子信息，包括站点id,pieces_hash,种子id
+        指定session时复用其连接，请求间隔由调用方控制
         """
         headers = {
             "Content-Type": "application/json",
@@ -151,7 +204,7 @@ class CrossSeedHelper(object):
         data = {"passkey": site.passkey, "pieces_hash": pieces_hash_set}
         remote_torrent_infos = []
         try:
-            response = requests.post(
+            response = (session or requests).post(
                 site.get_api_url(),
                 headers=headers,
                 json=data,
@@ -165,11 +218,60 @@ class CrossSeedHelper(object):
                     remote_torrent_infos.append(
                         TorInfo.remote(site.name, pieces_hash, torrent_id)
                     )
-            time.sleep(site.query_gap)
-        except requests.exceptions.RequestException as e:
+            if not session:
+                time.sleep(site.query_gap)
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
             return None, f"站点{site.name}请求失败：{e}"
         return remote_torrent_infos, None
 
+    def query_site(
+            self,
+            site: CSSiteConfig,
+            pieces_hashes: List[str],
+            chunk_size: int,
+            stop_event: Event
+    ) -> Tuple[List[TorInfo], Dict[str, Any]]:
+        """
+        分批查询单个站点可辅种的种子，同一站点的请求复用连接并按站点的请求间隔依次发送
+        返回可辅种的种子信息及查询耗时统计
+        """
+        remote_tors: List[TorInfo] = []
+        stats = {"requests": 0, "errors": 0, "matched": 0, "request_time": 0.0, "elapsed": 0.0, "aborted": False}
+        start_time = time.time()
+        total_size = len(pieces_hashes)
+        failures = 0
+        with requests.Session() as session:
+            for i in range(0, total_size, chunk_size):
+                if stop_event.is_set():
+                    break
+                # 按站点设置的请求间隔发送下一批次请求，停止服务时立即退出等待
+                if i and stop_event.wait(site.query_gap):
+                    break
+                chunk = pieces_hashes[i:i + chunk_size]
+                request_start = time.time()
+                chunk_tors, err_msg = self.get_target_torrent(site, chunk, session=session)
+                stats["requests"] += 1
+                stats["request_time"] += time.time() - request_start
+                if not chunk_tors and err_msg:
+                    stats["errors"] += 1
+                    failures += 1
+                    logger.info(
+                        f"查询站点{site.name}可辅种的信息出错 {err_msg},进度={i + 1}/{total_size}"
+                    )
+                    if failures >= self._max_failures:
+                        stats["aborted"] = True
+                        logger.warn(f"站点{site.name}连续查询失败 {failures} 次，跳过该站点本次辅种查询")
+                        break
+                else:
+                    failures = 0
+                    logger.info(
+                        f"站点{site.name}本批次的可辅种/查询数={len(chunk_tors)}/{len(chunk)},进度={i + 1}/{total_size}"
+                    )
+                    remote_tors.extend(chunk_tors)
+        stats["matched"] = len(remote_tors)
+        stats["elapsed"] = time.time() - start_time
+        return remote_tors, stats
+
 
 class CrossSeed(_PluginBase):
     # 插件名称
@@ -179,7 +281,7 @@ class CrossSeed(_PluginBase):
     # 插件图标
     plugin_icon = "qingwa.png"
     # 插件版本
-    plugin_version = "3.0.1"
+    plugin_version = "3.3"
     # 插件作者
     plugin_author = "233@qingwa"
     # 作者主页
@@ -216,14 +318,19 @@ class CrossSeed(_PluginBase):
     # 待校全种子hash清单
     _recheck_torrents = {}
     _is_recheck_running = False
-    # 辅种缓存，出错的种子不再重复辅种，可清除
-    _error_caches = []
-    # 辅种缓存，辅种成功的种子，可清除
-    _success_caches = []
-    # 辅种缓存，出错的种子不再重复辅种，且无法清除。种子被删除404等情况
-    _permanent_error_caches = []
+    # 辅种缓存，包括辅种成功、暂时性失败（过期后重试）以及种子被删除404等永久失败的种子
+    _caches: Optional[SeedCaches] = None
+    # 暂时性失败缓存的过期时间（秒）及容量上限
+    _error_cache_ttl = 7 * 86400
+    _error_cache_size = 100000
     _torrentpaths = []
     _site_cs_infos = []
+    # 并发查询的站点数
+    _query_max_workers = 8
+    # 单次查询的种子数
+    _query_chunk_size = 100
+    # 本地种子文件元数据索引
+    _torrent_index: Optional[TorrentIndex] = None
     # 辅种计数
     total = 0
     realtotal = 0
@@ -237,6 +344,9 @@ class CrossSeed(_PluginBase):
         self.siteoper = SiteOper()
         self.torrent = TorrentHelper()
         self.downloader_helper = DownloaderHelper()
+        self._torrent_index = TorrentIndex(self.get_data_path() / "torrent_index.db")
+        self._caches = SeedCaches(data=self.get_data("caches"), error_ttl=self._error_cache_ttl,
+                                  error_max_size=self._error_cache_size)
         # 读取配置
         if config:
             self._enabled = config.get("enabled")
@@ -252,9 +362,13 @@ class CrossSeed(_PluginBase):
             self._nolabels = config.get("nolabels")
             self._nopaths = config.get("nopaths")
             self._clearcache = config.get("clearcache")
-            self._permanent_error_caches = [] if self._clearcache else config.get("permanent_error_caches") or []
-            self._error_caches = [] if self._clearcache else config.get("error_caches") or []
-            self._success_caches = [] if self._clearcache else config.get("success_caches") or []
+            # 兼容旧版本保存在插件配置中的缓存列表，合并后不再保存到配置中
+            self._caches.merge(success=config.get("success_caches"),
+                               error=config.get("error_caches"),
+                               permanent_error=config.get("permanent_error_caches"))
+            if self._clearcache:
+                self._caches.clear()
+            self.__save_caches()
 
             # 过滤掉已删除的站点
             inner_site_list = self.siteoper.list_order_by_pri()
@@ -757,12 +871,15 @@ class CrossSeed(_PluginBase):
             "sites": self._sites,
             "notify": self._notify,
             "nolabels": self._nolabels,
-            "nopaths": self._nopaths,
-            "success_caches": self._success_caches,
-            "error_caches": self._error_caches,
-            "permanent_error_caches": self._permanent_error_caches
+            "nopaths": self._nopaths
         })
 
+    def __save_caches(self):
+        """
+        保存辅种缓存
+        """
+        self.save_data("caches", self._caches.to_dict())
+
     def auto_seed(self):
         """
         开始辅种
@@ -798,7 +915,7 @@ class CrossSeed(_PluginBase):
                     return
                     # 获取种子hash
                 hash_str = self.__get_hash(torrent, service.type)
-                if hash_str in self._error_caches or hash_str in self._permanent_error_caches:
+                if self._caches.is_error(hash_str):
                     logger.info(f"种子 {hash_str} 辅种失败且已缓存，跳过 ...")
                     continue
                 save_path = self.__get_save_path(torrent, service.type)
@@ -824,7 +941,8 @@ class CrossSeed(_PluginBase):
 
                 # 读取种子文件具体信息
                 if not torrent_info:
-                    torrent_info, err = self.cross_helper.get_local_torrent_info(torrent_path)
+                    torrent_info, err = self.cross_helper.get_local_torrent_info(torrent_path,
+                                                                                 torrent_index=self._torrent_index)
                     if not torrent_info:
                         logger.error(f"未能读取到种子文件具体信息：{torrent_path} {err}")
                         continue
@@ -883,6 +1001,12 @@ class CrossSeed(_PluginBase):
                     "save_path": save_path,
                     "torrent_info": torrent_info
                 })
+            # 保存种子索引，并清理已删除的种子文件记录
+            self._torrent_index.flush()
+            pruned = self._torrent_index.prune(self._torrentpaths[idx])
+            logger.info(f"下载器 {downloader} 种子索引命中 {self._torrent_index.hits} 个，"
+                        f"重新解析 {self._torrent_index.misses} 个，清理 {pruned} 个")
+            self._torrent_index.reset_stats()
             if hash_strs:
                 self.__seed_torrents(hash_strs=hash_strs, service=service)
                 # 触发校验检查
@@ -890,7 +1014,7 @@ class CrossSeed(_PluginBase):
             else:
                 logger.info("没有需要辅种的种子")
         # 保存缓存
-        self.__update_config()
+        self.__save_caches()
         # 发送消息
         if self._notify:
             if self.success or self.fail:
@@ -978,73 +1102,86 @@ class CrossSeed(_PluginBase):
         logger.info(f"去重后，总共需要辅种查询的种子数：{len(pieces_hash_set)}")
         pieces_hashes = list(pieces_hash_set)
 
-        # 分站点逐个批次辅种
-        # 逐个站点查询可辅种数据
-        chunk_size = 100
+        # 过滤已经停用的站点
+        site_configs = []
         for site_config in self._site_cs_infos:
-            # 检查站点是否已经停用
             db_site = self.siteoper.get(site_config.id)
             if db_site and not db_site.is_active:
                 logger.info(f"站点{site_config.name}已停用，跳过辅种")
                 continue
-            remote_tors: List[TorInfo] = []
-            total_size = len(pieces_hashes)
-            for i in range(0, len(pieces_hashes), chunk_size):
-                if self._event.is_set():
-                    logger.info("辅种服务停止")
-                    return
-                # 切片操作
-                chunk = pieces_hashes[i:i + chunk_size]
-                # 处理分组
-                chunk_tors, err_msg = self.cross_helper.get_target_torrent(site_config, chunk)
-                if not chunk_tors and err_msg:
-                    logger.info(
-                        f"查询站点{site_config.name}可辅种的信息出错 {err_msg},进度={i + 1}/{total_size}"
-                    )
-                else:
-                    logger.info(
-                        f"站点{site_config.name}本批次的可辅种/查询数={len(chunk_tors)}/{len(chunk)},进度={i + 1}/{total_size}"
-                    )
-                    remote_tors = remote_tors + chunk_tors
-
-            logger.info(f"站点{site_config.name}返回可以辅种的种子总数为{len(remote_tors)}")
-
-            # 去除已经下载过的种子
-            local_cnt = 0
-            not_local_tors = []
-            for tor_info in remote_tors:
-                if (
-                        tor_info
-                        and tor_info.site_name
-                        and tor_info.pieces_hash
-                        and tor_info.get_name_pieces_tag() in site_pieces_hash_set
-                ):
-                    local_cnt = local_cnt + 1
-                else:
-                    not_local_tors.append(tor_info)
-            logger.info(f"站点{site_config.name}正在做种或已经辅种过的种子数为{local_cnt}")
+            site_configs.append(site_config)
+        if not site_configs:
+            return
 
-            for tor_info in not_local_tors:
+        # 各站点并发查询可辅种数据，同一站点内按请求间隔逐个批次查询，先完成查询的站点先开始辅种
+        query_stats = {}
+        executor = ThreadPoolExecutor(max_workers=min(len(site_configs), self._query_max_workers),
+                                      thread_name_prefix="CrossSeed-Query")
+        try:
+            futures = {executor.submit(self.cross_helper.query_site, site_config, pieces_hashes,
+                                       self._query_chunk_size, self._event): site_config
+                       for site_config in site_configs}
+            for future in as_completed(futures):
                 if self._event.is_set():
                     logger.info("辅种服务停止")
                     return
-                if not tor_info:
-                    continue
-                if not tor_info.torrent_id or not tor_info.pieces_hash:
-                    continue
-                if tor_info.get_name_id_tag() in self._success_caches:
-                    logger.info(f"{tor_info.get_name_id_tag()} 已处理过辅种，跳过 ...")
-                    continue
-                if tor_info.get_name_id_tag() in self._error_caches or tor_info.get_name_id_tag() in self._permanent_error_caches:
-                    logger.info(f"种子 {tor_info.get_name_id_tag()} 辅种失败且已缓存，跳过 ...")
+                site_config = futures[future]
+                try:
+                    remote_tors, site_stats = future.result()
+                except Exception as e:
+                    logger.error(f"查询站点{site_config.name}可辅种的信息出错 {e}")
                     continue
-                # 添加任务
-                self.__download_torrent(tor=tor_info, site_config=site_config,
-                                        service=service,
-                                        save_path=save_paths.get(tor_info.pieces_hash))
+                query_stats[site_config.name] = site_stats
+                logger.info(f"站点{site_config.name}返回可以辅种的种子总数为{len(remote_tors)}，"
+                            f"请求 {site_stats.get('requests')} 次，失败 {site_stats.get('errors')} 次，"
+                            f"耗时 {site_stats.get('elapsed'):.1f} 秒")
+                self.__seed_site_torrents(remote_tors=remote_tors, site_config=site_config, service=service,
+                                          save_paths=save_paths, site_pieces_hash_set=site_pieces_hash_set)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.save_data("query_stats", {"time": time.time(), "downloader": service.name, "sites": query_stats})
 
         logger.info(f"下载器 {service.name} 辅种完成")
 
+    def __seed_site_torrents(self, remote_tors: List[TorInfo], site_config: CSSiteConfig, service: ServiceInfo,
+                             save_paths: Dict[str, str], site_pieces_hash_set: set):
+        """
+        添加站点返回的可辅种种子
+        """
+        # 去除已经下载过的种子
+        local_cnt = 0
+        not_local_tors = []
+        for tor_info in remote_tors:
+            if (
+                    tor_info
+                    and tor_info.site_name
+                    and tor_info.pieces_hash
+                    and tor_info.get_name_pieces_tag() in site_pieces_hash_set
+            ):
+                local_cnt = local_cnt + 1
+            else:
+                not_local_tors.append(tor_info)
+        logger.info(f"站点{site_config.name}正在做种或已经辅种过的种子数为{local_cnt}")
+
+        for tor_info in not_local_tors:
+            if self._event.is_set():
+                logger.info("辅种服务停止")
+                return
+            if not tor_info:
+                continue
+            if not tor_info.torrent_id or not tor_info.pieces_hash:
+                continue
+            if tor_info.get_name_id_tag() in self._caches.success:
+                logger.info(f"{tor_info.get_name_id_tag()} 已处理过辅种，跳过 ...")
+                continue
+            if self._caches.is_error(tor_info.get_name_id_tag()):
+                logger.info(f"种子 {tor_info.get_name_id_tag()} 辅种失败且已缓存，跳过 ...")
+                continue
+            # 添加任务
+            self.__download_torrent(tor=tor_info, site_config=site_config,
+                                    service=service,
+                                    save_path=save_paths.get(tor_info.pieces_hash))
+
     def __download(self, service: ServiceInfo, content: Union[bytes, str],
                    save_path: str) -> Optional[str]:
         """
@@ -1112,10 +1249,10 @@ class CrossSeed(_PluginBase):
             self.cached += 1
             # 加入失败缓存
             if error_msg and ('无法打开链接' in error_msg or '触发站点流控' in error_msg):
-                self._error_caches.append(tor.get_name_id_tag())
+                self._caches.error.add(tor.get_name_id_tag())
             else:
                 # 种子不存在的情况
-                self._permanent_error_caches.append(tor.get_name_id_tag())
+                self._caches.permanent_error.add(tor.get_name_id_tag())
             logger.error(f"下载种子文件失败：{tor.get_name_id_tag()}")
             return False
 
@@ -1126,7 +1263,7 @@ class CrossSeed(_PluginBase):
             tors, msg = downloader_obj.get_torrents(ids=[tmp_tor_info.info_hash])
             if tors:
                 self.exist += 1
-                self._success_caches.append(tor.get_name_id_tag())
+                self._caches.success.add(tor.get_name_id_tag())
                 logger.info(f"下载的种子{tor.get_name_id_tag()}已存在, 跳过")
                 return True
         else:
@@ -1142,7 +1279,7 @@ class CrossSeed(_PluginBase):
             self.fail += 1
             self.cached += 1
             # 加入失败缓存
-            self._error_caches.append(tor.get_name_id_tag())
+            self._caches.error.add(tor.get_name_id_tag())
             return False
         else:
             self.success += 1
@@ -1155,7 +1292,7 @@ class CrossSeed(_PluginBase):
             # 下载成功
             logger.info(f"成功添加辅种下载，站点种子：{tor.get_name_id_tag()}")
             # 成功也加入缓存，有一些改了路径校验不通过的，手动删除后，下一次又会辅上
-            self._success_caches.append(tor.get_name_id_tag())
+            self._caches.success.add(tor.get_name_id_tag())
             return True
 
     def __add_recheck_torrents(self, service: ServiceInfo, download_id: str):
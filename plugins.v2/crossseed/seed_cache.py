@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+class ExpiringCache(object):
+    """
+    带过期时间和容量上限的缓存，用于记录暂时性的辅种失败，过期后允许重新辅种
+    超出容量时优先淘汰最早加入的记录
+    """
+
+    def __init__(self, ttl: float, max_size: int, items: Optional[Dict[str, float]] = None):
+        """
+        :param ttl: 过期时间（秒）
+        :param max_size: 最多保留的记录数
+        :param items: 已持久化的记录 {key: 加入时间}
+        """
+        self._ttl = ttl
+        self._max_size = max_size
+        self._items: "OrderedDict[str, float]" = OrderedDict()
+        now = time.time()
+        for key, added in sorted((items or {}).items(), key=lambda item: item[1]):
+            if now - added < ttl:
+                self._items[key] = added
+        self.__evict()
+
+    def __evict(self):
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+    def add(self, key: str):
+        """
+        加入记录，已存在的记录刷新加入时间
+        """
+        self._items.pop(key, None)
+        self._items[key] = time.time()
+        self.__evict()
+
+    def __contains__(self, key: str) -> bool:
+        added = self._items.get(key)
+        if added is None:
+            return False
+        if time.time() - added >= self._ttl:
+            del self._items[key]
+            return False
+        return True
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        self._items.clear()
+
+    def to_dict(self) -> Dict[str, int]:
+        """
+        转换为可持久化的数据，过期的记录不再保存
+        """
+        now = time.time()
+        return {key: int(added) for key, added in self._items.items() if now - added < self._ttl}
+
+
+class SeedCaches(object):
+    """
+    辅种缓存
+    - success：辅种成功的种子
+    - permanent_error：种子被删除等无法恢复的失败，不会过期
+    - error：下载失败、触发流控等暂时性失败，过期后重新辅种
+    """
+
+    def __init__(self, data: Optional[dict] = None, error_ttl: float = 7 * 86400, error_max_size: int = 100000):
+        data = data or {}
+        self.success = set(data.get("success") or [])
+        self.permanent_error = set(data.get("permanent_error") or [])
+        self.error = ExpiringCache(ttl=error_ttl, max_size=error_max_size, items=data.get("error"))
+
+    def merge(self, success: Iterable[str] = None, error: Iterable[str] = None,
+              permanent_error: Iterable[str] = None):
+        """
+        合并旧版本保存在插件配置中的缓存列表
+        """
+        self.success.update(success or [])
+        self.permanent_error.update(permanent_error or [])
+        for key in error or []:
+            self.error.add(key)
+
+    def is_error(self, key: str) -> bool:
+        return key in self.permanent_error or key in self.error
+
+    def clear(self):
+        self.success.clear()
+        self.permanent_error.clear()
+        self.error.clear()
+
+    def to_dict(self) -> dict:
+        """
+        转换为可持久化的数据
+        """
+        return {
+            "success": sorted(self.success),
+            "permanent_error": sorted(self.permanent_error),
+            "error": self.error.to_dict()
+        }
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class TorrentIndex(object):
+    """
+    本地种子文件元数据索引，按文件路径、大小和修改时间缓存解析结果，文件未变化时无需重新读取和解析
+    """
+    # 累计多少条新解析的记录后写入一次数据库
+    _flush_size = 500
+
+    def __init__(self, db_path: Path):
+        self._db_path = db_path
+        self._lock = threading.RLock()
+        # 文件路径 -> (文件大小, 修改时间, 元数据)，首次使用时从数据库加载
+        self._entries: Optional[Dict[str, Tuple[int, int, dict]]] = None
+        # 尚未写入数据库的记录
+        self._pending: Dict[str, Tuple[int, int, dict]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self):
+        with closing(sqlite3.connect(str(self._db_path), timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def __init_db(self):
+        Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS torrents (
+                    path TEXT PRIMARY KEY,
+                    file_size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    info_hash TEXT NOT NULL,
+                    pieces_hash TEXT NOT NULL,
+                    name TEXT,
+                    size INTEGER,
+                    announce TEXT
+                )
+            """)
+
+    def __load(self) -> Dict[str, Tuple[int, int, dict]]:
+        if self._entries is None:
+            entries = {}
+            with self.__connect() as conn:
+                for path, file_size, mtime, info_hash, pieces_hash, name, size, announce in conn.execute(
+                        "SELECT path, file_size, mtime, info_hash, pieces_hash, name, size, announce FROM torrents"):
+                    entries[path] = (file_size, mtime, {
+                        "info_hash": info_hash,
+                        "pieces_hash": pieces_hash,
+                        "name": name,
+                        "size": size,
+                        "announce": announce
+                    })
+            self._entries = entries
+        return self._entries
+
+    @staticmethod
+    def stat(torrent_path: str) -> Tuple[int, int]:
+        """
+        获取种子文件的大小和修改时间（纳秒）
+        """
+        stat = os.stat(torrent_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, torrent_path: str, file_size: int, mtime: int) -> Optional[dict]:
+        """
+        获取种子文件的元数据，文件大小或修改时间发生变化时视为未命中
+        """
+        with self._lock:
+            entry = self.__load().get(torrent_path)
+        if entry and entry[0] == file_size and entry[1] == mtime:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, torrent_path: str, file_size: int, mtime: int, meta: dict):
+        """
+        记录种子文件的元数据，累计一定数量后批量写入
+        """
+        with self._lock:
+            self.__load()[torrent_path] = self._pending[torrent_path] = (file_size, mtime, meta)
+            if len(self._pending) >= self._flush_size:
+                self.flush()
+
+    def flush(self):
+        """
+        将新解析的记录写入数据库
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [(path, file_size, mtime, meta.get("info_hash"), meta.get("pieces_hash"), meta.get("name"),
+                     meta.get("size"), meta.get("announce"))
+                    for path, (file_size, mtime, meta) in self._pending.items()]
+            with self.__connect() as conn:
+                conn.executemany("""
+                    INSERT INTO torrents (path, file_size, mtime, info_hash, pieces_hash, name, size, announce)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        file_size = excluded.file_size, mtime = excluded.mtime,
+                        info_hash = excluded.info_hash, pieces_hash = excluded.pieces_hash,
+                        name = excluded.name, size = excluded.size, announce = excluded.announce
+                """, rows)
+            self._pending.clear()
+
+    def prune(self, directory: str) -> int:
+        """
+        清理目录下已不存在的种子文件记录，返回清理的记录数
+        目录不存在、无法访问或为空时（如未挂载），不清理，避免重新解析全部种子
+        """
+        if not self.__is_available(directory):
+            return 0
+        with self._lock:
+            self.flush()
+            prefix = os.path.join(os.path.normpath(directory), "")
+            entries = self.__load()
+            removed: List[str] = [path for path in entries
+                                  if path.startswith(prefix) and not os.path.exists(path)]
+            if not removed:
+                return 0
+            with self.__connect() as conn:
+                conn.executemany("DELETE FROM torrents WHERE path = ?", [(path,) for path in removed])
+            for path in removed:
+                entries.pop(path, None)
+            return len(removed)
+
+    @staticmethod
+    def __is_available(directory: str) -> bool:
+        try:
+            with os.scandir(directory) as entries:
+                return next(entries, None) is not None
+        except OSError:
+            return False
+
+    def reset_stats(self):
+        """
+        重置命中统计
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """
+        清空索引
+        """
+        with self._lock:
+            with self.__connect() as conn:
+                conn.execute("DELETE FROM torrents")
+            self._entries = {}
+            self._pending.clear()
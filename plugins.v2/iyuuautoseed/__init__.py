@@ -1,7 +1,10 @@
+import json
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from threading import Event
+from threading import Event, Lock
 from typing import Any, Dict, List, Optional, Tuple
 
 import pytz
@@ -18,7 +21,10 @@ from app.helper.sites import SitesHelper
 from app.helper.torrent import TorrentHelper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.iyuuautoseed.history_store import SeedHistoryStore
 from app.plugins.iyuuautoseed.iyuu_helper import IyuuHelper
+from app.plugins.iyuuautoseed.seed_cache import SeedCaches
+from app.plugins.iyuuautoseed.site_executor import SiteLimitedExecutor
 from app.schemas import NotificationType, ServiceInfo
 from app.schemas.types import EventType
 from app.utils.http import RequestUtils
@@ -33,7 +39,7 @@ class IYUUAutoSeed(_PluginBase):
     # 插件图标
     plugin_icon = "IYUU.png"
     # 插件版本
-    plugin_version = "2.14"
+    plugin_version = "2.18"
     # 插件作者
     plugin_author = "jxxghp,CKun"
     # 作者主页
@@ -74,6 +80,16 @@ class IYUUAutoSeed(_PluginBase):
     _clearcache = False
     # 退出事件
     _event = Event()
+    # 每次向IYUU查询的种子数
+    _query_chunk_size = 200
+    # 同时进行的IYUU查询数
+    _query_max_workers = 4
+    # 同时进行的种子下载数
+    _download_max_workers = 8
+    # 单个站点同时进行的种子下载数
+    _site_max_workers = 2
+    # 辅种计数及校验任务锁，下载线程并发修改
+    _seed_lock = Lock()
     # 种子链接xpaths
     _torrent_xpaths = [
         "//form[contains(@action, 'download.php?id=')]/@action",
@@ -84,12 +100,21 @@ class IYUUAutoSeed(_PluginBase):
     # 待校全种子hash清单
     _recheck_torrents = {}
     _is_recheck_running = False
-    # 辅种缓存，出错的种子不再重复辅种，可清除
-    _error_caches = []
-    # 辅种缓存，辅种成功的种子，可清除
-    _success_caches = []
-    # 辅种缓存，出错的种子不再重复辅种，且无法清除。种子被删除404等情况
-    _permanent_error_caches = []
+    # 辅种缓存，辅种成功及失败的种子，可清除
+    _caches: Optional[SeedCaches] = None
+    # 暂时性失败的首次重试间隔，连续失败时加倍
+    _error_cache_backoff = 12 * 3600
+    # 暂时性失败的最长重试间隔
+    _error_cache_max_backoff = 14 * 86400
+    # 暂时性失败最多缓存的种子数
+    _error_cache_size = 200000
+    # 辅种历史
+    _history_store: Optional[SeedHistoryStore] = None
+    # 辅种历史保留天数及最多保留的记录数
+    _history_keep_days = 180
+    _history_max_count = 100000
+    # 详情页展示的辅种历史数
+    _page_size = 200
     # 辅种计数
     total = 0
     realtotal = 0
@@ -103,6 +128,12 @@ class IYUUAutoSeed(_PluginBase):
         self.site_oper = SiteOper()
         self.torrent_helper = TorrentHelper()
         self.downloader_helper = DownloaderHelper()
+        self._caches = SeedCaches(data=self.get_data("caches"),
+                                  error_backoff=self._error_cache_backoff,
+                                  error_max_backoff=self._error_cache_max_backoff,
+                                  error_max_size=self._error_cache_size)
+        self._history_store = SeedHistoryStore(db_path=self.get_data_path() / "history.db")
+        self.__migrate_history()
         # 读取配置
         if config:
             self._enabled = config.get("enabled")
@@ -123,9 +154,13 @@ class IYUUAutoSeed(_PluginBase):
             self._addhosttotag = config.get("addhosttotag")
             self._size = float(config.get("size")) if config.get("size") else 0
             self._clearcache = config.get("clearcache")
-            self._permanent_error_caches = [] if self._clearcache else config.get("permanent_error_caches") or []
-            self._error_caches = [] if self._clearcache else config.get("error_caches") or []
-            self._success_caches = [] if self._clearcache else config.get("success_caches") or []
+            # 兼容旧版本保存在插件配置中的缓存列表，合并后不再保存到配置中
+            self._caches.merge(success=config.get("success_caches"),
+                               error=config.get("error_caches"),
+                               permanent_error=config.get("permanent_error_caches"))
+            if self._clearcache:
+                self._caches.clear()
+            self.__save_caches()
 
             # 过滤掉已删除的站点
             all_sites = [site.id for site in self.site_oper.list_order_by_pri()] + [site.get("id") for site in
@@ -658,7 +693,103 @@ class IYUUAutoSeed(_PluginBase):
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        # 辅种历史，按辅种时间倒序
+        data_list = self._history_store.get_page(limit=self._page_size) if self._history_store else []
+        if not data_list:
+            return [
+                {
+                    'component': 'div',
+                    'text': '暂无数据',
+                    'props': {
+                        'class': 'text-center',
+                    }
+                }
+            ]
+        site_stats = self._history_store.get_site_stats()
+
+        # 站点累计辅种数
+        site_headers = [
+            {'title': '站点', 'key': 'site', 'sortable': True},
+            {'title': '累计辅种数', 'key': 'count', 'sortable': True},
+            {'title': '最近辅种时间', 'key': 'last_time', 'sortable': True},
+        ]
+        site_items = [
+            {
+                'site': stat.get("site_name") or "未知",
+                'count': stat.get("count"),
+                'last_time': datetime.fromtimestamp(stat.get("last_time")).strftime("%Y-%m-%d %H:%M:%S")
+                if stat.get("last_time") else ""
+            } for stat in site_stats
+        ]
+        # 辅种明细
+        headers = [
+            {'title': '时间', 'key': 'time', 'sortable': True},
+            {'title': '下载器', 'key': 'downloader', 'sortable': True},
+            {'title': '站点', 'key': 'site', 'sortable': True},
+            {'title': '种子Hash', 'key': 'info_hash', 'sortable': True},
+        ]
+        items = [
+            {
+                'time': datetime.fromtimestamp(data.get("time")).strftime("%Y-%m-%d %H:%M:%S")
+                if data.get("time") else "未知",
+                'downloader': data.get("downloader"),
+                'site': data.get("site_name") or "未知",
+                'info_hash': data.get("info_hash")
+            } for data in data_list
+        ]
+
+        # 拼装页面
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                            'md': 4
+                        },
+                        'content': [
+                            {
+                                'component': 'VDataTableVirtual',
+                                'props': {
+                                    'class': 'text-sm',
+                                    'headers': site_headers,
+                                    'items': site_items,
+                                    'height': '30rem',
+                                    'density': 'compact',
+                                    'fixed-header': True,
+                                    'hide-no-data': True,
+                                    'hover': True
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                            'md': 8
+                        },
+                        'content': [
+                            {
+                                'component': 'VDataTableVirtual',
+                                'props': {
+                                    'class': 'text-sm',
+                                    'headers': headers,
+                                    'items': items,
+                                    'height': '30rem',
+                                    'density': 'compact',
+                                    'fixed-header': True,
+                                    'hide-no-data': True,
+                                    'hover': True
+                                }
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
 
     def __update_config(self):
         self.update_config({
@@ -679,12 +810,15 @@ class IYUUAutoSeed(_PluginBase):
             "addhosttotag": self._addhosttotag,
             "auto_category": self._auto_category,
             "auto_start": self._auto_start,
-            "size": self._size,
-            "success_caches": self._success_caches,
-            "error_caches": self._error_caches,
-            "permanent_error_caches": self._permanent_error_caches
+            "size": self._size
         })
 
+    def __save_caches(self):
+        """
+        保存辅种缓存
+        """
+        self.save_data("caches", self._caches.to_dict())
+
     def auto_seed(self):
         """
         开始辅种
@@ -715,11 +849,11 @@ class IYUUAutoSeed(_PluginBase):
             hash_strs = []
             for torrent in torrents:
                 if self._event.is_set():
-                    logger.info(f"辅种服务停止")
+                    logger.info("辅种服务停止")
                     return
                 # 获取种子hash
                 hash_str = self.__get_hash(torrent=torrent, dl_type=service.type)
-                if hash_str in self._error_caches or hash_str in self._permanent_error_caches:
+                if self._caches.is_error(hash_str):
                     logger.info(f"种子 {hash_str} 辅种失败且已缓存，跳过 ...")
                     continue
                 save_path = self.__get_save_path(torrent=torrent, dl_type=service.type)
@@ -759,21 +893,25 @@ class IYUUAutoSeed(_PluginBase):
                 })
             if hash_strs:
                 logger.info(f"总共需要辅种的种子数：{len(hash_strs)}")
-                # 分组处理，减少IYUU Api请求次数
-                chunk_size = 200
-                for i in range(0, len(hash_strs), chunk_size):
-                    # 切片操作
-                    chunk = hash_strs[i:i + chunk_size]
-                    # 处理分组
-                    self.__seed_torrents(hash_strs=chunk,
-                                         service=service)
+                self.__seed_torrents(hash_strs=hash_strs,
+                                     service=service)
+                if self._event.is_set():
+                    logger.info("辅种服务停止")
+                    return
                 # 触发校验检查
                 self.check_recheck()
             else:
                 logger.info(f"没有需要辅种的种子")
 
         # 保存缓存
-        self.__update_config()
+        self.__save_caches()
+        # IYUU接口请求统计
+        self.__save_iyuu_stats()
+        # 清理过期的辅种历史
+        removed = self._history_store.prune(max_count=self._history_max_count,
+                                            before=time.time() - self._history_keep_days * 86400)
+        if removed:
+            logger.info(f"已清理 {removed} 条过期的辅种历史")
         # 发送消息
         if self._notify:
             if self.success or self.fail:
@@ -789,6 +927,16 @@ class IYUUAutoSeed(_PluginBase):
                 )
         logger.info("辅种任务执行完成")
 
+    def __save_iyuu_stats(self):
+        """
+        输出并保存本次辅种各IYUU接口的请求耗时
+        """
+        stats = self.iyuu_helper.get_stats(reset=True)
+        for url, stat in stats.items():
+            logger.info(f"IYUU接口 {url} 请求 {stat.get('count')} 次，失败 {stat.get('errors')} 次，"
+                        f"平均耗时 {stat.get('avg_time'):.2f} 秒，最长耗时 {stat.get('max_time'):.2f} 秒")
+        self.save_data("iyuu_stats", {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "apis": stats})
+
     def check_recheck(self):
         """
         定时检查下载器中种子是否校验完成，校验完成且完整的自动开始辅种
@@ -846,130 +994,179 @@ class IYUUAutoSeed(_PluginBase):
 
     def __seed_torrents(self, hash_strs: list, service: ServiceInfo):
         """
-        执行一批种子的辅种
+        执行所有种子的辅种
+        分组并发查询IYUU，先返回的分组先开始下载，下载总并发数及单个站点的并发数均受限制
         """
         if not hash_strs:
             return
         logger.info(f"下载器 {service.name} 开始查询辅种，数量：{len(hash_strs)} ...")
         # 下载器中的Hashs
-        hashs = [item.get("hash") for item in hash_strs]
+        hashs = set()
         # 每个Hash的保存目录
         save_paths = {}
         save_category = {}
         for item in hash_strs:
+            hashs.add(item.get("hash"))
             save_paths[item.get("hash")] = item.get("save_path")
             save_category[item.get("hash")] = item.get("category")
-        # 查询可辅种数据
-        seed_list, msg = self.iyuu_helper.get_seed_info(hashs)
-        if not isinstance(seed_list, dict):
-            # 判断辅种异常是否是由于Token未认证导致的，由于没有解决接口，只能从返回值来判断
-            if self._token and msg == '请求缺少token':
-                logger.warn(f'IYUU辅种失败，疑似站点未绑定插件配置不完整，请先检查是否完成站点绑定！{msg}')
-            else:
-                logger.warn(f"当前种子列表没有可辅种的站点：{msg}")
-            return
-        else:
-            logger.info(f"IYUU返回可辅种数：{len(seed_list)}")
-        # 遍历
-        for current_hash, seed_info in seed_list.items():
-            if not seed_info:
-                continue
-            seed_torrents = seed_info.get("torrent")
-            if not isinstance(seed_torrents, list):
-                seed_torrents = [seed_torrents]
-
-            # 本次辅种成功的种子
-            success_torrents = []
-
-            for seed in seed_torrents:
-                if not seed:
-                    continue
-                if not isinstance(seed, dict):
-                    continue
-                if not seed.get("sid") or not seed.get("info_hash"):
-                    continue
-                if seed.get("info_hash") in hashs:
-                    logger.info(f"{seed.get('info_hash')} 已在下载器中，跳过 ...")
-                    continue
-                if seed.get("info_hash") in self._success_caches:
-                    logger.info(f"{seed.get('info_hash')} 已处理过辅种，跳过 ...")
+        # 分组处理，减少IYUU Api请求次数
+        chunks = [[item.get("hash") for item in hash_strs[i:i + self._query_chunk_size]]
+                  for i in range(0, len(hash_strs), self._query_chunk_size)]
+        # 添加任务 如果配置了主辅分离使用辅种下载器
+        seed_service = self.auto_service_info if self._auto_downloader else service
+        # 已提交下载的种子，避免不同分组返回相同种子时重复下载
+        submitted = set()
+        # 辅种成功的种子，{下载器中的Hash: [(辅种的Hash, 站点名称)]}
+        success_torrents: Dict[str, List[Tuple[str, str]]] = {}
+
+        query_executor = ThreadPoolExecutor(max_workers=min(len(chunks), self._query_max_workers),
+                                            thread_name_prefix="IYUUAutoSeed-Query")
+        # 站点并发已满时种子在该站点队列中等待，不占用下载线程
+        download_executor = SiteLimitedExecutor(max_workers=self._download_max_workers,
+                                                site_max_workers=self._site_max_workers,
+                                                thread_name_prefix="IYUUAutoSeed-Download")
+        try:
+            query_futures = [query_executor.submit(self.iyuu_helper.get_seed_info, chunk) for chunk in chunks]
+            for query_future in as_completed(query_futures):
+                if self._event.is_set():
+                    return
+                # 查询可辅种数据
+                try:
+                    seed_list, msg = query_future.result()
+                except Exception as e:
+                    logger.error(f"查询IYUU可辅种数据出错：{str(e)}")
                     continue
-                if seed.get("info_hash") in self._error_caches or seed.get("info_hash") in self._permanent_error_caches:
-                    logger.info(f"种子 {seed.get('info_hash')} 辅种失败且已缓存，跳过 ...")
+                if not isinstance(seed_list, dict):
+                    # 判断辅种异常是否是由于Token未认证导致的，由于没有解决接口，只能从返回值来判断
+                    if self._token and msg == '请求缺少token':
+                        logger.warn(f'IYUU辅种失败，疑似站点未绑定插件配置不完整，请先检查是否完成站点绑定！{msg}')
+                    else:
+                        logger.warn(f"当前种子列表没有可辅种的站点：{msg}")
                     continue
-                # 添加任务 如果配置了主辅分离使用辅种下载器
-                if self._auto_downloader:
-                    success = self.__download_torrent(seed=seed,
-                                                      service=self.auto_service_info,
-                                                      save_path=save_paths.get(current_hash),
-                                                      save_category=save_category.get(current_hash))
                 else:
-                    success = self.__download_torrent(seed=seed,
-                                                      service=service,
-                                                      save_path=save_paths.get(current_hash),
-                                                      save_category=save_category.get(current_hash))
-                if success:
-                    success_torrents.append(seed.get("info_hash"))
-
-            # 辅种成功的去重放入历史
-            if len(success_torrents) > 0:
-                self.__save_history(current_hash=current_hash,
-                                    downloader=service.name,
+                    logger.info(f"IYUU返回可辅种数：{len(seed_list)}")
+                # 遍历
+                for current_hash, seed_info in seed_list.items():
+                    if not seed_info:
+                        continue
+                    seed_torrents = seed_info.get("torrent")
+                    if not isinstance(seed_torrents, list):
+                        seed_torrents = [seed_torrents]
+                    for seed in seed_torrents:
+                        if not seed:
+                            continue
+                        if not isinstance(seed, dict):
+                            continue
+                        if not seed.get("sid") or not seed.get("info_hash"):
+                            continue
+                        if seed.get("info_hash") in hashs:
+                            logger.info(f"{seed.get('info_hash')} 已在下载器中，跳过 ...")
+                            continue
+                        if seed.get("info_hash") in self._caches.success or seed.get("info_hash") in submitted:
+                            logger.info(f"{seed.get('info_hash')} 已处理过辅种，跳过 ...")
+                            continue
+                        if self._caches.is_error(seed.get("info_hash")):
+                            logger.info(f"种子 {seed.get('info_hash')} 辅种失败且已缓存，跳过 ...")
+                            continue
+                        submitted.add(seed.get("info_hash"))
+                        download_executor.submit(seed.get("sid"), self.__seed_download,
+                                                 seed=seed,
+                                                 service=seed_service,
+                                                 save_path=save_paths.get(current_hash),
+                                                 save_category=save_category.get(current_hash),
+                                                 current_hash=current_hash,
+                                                 success_torrents=success_torrents)
+            # 等待下载完成
+            if not download_executor.wait(stop_event=self._event):
+                return
+        finally:
+            query_executor.shutdown(wait=False, cancel_futures=True)
+            download_executor.shutdown()
+            # 辅种成功的去重放入历史，停止时已完成的部分同样记录
+            with self._seed_lock:
+                success_torrents = {current_hash: list(torrents)
+                                    for current_hash, torrents in success_torrents.items()}
+            if success_torrents:
+                self.__save_history(downloader=service.name,
                                     success_torrents=success_torrents)
 
         logger.info(f"下载器 {service.name} 辅种完成")
 
-    def __save_history(self, current_hash: str, downloader: str, success_torrents: []):
+    def __seed_download(self, seed: dict, service: ServiceInfo, save_path: str, save_category: str,
+                        current_hash: str, success_torrents: Dict[str, List[Tuple[str, str]]]):
         """
-        [
-            {
-                "downloader":"2",
-                "torrents":[
-                    "248103a801762a66c201f39df7ea325f8eda521b",
-                    "bd13835c16a5865b01490962a90b3ec48889c1f0"
-                ]
-            },
-            {
-                "downloader":"3",
-                "torrents":[
-                    "248103a801762a66c201f39df7ea325f8eda521b",
-                    "bd13835c16a5865b01490962a90b3ec48889c1f0"
-                ]
-            }
-        ]
+        在下载线程中执行单个种子的辅种，辅种成功时记录到 success_torrents
+        """
+        if self._event.is_set():
+            return
+        site_name = self.__download_torrent(seed=seed,
+                                            service=service,
+                                            save_path=save_path,
+                                            save_category=save_category)
+        if site_name:
+            with self._seed_lock:
+                success_torrents.setdefault(current_hash, []).append((seed.get("info_hash"), site_name))
+
+    def __count(self, **counts):
+        """
+        累加辅种计数，下载线程并发调用
+        """
+        with self._seed_lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def __save_history(self, downloader: str, success_torrents: Dict[str, List[Tuple[str, str]]]):
+        """
+        追加辅种成功记录
+        :param downloader: 下载器名称
+        :param success_torrents: {下载器中已有种子的Hash: [(辅种的Hash, 站点名称)]}
         """
         try:
-            # 查询当前Hash的辅种历史
-            seed_history = self.get_data(key=current_hash) or []
+            records = []
+            for current_hash, torrents in success_torrents.items():
+                records.extend((current_hash, info_hash, site_name) for info_hash, site_name in torrents)
+            self._history_store.add(downloader=downloader, records=records)
+        except Exception as e:
+            logger.error(f"保存辅种历史失败：{str(e)}")
 
-            new_history = True
-            if len(seed_history) > 0:
-                for history in seed_history:
-                    if not history:
-                        continue
-                    if not isinstance(history, dict):
+    def __migrate_history(self):
+        """
+        将旧版本按种子Hash保存在插件数据中的辅种历史一次性迁移到辅种历史数据库，迁移后删除
+        旧版本历史没有辅种时间及站点，按原保存顺序写入，不计入站点累计辅种数
+        """
+        if self.get_data("history_migrated"):
+            return
+        try:
+            # 修正此前在辅种时才迁移、按迁移时间记录的旧版本历史
+            self._history_store.reset_legacy()
+            migrated = 0
+            # 按插件数据的保存顺序迁移
+            plugin_datas = sorted(self.get_data(key=None) or [], key=lambda data: getattr(data, "id", 0) or 0)
+            for plugin_data in plugin_datas:
+                if not re.fullmatch(r"[0-9a-fA-F]{40}|[0-9a-fA-F]{64}", str(plugin_data.key)):
+                    continue
+                legacy_history = plugin_data.value
+                if isinstance(legacy_history, str):
+                    try:
+                        legacy_history = json.loads(legacy_history)
+                    except ValueError:
                         continue
-                    if not history.get("downloader"):
+                if not isinstance(legacy_history, list):
+                    continue
+                for history in legacy_history:
+                    if not isinstance(history, dict) or not history.get("downloader"):
                         continue
-                    # 如果本次辅种下载器之前有过记录则继续添加
-                    if str(history.get("downloader")) == downloader:
-                        history_torrents = history.get("torrents") or []
-                        history["torrents"] = list(set(history_torrents + success_torrents))
-                        new_history = False
-                        break
-
-            # 本次辅种下载器之前没有成功记录则新增
-            if new_history:
-                seed_history.append({
-                    "downloader": downloader,
-                    "torrents": list(set(success_torrents))
-                })
-
-            # 保存历史
-            self.save_data(key=current_hash,
-                           value=seed_history)
+                    migrated += self._history_store.add(downloader=str(history.get("downloader")),
+                                                        records=[(plugin_data.key, torrent, None)
+                                                                 for torrent in history.get("torrents") or []],
+                                                        add_time=SeedHistoryStore.LEGACY_TIME,
+                                                        count_stats=False)
+                self.del_data(key=plugin_data.key)
+            self.save_data("history_migrated", time.time())
+            if migrated:
+                logger.info(f"已迁移旧版本辅种历史 {migrated} 条")
         except Exception as e:
-            print(str(e))
+            logger.error(f"迁移旧版本辅种历史失败：{str(e)}")
 
     def __download(self, service: ServiceInfo, content: bytes,
                    save_path: str, save_category: str, site_name: str) -> Optional[str]:
@@ -1018,9 +1215,10 @@ class IYUUAutoSeed(_PluginBase):
         logger.error(f"不支持的下载器：{service.type}")
         return None
 
-    def __download_torrent(self, seed: dict, service: ServiceInfo, save_path: str, save_category: str):
+    def __download_torrent(self, seed: dict, service: ServiceInfo, save_path: str,
+                           save_category: str) -> Optional[str]:
         """
-        下载种子
+        下载种子，辅种成功时返回站点名称
         torrent: {
                     "sid": 3,
                     "torrent_id": 377467,
@@ -1036,49 +1234,47 @@ class IYUUAutoSeed(_PluginBase):
                 return False
             return True
 
-        self.total += 1
+        self.__count(total=1)
         # 获取种子站点及下载地址模板
         site_url, download_page = self.iyuu_helper.get_torrent_url(seed.get("sid"))
         if not site_url or not download_page:
             # 加入缓存
-            self._error_caches.append(seed.get("info_hash"))
-            self.fail += 1
-            self.cached += 1
-            return False
+            self._caches.error.add(seed.get("info_hash"))
+            self.__count(fail=1, cached=1)
+            return None
         # 查询站点
         site_domain = StringUtils.get_url_domain(site_url)
         # 站点信息
         site_info = self.sites_helper.get_indexer(site_domain)
         if not site_info or not site_info.get('url'):
             logger.debug(f"没有维护种子对应的站点：{site_url}")
-            return False
+            return None
         if self._sites and site_info.get('id') not in self._sites:
             logger.info("当前站点不在选择的辅种站点范围，跳过 ...")
-            return False
-        self.realtotal += 1
+            return None
+        self.__count(realtotal=1)
         # 查询hash值是否已经在下载器中
         downloader_obj = service.instance
         torrent_info, _ = downloader_obj.get_torrents(ids=[seed.get("info_hash")])
         if torrent_info:
             logger.info(f"{seed.get('info_hash')} 已在下载器中，跳过 ...")
-            self.exist += 1
-            return False
+            self.__count(exist=1)
+            return None
         # 站点流控
         check, checkmsg = self.sites_helper.check(site_domain)
         if check:
             logger.warn(checkmsg)
-            self.fail += 1
-            return False
+            self.__count(fail=1)
+            return None
         # 下载种子
         torrent_url = self.__get_download_url(seed=seed,
                                               site=site_info,
                                               base_url=download_page)
         if not torrent_url:
             # 加入失败缓存
-            self._error_caches.append(seed.get("info_hash"))
-            self.fail += 1
-            self.cached += 1
-            return False
+            self._caches.error.add(seed.get("info_hash"))
+            self.__count(fail=1, cached=1)
+            return None
         # 强制使用Https
         if __is_special_site(torrent_url):
             if "?" in torrent_url:
@@ -1093,15 +1289,15 @@ class IYUUAutoSeed(_PluginBase):
             proxy=site_info.get("proxy"))
         if not content:
             # 下载失败
-            self.fail += 1
+            self.__count(fail=1)
             # 加入失败缓存
             if error_msg and ('无法打开链接' in error_msg or '触发站点流控' in error_msg):
-                self._error_caches.append(seed.get("info_hash"))
+                self._caches.error.add(seed.get("info_hash"))
             else:
                 # 种子不存在的情况
-                self._permanent_error_caches.append(seed.get("info_hash"))
+                self._caches.permanent_error.add(seed.get("info_hash"))
             logger.error(f"下载种子文件失败：{torrent_url}")
-            return False
+            return None
         # 添加下载，辅种任务默认暂停
         logger.info(f"添加下载任务：{torrent_url} ...")
         download_id = self.__download(service=service,
@@ -1111,12 +1307,12 @@ class IYUUAutoSeed(_PluginBase):
                                       site_name=site_info.get("name"))
         if not download_id:
             # 下载失败
-            self.fail += 1
+            self.__count(fail=1)
             # 加入失败缓存
-            self._error_caches.append(seed.get("info_hash"))
-            return False
+            self._caches.error.add(seed.get("info_hash"))
+            return None
         else:
-            self.success += 1
+            self.__count(success=1)
             if service.type == "qbittorrent":
                 if self._skipverify:
                     if self._auto_start:
@@ -1134,15 +1330,16 @@ class IYUUAutoSeed(_PluginBase):
             # 下载成功
             logger.info(f"成功添加辅种下载，站点：{site_info.get('name')}，种子链接：{torrent_url}")
             # 成功也加入缓存，有一些改了路径校验不通过的，手动删除后，下一次又会辅上
-            self._success_caches.append(seed.get("info_hash"))
-            return True
+            self._caches.add_success(seed.get("info_hash"))
+            return site_info.get("name") or site_domain
 
     def __add_recheck_torrents(self, service: ServiceInfo, download_id: str):
         # 追加校验任务
         logger.info(f"添加校验检查任务：{download_id} ...")
-        if not self._recheck_torrents.get(service.name):
-            self._recheck_torrents[service.name] = []
-        self._recheck_torrents[service.name].append(download_id)
+        with self._seed_lock:
+            if not self._recheck_torrents.get(service.name):
+                self._recheck_torrents[service.name] = []
+            self._recheck_torrents[service.name].append(download_id)
 
     @staticmethod
     def __get_hash(torrent: Any, dl_type: str):
@@ -1384,6 +1581,8 @@ class IYUUAutoSeed(_PluginBase):
                     self._scheduler.shutdown()
                     self._event.clear()
                 self._scheduler = None
+            if self.iyuu_helper:
+                self.iyuu_helper.close()
         except Exception as e:
             print(str(e))
 
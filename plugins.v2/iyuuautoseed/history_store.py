@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+
+class SeedHistoryStore(object):
+    """
+    辅种历史存储，每条辅种成功记录单独一行，只追加不重写
+    同时按站点维护累计辅种数，清理过期记录后统计数据不变
+    旧版本迁移的记录没有辅种时间，时间记为0，排在全部记录之后，不参与站点统计，也不按保留天数清理
+    """
+    # 旧版本迁移的记录的辅种时间
+    LEGACY_TIME = 0
+
+    def __init__(self, db_path: Path):
+        self._db_path = db_path
+        self._lock = threading.RLock()
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self):
+        with self._lock, closing(sqlite3.connect(str(self._db_path), timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def __init_db(self):
+        Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as conn:
+            # 需在建表前设置，清理过期记录后可增量回收空间
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    time REAL NOT NULL,
+                    downloader TEXT NOT NULL,
+                    source_hash TEXT NOT NULL,
+                    info_hash TEXT NOT NULL,
+                    site_name TEXT,
+                    UNIQUE (downloader, source_hash, info_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_time ON history (time)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_source_hash ON history (source_hash)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS site_stats (
+                    site_name TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    last_time REAL
+                )
+            """)
+
+    def add(self, downloader: str, records: Iterable[Tuple[str, str, Optional[str]]],
+            add_time: float = None, count_stats: bool = True) -> int:
+        """
+        在一个事务中追加辅种成功记录，同一下载器中同一源种子的相同辅种只记录一次，返回实际新增的记录数
+        :param downloader: 下载器名称
+        :param records: [(下载器中已有种子的Hash, 辅种的Hash, 站点名称)]
+        :param add_time: 辅种时间，默认当前时间
+        :param count_stats: 是否计入站点累计辅种数
+        """
+        add_time = time.time() if add_time is None else add_time
+        added = 0
+        with self.__connect() as conn:
+            for source_hash, info_hash, site_name in records:
+                cursor = conn.execute("INSERT OR IGNORE INTO history (time, downloader, source_hash, info_hash, "
+                                      "site_name) VALUES (?, ?, ?, ?, ?)",
+                                      (add_time, downloader, source_hash, info_hash, site_name))
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                if not count_stats:
+                    continue
+                conn.execute("""
+                    INSERT INTO site_stats (site_name, count, last_time) VALUES (?, 1, ?)
+                    ON CONFLICT(site_name) DO UPDATE SET
+                        count = count + 1, last_time = MAX(COALESCE(last_time, 0), excluded.last_time)
+                """, (site_name or "", add_time))
+        return added
+
+    def reset_legacy(self) -> int:
+        """
+        修正此前按迁移时间记录的旧版本历史，旧版本记录没有站点名称，改为未知辅种时间并从站点统计中移除，返回修正的记录数
+        """
+        with self.__connect() as conn:
+            updated = conn.execute("UPDATE history SET time = ? WHERE site_name IS NULL AND time != ?",
+                                   (self.LEGACY_TIME, self.LEGACY_TIME)).rowcount
+            conn.execute("DELETE FROM site_stats WHERE site_name = ''")
+        return updated
+
+    def get_page(self, limit: int, offset: int = 0) -> List[dict]:
+        """
+        按辅种时间倒序分页获取记录，旧版本迁移的记录排在最后
+        """
+        with self.__connect() as conn:
+            cursor = conn.execute("SELECT time, downloader, source_hash, info_hash, site_name FROM history "
+                                  "ORDER BY time DESC, id DESC LIMIT ? OFFSET ?", (limit, offset))
+            return [{
+                "time": add_time,
+                "downloader": downloader,
+                "source_hash": source_hash,
+                "info_hash": info_hash,
+                "site_name": site_name
+            } for add_time, downloader, source_hash, info_hash, site_name in cursor]
+
+    def count(self) -> int:
+        """
+        当前保留的记录数
+        """
+        with self.__connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def get_site_stats(self) -> List[dict]:
+        """
+        各站点累计辅种数，按辅种数倒序，包含已清理的记录
+        """
+        with self.__connect() as conn:
+            cursor = conn.execute("SELECT site_name, count, last_time FROM site_stats ORDER BY count DESC")
+            return [{"site_name": site_name, "count": count, "last_time": last_time}
+                    for site_name, count, last_time in cursor]
+
+    def prune(self, max_count: int = None, before: float = None) -> int:
+        """
+        清理早于before的记录，以及超出max_count的最早记录，站点累计数不受影响，返回清理的记录数
+        旧版本迁移的记录辅种时间未知，不按before清理，超出max_count时最先清理
+        """
+        removed = 0
+        with self.__connect() as conn:
+            if before:
+                removed += conn.execute("DELETE FROM history WHERE time > ? AND time < ?",
+                                        (self.LEGACY_TIME, before)).rowcount
+            if max_count is not None:
+                removed += conn.execute("DELETE FROM history WHERE id IN (SELECT id FROM history "
+                                        "ORDER BY time DESC, id DESC LIMIT -1 OFFSET ?)", (max_count,)).rowcount
+        if removed:
+            # execute 只执行 incremental_vacuum 的第一步，仅释放一页，需通过 executescript 执行完毕
+            with self.__connect() as conn:
+                conn.executescript("PRAGMA incremental_vacuum")
+        return removed
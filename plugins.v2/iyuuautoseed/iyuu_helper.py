@@ -1,7 +1,12 @@
 import hashlib
 import json
+import threading
 import time
-from typing import Tuple, Optional
+from typing import Dict, Tuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from app.utils.http import RequestUtils
 
@@ -12,32 +17,93 @@ class IyuuHelper(object):
     """
     _version = "8.2.0"
     _api_base = "https://2025.iyuu.cn"
-    _sites = {}
     _token = None
-    _sid_sha1 = None
+    # 连接池大小，与并发查询及下载线程数相当
+    _pool_size = 16
+    # 连接失败、限流及服务端错误时的重试次数及退避系数
+    _retry_total = 3
+    _retry_backoff = 1
+    # 站点列表缓存时间（秒）
+    _sites_ttl = 6 * 3600
 
     def __init__(self, token: str):
         self._token = token
+        self._sites = {}
+        self._sites_time = 0
+        self._sid_sha1 = None
+        # 多个查询线程同时首次请求时，站点列表及汇报只执行一次
+        self._lock = threading.Lock()
+        # 各接口请求统计
+        self._stats: Dict[str, dict] = {}
+        self._stats_lock = threading.Lock()
+        self._session = self.__create_session()
         if self._token:
             self.init_config()
 
     def init_config(self):
         pass
 
+    def __create_session(self) -> requests.Session:
+        """
+        创建长连接会话，所有请求复用连接池，并按退避策略重试
+        """
+        retry = Retry(total=self._retry_total,
+                      backoff_factor=self._retry_backoff,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET", "POST"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=self._pool_size,
+                              pool_maxsize=self._pool_size,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        """
+        关闭会话
+        """
+        self._session.close()
+
+    def __record(self, url: str, elapsed: float, error: bool):
+        """
+        记录接口请求耗时
+        """
+        with self._stats_lock:
+            stat = self._stats.setdefault(url, {"count": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0})
+            stat["count"] += 1
+            stat["errors"] += 1 if error else 0
+            stat["total_time"] += elapsed
+            stat["max_time"] = max(stat["max_time"], elapsed)
+
+    def get_stats(self, reset: bool = False) -> Dict[str, dict]:
+        """
+        返回各接口的请求次数、失败次数及耗时统计
+        :param reset: 返回后清空统计
+        """
+        with self._stats_lock:
+            stats = {url: {**stat, "avg_time": stat["total_time"] / stat["count"] if stat["count"] else 0}
+                     for url, stat in self._stats.items()}
+            if reset:
+                self._stats = {}
+        return stats
+
     def __request_iyuu(self, url: str, method: str = "get", params: dict = None) -> Tuple[Optional[dict], str]:
         """
         向IYUUApi发送请求
         """
+        start = time.time()
+        request = RequestUtils(
+            accept_type="application/json",
+            headers={'token': self._token},
+            session=self._session
+        )
         if method == "post":
-            ret = RequestUtils(
-                accept_type="application/json",
-                headers={'token': self._token}
-            ).post_res(f'{self._api_base + url}', json=params)
+            ret = request.post_res(f'{self._api_base + url}', json=params)
         else:
-            ret = RequestUtils(
-                accept_type="application/json",
-                headers={'token': self._token}
-            ).get_res(f'{self._api_base + url}', params=params)
+            ret = request.get_res(f'{self._api_base + url}', params=params)
+        self.__record(url=url, elapsed=time.time() - start, error=not ret)
         if ret:
             result = ret.json()
             if result.get('code') == 0:
@@ -52,13 +118,30 @@ class IyuuHelper(object):
     def get_torrent_url(self, sid: str) -> Tuple[Optional[str], Optional[str]]:
         if not sid:
             return None, None
-        if not self._sites:
-            self._sites = self.__get_sites()
+        self.__refresh_sites()
         if not self._sites.get(sid):
             return None, None
         site = self._sites.get(sid)
         return site.get('base_url'), site.get('download_page')
 
+    def __refresh_sites(self):
+        """
+        站点列表为空或缓存过期时重新获取，站点变化时需要重新汇报
+        """
+        if self._sites and time.time() - self._sites_time < self._sites_ttl:
+            return
+        with self._lock:
+            if self._sites and time.time() - self._sites_time < self._sites_ttl:
+                return
+            sites = self.__get_sites()
+            if not sites:
+                # 获取失败时继续使用旧的站点列表
+                return
+            if set(sites.keys()) != set(self._sites.keys()):
+                self._sid_sha1 = None
+            self._sites = sites
+            self._sites_time = time.time()
+
     def __get_sites(self) -> dict:
         """
         返回支持辅种的全部站点
@@ -80,8 +163,6 @@ class IyuuHelper(object):
         汇报辅种的站点
         :return:
         """
-        if not self._sites:
-            self._sites = self.__get_sites()
         sid_list = list(self._sites.keys())
         result, msg = self.__request_iyuu(url='/reseed/sites/reportExisting',
                                           method='post',
@@ -96,8 +177,11 @@ class IyuuHelper(object):
         :param info_hashs:
         :return:
         """
+        self.__refresh_sites()
         if not self._sid_sha1:
-            self._sid_sha1 = self.__report_existing()
+            with self._lock:
+                if not self._sid_sha1:
+                    self._sid_sha1 = self.__report_existing()
         info_hashs.sort()
         json_data = json.dumps(info_hashs, separators=(',', ':'), ensure_ascii=False)
         sha1 = self.get_sha1(json_data)
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+
+class BackoffCache(object):
+    """
+    暂时性辅种失败的缓存，每条记录带有下次允许重试的时间
+    连续失败时重试间隔按倍数增长，直至上限；到达重试时间后允许重新辅种，但保留失败次数，
+    再次失败时继续拉长间隔，超过最长间隔仍未再次失败的记录才会被清除
+    超出容量时优先淘汰最早失败的记录
+    """
+
+    def __init__(self, backoff: float, max_backoff: float, max_size: int,
+                 items: Optional[Dict[str, List[float]]] = None):
+        """
+        :param backoff: 首次失败后的重试间隔（秒）
+        :param max_backoff: 最长重试间隔（秒）
+        :param max_size: 最多保留的记录数
+        :param items: 已持久化的记录 {key: [下次重试时间, 失败次数]}
+        """
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, List[float]]" = OrderedDict()
+        now = time.time()
+        for key, item in sorted((items or {}).items(), key=lambda kv: kv[1][0]):
+            if not self.__outdated(item, now):
+                self._items[key] = [item[0], int(item[1])]
+        self.__evict()
+
+    def __outdated(self, item: List[float], now: float) -> bool:
+        return now - item[0] >= self._max_backoff
+
+    def __evict(self):
+        while len(self._items) > self._max_size:
+            self._items.popitem(last=False)
+
+    def add(self, key: str):
+        """
+        记录一次失败，按失败次数计算下次重试时间
+        """
+        now = time.time()
+        with self._lock:
+            item = self._items.pop(key, None)
+            failures = 1 if item is None or self.__outdated(item, now) else item[1] + 1
+            delay = min(self._backoff * 2 ** (failures - 1), self._max_backoff)
+            self._items[key] = [now + delay, failures]
+            self.__evict()
+
+    def discard(self, key: str):
+        """
+        辅种成功后清除失败记录
+        """
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        """
+        是否仍在等待重试
+        """
+        item = self._items.get(key)
+        return item is not None and time.time() < item[0]
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def to_dict(self) -> Dict[str, List[int]]:
+        """
+        转换为可持久化的数据，超过最长间隔的记录不再保存
+        """
+        now = time.time()
+        with self._lock:
+            return {key: [int(item[0]), item[1]] for key, item in self._items.items()
+                    if not self.__outdated(item, now)}
+
+
+class SeedCaches(object):
+    """
+    辅种缓存
+    - success：辅种成功的种子
+    - permanent_error：种子被删除等无法恢复的失败，不会过期
+    - error：下载失败、触发流控等暂时性失败，按退避间隔重试
+    """
+
+    def __init__(self, data: Optional[dict] = None, error_backoff: float = 12 * 3600,
+                 error_max_backoff: float = 14 * 86400, error_max_size: int = 200000):
+        data = data or {}
+        self.success = set(data.get("success") or [])
+        self.permanent_error = set(data.get("permanent_error") or [])
+        self.error = BackoffCache(backoff=error_backoff, max_backoff=error_max_backoff,
+                                  max_size=error_max_size, items=data.get("error"))
+
+    def merge(self, success: Iterable[str] = None, error: Iterable[str] = None,
+              permanent_error: Iterable[str] = None):
+        """
+        合并旧版本保存在插件配置中的缓存列表
+        """
+        self.success.update(success or [])
+        self.permanent_error.update(permanent_error or [])
+        for key in error or []:
+            self.error.add(key)
+
+    def add_success(self, key: str):
+        self.success.add(key)
+        self.error.discard(key)
+
+    def is_error(self, key: str) -> bool:
+        return key in self.permanent_error or key in self.error
+
+    def clear(self):
+        self.success.clear()
+        self.permanent_error.clear()
+        self.error.clear()
+
+    def to_dict(self) -> dict:
+        """
+        转换为可持久化的数据
+        """
+        return {
+            "success": sorted(self.success),
+            "permanent_error": sorted(self.permanent_error),
+            "error": self.error.to_dict()
+        }
@@ -0,0 +1,81 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Tuple
+
+from app.log import logger
+
+
+class SiteLimitedExecutor(object):
+    """
+    按站点限制并发的下载线程池
+    站点并发数已满时，任务在该站点的队列中等待，不占用下载线程，慢速站点不会占满全部下载线程
+    """
+
+    def __init__(self, max_workers: int, site_max_workers: int, thread_name_prefix: str = ""):
+        """
+        :param max_workers: 下载线程数
+        :param site_max_workers: 单个站点的并发数
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._site_max_workers = max(1, site_max_workers)
+        self._cond = threading.Condition()
+        # 站点 -> 正在执行的任务数
+        self._running: Dict[Any, int] = {}
+        # 站点 -> 等待执行的任务
+        self._queues: Dict[Any, Deque[Tuple[Callable, tuple, dict]]] = {}
+        # 未完成的任务数
+        self._pending = 0
+        self._shutdown = False
+
+    def submit(self, site: Any, fn: Callable, *args, **kwargs) -> bool:
+        """
+        提交任务，站点并发数未满时立即执行，否则排队，不会阻塞
+        """
+        with self._cond:
+            if self._shutdown:
+                return False
+            self._pending += 1
+            if self._running.get(site, 0) < self._site_max_workers:
+                self._running[site] = self._running.get(site, 0) + 1
+                self._executor.submit(self.__run, site, fn, args, kwargs)
+            else:
+                self._queues.setdefault(site, deque()).append((fn, args, kwargs))
+        return True
+
+    def __run(self, site: Any, fn: Callable, args: tuple, kwargs: dict):
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"执行下载任务出错：{str(e)}")
+        finally:
+            with self._cond:
+                self._pending -= 1
+                queue = self._queues.get(site)
+                if queue and not self._shutdown:
+                    # 同一站点的下一个任务排到线程池队尾，与其它站点的任务轮流执行
+                    self._executor.submit(self.__run, site, *queue.popleft())
+                else:
+                    self._running[site] -= 1
+                self._cond.notify_all()
+
+    def wait(self, stop_event: threading.Event = None) -> bool:
+        """
+        等待全部任务完成
+        :return: 是否全部完成，stop_event 被设置时返回False
+        """
+        with self._cond:
+            while self._pending:
+                if stop_event and stop_event.is_set():
+                    return False
+                self._cond.wait(timeout=1)
+        return True
+
+    def shutdown(self):
+        """
+        停止执行，排队中的任务不再执行
+        """
+        with self._cond:
+            self._shutdown = True
+            self._queues.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
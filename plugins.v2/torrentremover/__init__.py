@@ -18,6 +18,72 @@ from app.utils.string import StringUtils
 lock = threading.Lock()
 
 
+class RemoveFilterPlan(object):
+    """
+    自动删种过滤条件，按配置预先解析数值范围并编译正则表达式，供QB和TR共用
+    """
+    __slots__ = ("ratio", "seeding_time", "min_size", "max_size", "upspeed",
+                 "path_pattern", "tracker_pattern", "error_pattern", "states", "categorys")
+
+    def __init__(self, size: str = None, ratio: Any = None, seeding_time: Any = None, upspeed: Any = None,
+                 pathkeywords: str = None, trackerkeywords: str = None, errorkeywords: str = None,
+                 torrentstates: str = None, torrentcategorys: str = None):
+        # 分享率
+        self.ratio = float(ratio) if ratio else None
+        # 做种时间 单位：小时
+        self.seeding_time = float(seeding_time) * 3600 if seeding_time else None
+        # 大小 单位：GB
+        self.min_size, self.max_size = None, None
+        if size:
+            sizes = size.split('-')
+            self.min_size = int(float(sizes[0]) * 1024 * 1024 * 1024)
+            self.max_size = int(float(sizes[-1]) * 1024 * 1024 * 1024)
+        # 平均上传速度 单位：KB/s
+        self.upspeed = float(upspeed) * 1024 if upspeed else None
+        self.path_pattern = re.compile(pathkeywords, re.I) if pathkeywords else None
+        self.tracker_pattern = re.compile(trackerkeywords, re.I) if trackerkeywords else None
+        self.error_pattern = re.compile(errorkeywords, re.I) if errorkeywords else None
+        self.states = torrentstates or None
+        self.categorys = torrentcategorys or None
+
+    def match(self, ratio: float, seeding_time: float, size: int, upload_avs: float, path: str,
+              trackers: List[str]) -> bool:
+        """
+        判断种子是否符合通用的删种条件
+        """
+        if self.ratio is not None and ratio <= self.ratio:
+            return False
+        if self.seeding_time is not None and seeding_time <= self.seeding_time:
+            return False
+        if self.min_size is not None and (size >= self.max_size or size <= self.min_size):
+            return False
+        if self.upspeed is not None and upload_avs >= self.upspeed:
+            return False
+        if self.path_pattern and not self.path_pattern.search(path):
+            return False
+        if self.tracker_pattern and not any(self.tracker_pattern.search(tracker) for tracker in trackers):
+            return False
+        return True
+
+    def match_state(self, state: str, category: str) -> bool:
+        """
+        判断种子状态及分类是否符合删种条件
+        """
+        if self.states and state not in self.states:
+            return False
+        if self.categorys and (not category or category not in self.categorys):
+            return False
+        return True
+
+    def match_error(self, error_string: str) -> bool:
+        """
+        判断种子错误信息是否符合删种条件
+        """
+        if self.error_pattern and not self.error_pattern.search(error_string):
+            return False
+        return True
+
+
 class TorrentRemover(_PluginBase):
     # 插件名称
     plugin_name = "自动删种"
@@ -26,7 +92,7 @@ class TorrentRemover(_PluginBase):
     # 插件图标
     plugin_icon = "delete.jpg"
     # 插件版本
-    plugin_version = "2.2"
+    plugin_version = "2.5"
     # 插件作者
     plugin_author = "jxxghp"
     # 作者主页
@@ -61,9 +127,14 @@ class TorrentRemover(_PluginBase):
     _errorkeywords = None
     _torrentstates = None
     _torrentcategorys = None
+    # 单次批量暂停或删除的种子数
+    _batch_size = 100
+    # 按当前配置预先解析的过滤条件
+    _filter_plan: Optional[RemoveFilterPlan] = None
 
     def init_plugin(self, config: dict = None):
         self.downloader_helper = DownloaderHelper()
+        self._filter_plan = None
         if config:
             self._enabled = config.get("enabled")
             self._onlyonce = config.get("onlyonce")
@@ -636,48 +707,40 @@ class TorrentRemover(_PluginBase):
                     # 下载器
                     downlader_obj = self.__get_downloader(downloader)
                     if self._action == "pause":
-                        message_text = f"{downloader.title()} 共暂停{len(torrents)}个种子"
-                        for torrent in torrents:
-                            if self._event.is_set():
-                                logger.info(f"自动删种服务停止")
-                                return
-                            text_item = f"{torrent.get('name')} " \
-                                        f"来自站点：{torrent.get('site')} " \
-                                        f"大小：{StringUtils.str_filesize(torrent.get('size'))}"
-                            # 暂停种子
-                            downlader_obj.stop_torrents(ids=[torrent.get("id")])
-                            logger.info(f"自动删种任务 暂停种子：{text_item}")
-                            message_text = f"{message_text}\n{text_item}"
+                        action_text, total_text = "暂停种子", "共暂停{}个种子"
                     elif self._action == "delete":
-                        message_text = f"{downloader.title()} 共删除{len(torrents)}个种子"
-                        for torrent in torrents:
-                            if self._event.is_set():
-                                logger.info(f"自动删种服务停止")
-                                return
-                            text_item = f"{torrent.get('name')} " \
-                                        f"来自站点：{torrent.get('site')} " \
-                                        f"大小：{StringUtils.str_filesize(torrent.get('size'))}"
-                            # 删除种子
-                            downlader_obj.delete_torrents(delete_file=False,
-                                                          ids=[torrent.get("id")])
-                            logger.info(f"自动删种任务 删除种子：{text_item}")
-                            message_text = f"{message_text}\n{text_item}"
+                        action_text, total_text = "删除种子", "共删除{}个种子"
                     elif self._action == "deletefile":
-                        message_text = f"{downloader.title()} 共删除{len(torrents)}个种子及文件"
-                        for torrent in torrents:
-                            if self._event.is_set():
-                                logger.info(f"自动删种服务停止")
-                                return
+                        action_text, total_text = "删除种子及文件", "共删除{}个种子及文件"
+                    else:
+                        continue
+                    # 按批次处理种子
+                    failed_torrents = []
+                    # 处理成功的种子明细
+                    text_items = []
+                    for i in range(0, len(torrents), self._batch_size):
+                        if self._event.is_set():
+                            logger.info(f"自动删种服务停止")
+                            return
+                        chunk = torrents[i:i + self._batch_size]
+                        chunk_failed = self.__process_torrents(downloader_obj=downlader_obj, torrents=chunk)
+                        failed_torrents.extend(chunk_failed)
+                        failed_ids = {torrent.get("id") for torrent in chunk_failed}
+                        for torrent in chunk:
+                            if torrent.get("id") in failed_ids:
+                                continue
                             text_item = f"{torrent.get('name')} " \
                                         f"来自站点：{torrent.get('site')} " \
                                         f"大小：{StringUtils.str_filesize(torrent.get('size'))}"
-                            # 删除种子
-                            downlader_obj.delete_torrents(delete_file=True,
-                                                          ids=[torrent.get("id")])
-                            logger.info(f"自动删种任务 删除种子及文件：{text_item}")
-                            message_text = f"{message_text}\n{text_item}"
-                    else:
-                        continue
+                            logger.info(f"自动删种任务 {action_text}：{text_item}")
+                            text_items.append(text_item)
+                    # 只统计实际处理成功的种子，逐个重试仍失败的种子单独列出
+                    message_text = "\n".join([f"{downloader.title()} {total_text.format(len(text_items))}"]
+                                              + text_items)
+                    if failed_torrents:
+                        logger.error(f"自动删种任务 {action_text}失败 {len(failed_torrents)} 个：" +
+                                     "，".join(f"{torrent.get('name')}" for torrent in failed_torrents))
+                        message_text = f"{message_text}\n{action_text}失败 {len(failed_torrents)} 个"
                     if torrents and message_text and self._notify:
                         self.post_message(
                             mtype=NotificationType.SiteMessage,
@@ -687,40 +750,63 @@ class TorrentRemover(_PluginBase):
             except Exception as e:
                 logger.error(f"自动删种任务异常：{str(e)}")
 
-    def __get_qb_torrent(self, torrent: Any) -> Optional[dict]:
+    def __process_torrents(self, downloader_obj: Any, torrents: List[dict]) -> List[dict]:
+        """
+        批量暂停或删除种子，批量处理失败时逐个重试，返回处理失败的种子
+        """
+        if not torrents:
+            return []
+        if self.__do_action(downloader_obj=downloader_obj, ids=[torrent.get("id") for torrent in torrents]):
+            return []
+        if len(torrents) == 1:
+            return torrents
+        logger.warning(f"自动删种任务 批量处理 {len(torrents)} 个种子失败，尝试逐个处理")
+        return [torrent for torrent in torrents
+                if not self.__do_action(downloader_obj=downloader_obj, ids=[torrent.get("id")])]
+
+    def __do_action(self, downloader_obj: Any, ids: List[str]) -> bool:
+        """
+        对下载器中的种子执行暂停或删除
+        """
+        try:
+            if self._action == "pause":
+                result = downloader_obj.stop_torrents(ids=ids)
+            else:
+                result = downloader_obj.delete_torrents(delete_file=self._action == "deletefile", ids=ids)
+        except Exception as e:
+            logger.error(f"自动删种任务 处理种子出错：{str(e)}")
+            return False
+        # 下载器未返回处理结果时视为成功
+        return result is not False
+
+    def __get_filter_plan(self) -> RemoveFilterPlan:
+        """
+        获取过滤条件，配置变更后重新解析
+        """
+        if not self._filter_plan:
+            self._filter_plan = RemoveFilterPlan(size=self._size, ratio=self._ratio, seeding_time=self._time,
+                                                 upspeed=self._upspeed, pathkeywords=self._pathkeywords,
+                                                 trackerkeywords=self._trackerkeywords,
+                                                 errorkeywords=self._errorkeywords,
+                                                 torrentstates=self._torrentstates,
+                                                 torrentcategorys=self._torrentcategorys)
+        return self._filter_plan
+
+    @staticmethod
+    def __get_qb_torrent(torrent: Any, plan: RemoveFilterPlan, date_now: int) -> Optional[dict]:
         """
         检查QB下载任务是否符合条件
         """
         # 完成时间
         date_done = torrent.completion_on if torrent.completion_on > 0 else torrent.added_on
-        # 现在时间
-        date_now = int(time.mktime(datetime.now().timetuple()))
         # 做种时间
         torrent_seeding_time = date_now - date_done if date_done else 0
         # 平均上传速度
         torrent_upload_avs = torrent.uploaded / torrent_seeding_time if torrent_seeding_time else 0
-        # 大小 单位：GB
-        sizes = self._size.split('-') if self._size else []
-        minsize = float(sizes[0]) * 1024 * 1024 * 1024 if sizes else 0
-        maxsize = float(sizes[-1]) * 1024 * 1024 * 1024 if sizes else 0
-        # 分享率
-        if self._ratio and torrent.ratio <= float(self._ratio):
-            return None
-        # 做种时间 单位：小时
-        if self._time and torrent_seeding_time <= float(self._time) * 3600:
-            return None
-        # 文件大小
-        if self._size and (torrent.size >= int(maxsize) or torrent.size <= int(minsize)):
-            return None
-        if self._upspeed and torrent_upload_avs >= float(self._upspeed) * 1024:
-            return None
-        if self._pathkeywords and not re.findall(self._pathkeywords, torrent.save_path, re.I):
+        if not plan.match(ratio=torrent.ratio, seeding_time=torrent_seeding_time, size=torrent.size,
+                          upload_avs=torrent_upload_avs, path=torrent.save_path, trackers=[torrent.tracker]):
             return None
-        if self._trackerkeywords and not re.findall(self._trackerkeywords, torrent.tracker, re.I):
-            return None
-        if self._torrentstates and torrent.state not in self._torrentstates:
-            return None
-        if self._torrentcategorys and (not torrent.category or torrent.category not in self._torrentcategorys):
+        if not plan.match_state(state=torrent.state, category=torrent.category):
             return None
         return {
             "id": torrent.hash,
@@ -729,47 +815,24 @@ class TorrentRemover(_PluginBase):
             "size": torrent.size
         }
 
-    def __get_tr_torrent(self, torrent: Any) -> Optional[dict]:
+    @staticmethod
+    def __get_tr_torrent(torrent: Any, plan: RemoveFilterPlan, date_now: int) -> Optional[dict]:
         """
         检查TR下载任务是否符合条件
         """
         # 完成时间
         date_done = torrent.date_done or torrent.date_added
-        # 现在时间
-        date_now = int(time.mktime(datetime.now().timetuple()))
         # 做种时间
         torrent_seeding_time = date_now - int(time.mktime(date_done.timetuple())) if date_done else 0
         # 上传量
         torrent_uploaded = torrent.ratio * torrent.total_size
         # 平均上传速茺
         torrent_upload_avs = torrent_uploaded / torrent_seeding_time if torrent_seeding_time else 0
-        # 大小 单位：GB
-        sizes = self._size.split('-') if self._size else []
-        minsize = float(sizes[0]) * 1024 * 1024 * 1024 if sizes else 0
-        maxsize = float(sizes[-1]) * 1024 * 1024 * 1024 if sizes else 0
-        # 分享率
-        if self._ratio and torrent.ratio <= float(self._ratio):
-            return None
-        if self._time and torrent_seeding_time <= float(self._time) * 3600:
-            return None
-        if self._size and (torrent.total_size >= int(maxsize) or torrent.total_size <= int(minsize)):
+        trackers = [tracker.get("announce", "") for tracker in torrent.trackers or []]
+        if not plan.match(ratio=torrent.ratio, seeding_time=torrent_seeding_time, size=torrent.total_size,
+                          upload_avs=torrent_upload_avs, path=torrent.download_dir, trackers=trackers):
             return None
-        if self._upspeed and torrent_upload_avs >= float(self._upspeed) * 1024:
-            return None
-        if self._pathkeywords and not re.findall(self._pathkeywords, torrent.download_dir, re.I):
-            return None
-        if self._trackerkeywords:
-            if not torrent.trackers:
-                return None
-            else:
-                tacker_key_flag = False
-                for tracker in torrent.trackers:
-                    if re.findall(self._trackerkeywords, tracker.get("announce", ""), re.I):
-                        tacker_key_flag = True
-                        break
-                if not tacker_key_flag:
-                    return None
-        if self._errorkeywords and not re.findall(self._errorkeywords, torrent.error_string, re.I):
+        if not plan.match_error(error_string=torrent.error_string):
             return None
         return {
             "id": torrent.hashString,
@@ -797,45 +860,46 @@ class TorrentRemover(_PluginBase):
         torrents, error_flag = downloader_obj.get_torrents(tags=tags or None)
         if error_flag:
             return []
-        # 处理种子
+        # 处理种子，过滤条件及当前时间在本次处理中只计算一次
+        plan = self.__get_filter_plan()
+        date_now = int(time.mktime(datetime.now().timetuple()))
         for torrent in torrents:
             if downloader_config.type == "qbittorrent":
-                item = self.__get_qb_torrent(torrent)
+                item = self.__get_qb_torrent(torrent, plan=plan, date_now=date_now)
             else:
-                item = self.__get_tr_torrent(torrent)
+                item = self.__get_tr_torrent(torrent, plan=plan, date_now=date_now)
             if not item:
                 continue
             remove_torrents.append(item)
-        # 处理辅种
+        # 处理辅种，按名称和大小建立索引，每个种子只需查找一次
         if self._samedata and remove_torrents:
-            remove_ids = [t.get("id") for t in remove_torrents]
+            remove_ids = {t.get("id") for t in remove_torrents}
+            is_qbittorrent = downloader_config.type == "qbittorrent"
+            sibling_index: Dict[Tuple[str, int], List[Any]] = {}
+            for torrent in torrents:
+                size = torrent.size if is_qbittorrent else torrent.total_size
+                sibling_index.setdefault((torrent.name, size), []).append(torrent)
             remove_torrents_plus = []
             for remove_torrent in remove_torrents:
-                name = remove_torrent.get("name")
-                size = remove_torrent.get("size")
-                for torrent in torrents:
-                    if downloader_config.type == "qbittorrent":
+                # 比对名称和大小
+                for torrent in sibling_index.get((remove_torrent.get("name"), remove_torrent.get("size")), []):
+                    if is_qbittorrent:
                         plus_id = torrent.hash
-                        plus_name = torrent.name
-                        plus_size = torrent.size
                         plus_site = StringUtils.get_url_sld(torrent.tracker)
                     else:
                         plus_id = torrent.hashString
-                        plus_name = torrent.name
-                        plus_size = torrent.total_size
                         plus_site = torrent.trackers[0].get("sitename") if torrent.trackers else ""
-                    # 比对名称和大小
-                    if plus_name == name \
-                            and plus_size == size \
-                            and plus_id not in remove_ids:
-                        remove_torrents_plus.append(
-                            {
-                                "id": plus_id,
-                                "name": plus_name,
-                                "site": plus_site,
-                                "size": plus_size
-                            }
-                        )
+                    if plus_id in remove_ids:
+                        continue
+                    remove_ids.add(plus_id)
+                    remove_torrents_plus.append(
+                        {
+                            "id": plus_id,
+                            "name": remove_torrent.get("name"),
+                            "site": plus_site,
+                            "size": remove_torrent.get("size")
+                        }
+                    )
             if remove_torrents_plus:
                 remove_torrents.extend(remove_torrents_plus)
         return remove_torrents
@@ -2,9 +2,11 @@ import datetime
 import re
 import shutil
 import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Set
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -21,10 +23,17 @@ from app.core.config import settings
 from app.core.context import MediaInfo
 from app.core.event import eventmanager, Event
 from app.core.metainfo import MetaInfoPath
+from app.db import SessionFactory
 from app.db.downloadhistory_oper import DownloadHistoryOper
+from app.db.models.transferhistory import TransferHistory
 from app.db.transferhistory_oper import TransferHistoryOper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.dirmonitor.dir_scanner import scan_media_dirs
+from app.plugins.dirmonitor.event_coalescer import EventCoalescer
+from app.plugins.dirmonitor.exclude_rules import ExcludeMatcher
+from app.plugins.dirmonitor.exists_cache import ExistsCache
+from app.plugins.dirmonitor.sync_checkpoint import SyncCheckpoint
 from app.schemas import NotificationType, TransferInfo
 from app.schemas.types import EventType, MediaType, SystemConfigKey
 from app.utils.string import StringUtils
@@ -60,7 +69,7 @@ class DirMonitor(_PluginBase):
     # 插件图标
     plugin_icon = "directory.png"
     # 插件版本
-    plugin_version = "2.4"
+    plugin_version = "2.7"
     # 插件作者
     plugin_author = "jxxghp"
     # 作者主页
@@ -98,6 +107,24 @@ class DirMonitor(_PluginBase):
     # 存储源目录转移方式
     _transferconf: Dict[str, Optional[str]] = {}
     _medias = {}
+    # 事件合并处理
+    _coalescer: Optional[EventCoalescer] = None
+    # 文件最后一次变化后等待稳定的时间（秒）
+    _debounce = 3
+    # 同时处理的目录数
+    _max_workers = 4
+    # 排除规则
+    _exclude_matcher: Optional[ExcludeMatcher] = None
+    # 整理历史查询缓存
+    _history_cache: Optional[ExistsCache] = None
+    # 整理历史查询缓存时间（秒）
+    _history_cache_ttl = 60
+    # 全量同步运行锁
+    _sync_lock = threading.Lock()
+    # 全量同步停止事件
+    _sync_event: Optional[threading.Event] = None
+    # 未完成的全量同步进度保留时间（小时），超过后重新开始
+    _sync_resume_hours = 72
     # 退出事件
     _event = threading.Event()
 
@@ -110,6 +137,8 @@ class DirMonitor(_PluginBase):
         # 清空配置
         self._dirconf = {}
         self._transferconf = {}
+        self._exclude_matcher = ExcludeMatcher()
+        self._history_cache = ExistsCache(ttl=self._history_cache_ttl)
 
         # 读取配置
         if config:
@@ -127,6 +156,8 @@ class DirMonitor(_PluginBase):
 
         # 停止现有任务
         self.stop_service()
+        # 停止正在运行的全量同步后再创建新的停止事件，之后的同步不受影响
+        self._sync_event = threading.Event()
 
         if self._enabled or self._onlyonce:
             # 定时服务管理器
@@ -138,6 +169,11 @@ class DirMonitor(_PluginBase):
             monitor_dirs = self._monitor_dirs.split("\n")
             if not monitor_dirs:
                 return
+            if self._enabled:
+                # 监控事件合并后按目录分组并发处理
+                self._coalescer = EventCoalescer(handler=self.__handle_file,
+                                                 debounce=self._debounce,
+                                                 max_workers=self._max_workers)
             for mon_path in monitor_dirs:
                 # 格式源目录:目的目录
                 if not mon_path:
@@ -265,14 +301,106 @@ class DirMonitor(_PluginBase):
     def sync_all(self):
         """
         立即运行一次，全量同步目录中所有文件
+        各监控目录并行遍历，按目录并发处理，按目录记录进度，中断后再次同步时跳过已完成的目录
         """
-        logger.info("开始全量同步监控目录 ...")
-        # 遍历所有监控目录
-        for mon_path in self._dirconf.keys():
-            # 遍历目录下所有文件
-            for file_path in SystemUtils.list_files(Path(mon_path), settings.RMT_MEDIAEXT):
-                self.__handle_file(event_path=str(file_path), mon_path=mon_path)
-        logger.info("全量同步监控目录完成！")
+        if not self._sync_lock.acquire(blocking=False):
+            logger.info("全量同步正在运行中")
+            return
+        try:
+            self.__sync_all()
+        finally:
+            self._sync_lock.release()
+
+    def __sync_all(self):
+        mon_paths = [mon_path for mon_path in self._dirconf.keys() if mon_path]
+        if not mon_paths:
+            return
+        stop_event = self._sync_event
+        checkpoint = SyncCheckpoint(self.get_data_path() / "sync_checkpoint.db",
+                                    expire_hours=self._sync_resume_hours)
+        started = checkpoint.begin()
+        if started:
+            logger.info(f"继续 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))} 开始的全量同步，"
+                        f"已完成 {len(checkpoint)} 个目录 ...")
+        else:
+            logger.info("开始全量同步监控目录 ...")
+        # 已整理的文件直接跳过，无需逐个查询
+        transferred = self.__load_transferred(mon_paths)
+        stats = {"dirs": 0, "resumed": 0, "files": 0, "skipped": 0}
+        stats_lock = threading.Lock()
+        # 限制已遍历未处理的目录数
+        semaphore = threading.BoundedSemaphore(self._max_workers * 2)
+
+        def sync_dir(mon_path: str, dir_path: str, mtime_ns: int, files: List[str]):
+            try:
+                failed = False
+                for file_path in files:
+                    if stop_event.is_set():
+                        return
+                    if self.__handle_file(event_path=file_path, mon_path=mon_path) is False:
+                        failed = True
+                # 有文件处理出错的目录不记录进度，继续同步时重新处理
+                if not failed:
+                    checkpoint.mark_done(dir_path, mtime_ns)
+            finally:
+                semaphore.release()
+
+        def scan_root(mon_path: str):
+            for dir_path, mtime_ns, files in scan_media_dirs(root=mon_path,
+                                                             extensions=settings.RMT_MEDIAEXT,
+                                                             is_ignored=self._exclude_matcher.is_ignored,
+                                                             stop_event=stop_event):
+                with stats_lock:
+                    stats["dirs"] += 1
+                    if checkpoint.is_done(dir_path, mtime_ns):
+                        stats["resumed"] += 1
+                        continue
+                    pending = [file_path for file_path in files if file_path not in transferred]
+                    stats["files"] += len(pending)
+                    stats["skipped"] += len(files) - len(pending)
+                if not pending:
+                    checkpoint.mark_done(dir_path, mtime_ns)
+                    continue
+                semaphore.acquire()
+                if stop_event.is_set():
+                    semaphore.release()
+                    return
+                executor.submit(sync_dir, mon_path, dir_path, mtime_ns, pending)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="DirMonitor-Sync") as executor:
+                with ThreadPoolExecutor(max_workers=len(mon_paths), thread_name_prefix="DirMonitor-Scan") as scanner:
+                    futures = {scanner.submit(scan_root, mon_path): mon_path for mon_path in mon_paths}
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f"遍历监控目录 {futures[future]} 出错：{str(e)} - {traceback.format_exc()}")
+        finally:
+            # 写入尚未保存的进度
+            checkpoint.flush()
+        if stop_event.is_set():
+            logger.info(f"全量同步已中断，已完成 {len(checkpoint)} 个目录，下次同步时继续")
+            return
+        checkpoint.finish()
+        logger.info(f"全量同步监控目录完成！共 {stats['dirs']} 个目录，其中 {stats['resumed']} 个目录上次已完成，"
+                    f"处理 {stats['files']} 个文件，跳过已整理的 {stats['skipped']} 个文件")
+
+    @staticmethod
+    def __load_transferred(mon_paths: List[str]) -> Set[str]:
+        """
+        一次性查询监控目录下已整理的源文件路径
+        """
+        transferred = set()
+        try:
+            with SessionFactory() as db:
+                for mon_path in mon_paths:
+                    # LIKE中的通配符只会多查出记录，按完整路径判断不受影响
+                    rows = db.query(TransferHistory.src).filter(TransferHistory.src.like(f"{mon_path}%")).all()
+                    transferred.update(src for src, in rows if src)
+        except Exception as e:
+            logger.warn(f"预加载整理历史失败，将逐个文件查询：{str(e)}")
+        return transferred
 
     def event_handler(self, event, mon_path: str, text: str, event_path: str):
         """
@@ -285,142 +413,140 @@ class DirMonitor(_PluginBase):
         if not event.is_directory:
             # 文件发生变化
             logger.debug("文件%s：%s" % (text, event_path))
-            self.__handle_file(event_path=event_path, mon_path=mon_path)
+            # 不是媒体文件不处理
+            if Path(event_path).suffix.casefold() not in map(str.casefold, settings.RMT_MEDIAEXT):
+                return
+            if self._coalescer:
+                self._coalescer.submit(file_path=event_path, mon_path=mon_path)
+            else:
+                self.__handle_file(event_path=event_path, mon_path=mon_path)
 
     def __handle_file(self, event_path: str, mon_path: str):
         """
         同步一个文件
         :param event_path: 事件文件路径
         :param mon_path: 监控目录
+        :return: 处理出错时返回False
         """
         file_path = Path(event_path)
         try:
             if not file_path.exists():
                 return
-            # 全程加锁
-            with lock:
-                transfer_history = self.transferhis.get_by_src(event_path)
-                if transfer_history:
-                    logger.debug("文件已处理过：%s" % event_path)
-                    return
 
-                # 回收站及隐藏的文件不处理
-                if event_path.find('/@Recycle/') != -1 \
-                        or event_path.find('/#recycle/') != -1 \
-                        or event_path.find('/.') != -1 \
-                        or event_path.find('/@eaDir') != -1:
-                    logger.debug(f"{event_path} 是回收站或隐藏的文件")
-                    return
-
-                # 命中过滤关键字不处理
-                if self._exclude_keywords:
-                    for keyword in self._exclude_keywords.split("\n"):
-                        if keyword and re.findall(keyword, event_path):
-                            logger.info(f"{event_path} 命中过滤关键字 {keyword}，不处理")
-                            return
-
-                # 整理屏蔽词不处理
-                transfer_exclude_words = self.systemconfig.get(SystemConfigKey.TransferExcludeWords)
-                if transfer_exclude_words:
-                    for keyword in transfer_exclude_words:
-                        if not keyword:
-                            continue
-                        if keyword and re.search(r"%s" % keyword, event_path, re.IGNORECASE):
-                            logger.info(f"{event_path} 命中整理屏蔽词 {keyword}，不处理")
-                            return
+            # 回收站及隐藏的文件不处理
+            if self._exclude_matcher.is_ignored(event_path):
+                logger.debug(f"{event_path} 是回收站或隐藏的文件")
+                return
 
-                # 不是媒体文件不处理
-                if file_path.suffix.casefold() not in map(str.casefold, settings.RMT_MEDIAEXT):
-                    logger.debug(f"{event_path} 不是媒体文件")
-                    return
+            # 命中过滤关键字及整理屏蔽词不处理，规则变化时才重新编译
+            self._exclude_matcher.update(exclude_keywords=self._exclude_keywords,
+                                         transfer_exclude_words=self.systemconfig.get(
+                                             SystemConfigKey.TransferExcludeWords))
+            exclude_reason = self._exclude_matcher.match(event_path)
+            if exclude_reason:
+                logger.info(f"{event_path} {exclude_reason}，不处理")
+                return
 
-                # 判断是不是蓝光目录
-                bluray_flag = False
-                if re.search(r"BDMV[/\\]STREAM", event_path, re.IGNORECASE):
-                    bluray_flag = True
-                    # 截取BDMV前面的路径
-                    blurray_dir = event_path[:event_path.find("BDMV")]
-                    file_path = Path(blurray_dir)
-                    logger.info(f"{event_path} 是蓝光目录，更正文件路径为：{str(file_path)}")
+            # 不是媒体文件不处理
+            if file_path.suffix.casefold() not in map(str.casefold, settings.RMT_MEDIAEXT):
+                logger.debug(f"{event_path} 不是媒体文件")
+                return
 
-                # 查询历史记录，已转移的不处理
-                if self.transferhis.get_by_src(str(file_path)):
-                    logger.info(f"{file_path} 已整理过")
-                    return
+            # 判断是不是蓝光目录
+            bluray_flag = False
+            if re.search(r"BDMV[/\\]STREAM", event_path, re.IGNORECASE):
+                bluray_flag = True
+                # 截取BDMV前面的路径
+                blurray_dir = event_path[:event_path.find("BDMV")]
+                file_path = Path(blurray_dir)
+                logger.info(f"{event_path} 是蓝光目录，更正文件路径为：{str(file_path)}")
+
+            # 查询历史记录，已转移的不处理
+            if self.__is_transferred(str(file_path)):
+                logger.info(f"{file_path} 已整理过")
+                return
 
-                # 元数据
-                file_meta = MetaInfoPath(file_path)
-                if not file_meta.name:
-                    logger.error(f"{file_path.name} 无法识别有效信息")
-                    return
+            # 元数据
+            file_meta = MetaInfoPath(file_path)
+            if not file_meta.name:
+                logger.error(f"{file_path.name} 无法识别有效信息")
+                return
 
-                # 判断文件大小
-                if self._size and float(self._size) > 0 and file_path.stat().st_size < float(self._size) * 1024 ** 3:
-                    logger.info(f"{file_path} 文件大小小于监控文件大小，不处理")
-                    return
+            # 判断文件大小
+            if self._size and float(self._size) > 0 and file_path.stat().st_size < float(self._size) * 1024 ** 3:
+                logger.info(f"{file_path} 文件大小小于监控文件大小，不处理")
+                return
 
-                # 查询转移目的目录
-                target: Path = self._dirconf.get(mon_path)
-                # 查询转移方式
-                transfer_type = self._transferconf.get(mon_path)
-
-                # 根据父路径获取下载历史
-                download_history = None
-                if bluray_flag:
-                    # 蓝光原盘，按目录名查询
-                    # FIXME 理论上DownloadHistory表中的path应该是全路径，但实际表中登记的数据只有目录名，暂按目录名查询
-                    download_history = self.downloadhis.get_by_path(file_path.name)
-                else:
-                    # 按文件全路径查询
-                    download_file = self.downloadhis.get_file_by_fullpath(str(file_path))
-                    if download_file:
-                        download_history = self.downloadhis.get_by_hash(download_file.download_hash)
-
-                # 识别媒体信息
-                if download_history and download_history.tmdbid:
-                    mediainfo: MediaInfo = self.mediaChain.recognize_media(mtype=MediaType(download_history.type),
-                                                                           tmdbid=download_history.tmdbid,
-                                                                           doubanid=download_history.doubanid)
-                else:
-                    mediainfo: MediaInfo = self.mediaChain.recognize_by_meta(file_meta)
-                if not mediainfo:
-                    logger.warn(f'未识别到媒体信息，标题：{file_meta.name}')
-                    # 新增转移成功历史记录
-                    his = self.transferhis.add_fail(
-                        src_path=file_path,
-                        mode=transfer_type,
-                        meta=file_meta
+            # 查询转移目的目录
+            target: Path = self._dirconf.get(mon_path)
+            # 查询转移方式
+            transfer_type = self._transferconf.get(mon_path)
+
+            # 根据父路径获取下载历史
+            download_history = None
+            if bluray_flag:
+                # 蓝光原盘，按目录名查询
+                # FIXME 理论上DownloadHistory表中的path应该是全路径，但实际表中登记的数据只有目录名，暂按目录名查询
+                download_history = self.downloadhis.get_by_path(file_path.name)
+            else:
+                # 按文件全路径查询
+                download_file = self.downloadhis.get_file_by_fullpath(str(file_path))
+                if download_file:
+                    download_history = self.downloadhis.get_by_hash(download_file.download_hash)
+
+            # 识别媒体信息
+            if download_history and download_history.tmdbid:
+                mediainfo: MediaInfo = self.mediaChain.recognize_media(mtype=MediaType(download_history.type),
+                                                                       tmdbid=download_history.tmdbid,
+                                                                       doubanid=download_history.doubanid)
+            else:
+                mediainfo: MediaInfo = self.mediaChain.recognize_by_meta(file_meta)
+            if not mediainfo:
+                logger.warn(f'未识别到媒体信息，标题：{file_meta.name}')
+                # 新增转移成功历史记录
+                his = self.transferhis.add_fail(
+                    src_path=file_path,
+                    mode=transfer_type,
+                    meta=file_meta
+                )
+                self._history_cache.discard(str(file_path))
+                if self._notify:
+                    self.post_message(
+                        mtype=NotificationType.Manual,
+                        title=f"{file_path.name} 未识别到媒体信息，无法入库！\n"
+                              f"回复：```\n/redo {his.id} [tmdbid]|[类型]\n``` 手动识别转移。"
                     )
-                    if self._notify:
-                        self.post_message(
-                            mtype=NotificationType.Manual,
-                            title=f"{file_path.name} 未识别到媒体信息，无法入库！\n"
-                                  f"回复：```\n/redo {his.id} [tmdbid]|[类型]\n``` 手动识别转移。"
-                        )
-                    return
+                return
 
-                # 如果未开启新增已入库媒体是否跟随TMDB信息变化则根据tmdbid查询之前的title
-                if not settings.SCRAP_FOLLOW_TMDB:
-                    transfer_history = self.transferhis.get_by_type_tmdbid(tmdbid=mediainfo.tmdb_id,
-                                                                           mtype=mediainfo.type.value)
-                    if transfer_history:
-                        mediainfo.title = transfer_history.title
-                logger.info(f"{file_path.name} 识别为：{mediainfo.type.value} {mediainfo.title_year}")
-
-                # 更新媒体图片
-                self.chain.obtain_images(mediainfo=mediainfo)
-
-                # 获取集数据
-                if mediainfo.type == MediaType.TV:
-                    episodes_info = self.tmdbchain.tmdb_episodes(tmdbid=mediainfo.tmdb_id,
-                                                                 season=file_meta.begin_season or 1)
-                else:
-                    episodes_info = None
+            # 如果未开启新增已入库媒体是否跟随TMDB信息变化则根据tmdbid查询之前的title
+            if not settings.SCRAP_FOLLOW_TMDB:
+                transfer_history = self.transferhis.get_by_type_tmdbid(tmdbid=mediainfo.tmdb_id,
+                                                                       mtype=mediainfo.type.value)
+                if transfer_history:
+                    mediainfo.title = transfer_history.title
+            logger.info(f"{file_path.name} 识别为：{mediainfo.type.value} {mediainfo.title_year}")
+
+            # 更新媒体图片
+            self.chain.obtain_images(mediainfo=mediainfo)
+
+            # 获取集数据
+            if mediainfo.type == MediaType.TV:
+                episodes_info = self.tmdbchain.tmdb_episodes(tmdbid=mediainfo.tmdb_id,
+                                                             season=file_meta.begin_season or 1)
+            else:
+                episodes_info = None
 
-                # 获取下载Hash
-                download_hash = None
-                if download_history:
-                    download_hash = download_history.download_hash
+            # 获取下载Hash
+            download_hash = None
+            if download_history:
+                download_hash = download_history.download_hash
+
+            # 转移及后续处理加锁，识别等耗时操作可并发执行
+            with lock:
+                # 识别期间可能已被其它线程或其它途径整理，不使用缓存，直接查询
+                if self.transferhis.get_by_src(str(file_path)):
+                    logger.info(f"{file_path} 已整理过")
+                    return
 
                 # 转移
                 transferinfo: TransferInfo = self.chain.transfer(mediainfo=mediainfo,
@@ -447,6 +573,7 @@ class DirMonitor(_PluginBase):
                             mediainfo=mediainfo,
                             transferinfo=transferinfo
                         )
+                        self._history_cache.discard(str(file_path))
                         return
 
                     # 转移失败
@@ -460,6 +587,7 @@ class DirMonitor(_PluginBase):
                         mediainfo=mediainfo,
                         transferinfo=transferinfo
                     )
+                    self._history_cache.discard(str(file_path))
                     if self._notify:
                         self.post_message(
                             mtype=NotificationType.Manual,
@@ -478,6 +606,7 @@ class DirMonitor(_PluginBase):
                     mediainfo=mediainfo,
                     transferinfo=transferinfo
                 )
+                self._history_cache.discard(str(file_path))
 
                 # 刮削单个文件
                 if self._scrape:
@@ -564,6 +693,18 @@ class DirMonitor(_PluginBase):
 
         except Exception as e:
             logger.error("目录监控发生错误：%s - %s" % (str(e), traceback.format_exc()))
+            return False
+
+    def __is_transferred(self, src_path: str) -> bool:
+        """
+        查询是否有整理历史，仅短期缓存没有整理历史的结果，删除整理历史后可立即重新整理
+        """
+        if self._history_cache.get(src_path) is False:
+            return False
+        exists = bool(self.transferhis.get_by_src(src_path))
+        if not exists:
+            self._history_cache.set(src_path, False)
+        return exists
 
     def send_msg(self):
         """
@@ -572,62 +713,63 @@ class DirMonitor(_PluginBase):
         if not self._medias or not self._medias.keys():
             return
 
-        # 遍历检查是否已刮削完，发送消息
-        for medis_title_year_season in list(self._medias.keys()):
-            media_list = self._medias.get(medis_title_year_season)
-            logger.info(f"开始处理媒体 {medis_title_year_season} 消息")
-
-            if not media_list:
-                continue
-
-            # 获取最后更新时间
-            last_update_time = media_list.get("time")
-            media_files = media_list.get("files")
-            if not last_update_time or not media_files:
-                continue
-
-            transferinfo = media_files[0].get("transferinfo")
-            file_meta = media_files[0].get("file_meta")
-            mediainfo = media_files[0].get("mediainfo")
-            # 判断剧集最后更新时间距现在是已超过10秒或者电影，发送消息
-            if (datetime.datetime.now() - last_update_time).total_seconds() > int(self._interval) \
-                    or mediainfo.type == MediaType.MOVIE:
-                # 发送通知
-                if self._notify:
+        # 遍历检查是否已刮削完，发送消息，与整理线程互斥
+        with lock:
+            for medis_title_year_season in list(self._medias.keys()):
+                media_list = self._medias.get(medis_title_year_season)
+                logger.info(f"开始处理媒体 {medis_title_year_season} 消息")
 
-                    # 汇总处理文件总大小
-                    total_size = 0
-                    file_count = 0
-
-                    # 剧集汇总
-                    episodes = []
-                    for file in media_files:
-                        transferinfo = file.get("transferinfo")
-                        total_size += transferinfo.total_size
-                        file_count += 1
-
-                        file_meta = file.get("file_meta")
-                        if file_meta and file_meta.begin_episode:
-                            episodes.append(file_meta.begin_episode)
-
-                    transferinfo.total_size = total_size
-                    # 汇总处理文件数量
-                    transferinfo.file_count = file_count
-
-                    # 剧集季集信息 S01 E01-E04 || S01 E01、E02、E04
-                    season_episode = None
-                    # 处理文件多，说明是剧集，显示季入库消息
-                    if mediainfo.type == MediaType.TV:
-                        # 季集文本
-                        season_episode = f"{file_meta.season} {StringUtils.format_ep(episodes)}"
-                    # 发送消息
-                    self.transferchian.send_transfer_message(meta=file_meta,
-                                                             mediainfo=mediainfo,
-                                                             transferinfo=transferinfo,
-                                                             season_episode=season_episode)
-                # 发送完消息，移出key
-                del self._medias[medis_title_year_season]
-                continue
+                if not media_list:
+                    continue
+
+                # 获取最后更新时间
+                last_update_time = media_list.get("time")
+                media_files = media_list.get("files")
+                if not last_update_time or not media_files:
+                    continue
+
+                transferinfo = media_files[0].get("transferinfo")
+                file_meta = media_files[0].get("file_meta")
+                mediainfo = media_files[0].get("mediainfo")
+                # 判断剧集最后更新时间距现在是已超过10秒或者电影，发送消息
+                if (datetime.datetime.now() - last_update_time).total_seconds() > int(self._interval) \
+                        or mediainfo.type == MediaType.MOVIE:
+                    # 发送通知
+                    if self._notify:
+
+                        # 汇总处理文件总大小
+                        total_size = 0
+                        file_count = 0
+
+                        # 剧集汇总
+                        episodes = []
+                        for file in media_files:
+                            transferinfo = file.get("transferinfo")
+                            total_size += transferinfo.total_size
+                            file_count += 1
+
+                            file_meta = file.get("file_meta")
+                            if file_meta and file_meta.begin_episode:
+                                episodes.append(file_meta.begin_episode)
+
+                        transferinfo.total_size = total_size
+                        # 汇总处理文件数量
+                        transferinfo.file_count = file_count
+
+                        # 剧集季集信息 S01 E01-E04 || S01 E01、E02、E04
+                        season_episode = None
+                        # 处理文件多，说明是剧集，显示季入库消息
+                        if mediainfo.type == MediaType.TV:
+                            # 季集文本
+                            season_episode = f"{file_meta.season} {StringUtils.format_ep(episodes)}"
+                        # 发送消息
+                        self.transferchian.send_transfer_message(meta=file_meta,
+                                                                 mediainfo=mediainfo,
+                                                                 transferinfo=transferinfo,
+                                                                 season_episode=season_episode)
+                    # 发送完消息，移出key
+                    del self._medias[medis_title_year_season]
+                    continue
 
     def get_state(self) -> bool:
         return self._enabled
@@ -1008,6 +1150,11 @@ class DirMonitor(_PluginBase):
                 except Exception as e:
                     print(str(e))
         self._observer = []
+        if self._sync_event:
+            self._sync_event.set()
+        if self._coalescer:
+            self._coalescer.stop()
+            self._coalescer = None
         if self._scheduler:
             self._scheduler.remove_all_jobs()
             if self._scheduler.running:
@@ -0,0 +1,57 @@
+import os
+import threading
+from typing import Callable, Iterator, List, Tuple
+
+from app.log import logger
+
+
+def scan_media_dirs(root: str, extensions: List[str],
+                    is_ignored: Callable[[str], bool] = None,
+                    stop_event: threading.Event = None) -> Iterator[Tuple[str, int, List[str]]]:
+    """
+    使用 os.scandir 逐个目录遍历，按目录返回直接包含的媒体文件，目录项自带文件类型，无需逐个文件stat
+    指向目录的符号链接同样进入，按 (设备号, inode) 去重避免循环
+    :param root: 根目录
+    :param extensions: 媒体文件扩展名
+    :param is_ignored: 判断路径是否忽略，忽略的目录不再进入
+    :param stop_event: 设置后停止遍历
+    :return: (目录路径, 目录修改时间, [媒体文件路径])，只返回包含媒体文件的目录
+    """
+    suffixes = {ext.casefold() for ext in extensions}
+    visited = set()
+    stack = [root]
+    while stack:
+        if stop_event and stop_event.is_set():
+            return
+        path = stack.pop()
+        try:
+            # 先获取修改时间再读取目录，读取期间的变化会使修改时间与记录的不一致
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warn(f"读取目录 {path} 失败：{str(e)}")
+            continue
+        if (stat.st_dev, stat.st_ino) in visited:
+            continue
+        visited.add((stat.st_dev, stat.st_ino))
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].casefold() in suffixes:
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warn(f"读取目录 {path} 失败：{str(e)}")
+            continue
+        if is_ignored:
+            subdirs = [subdir for subdir in subdirs if not is_ignored(subdir + os.sep)]
+        # 倒序入栈，按名称顺序遍历
+        stack.extend(sorted(subdirs, reverse=True))
+        if files:
+            yield path, stat.st_mtime_ns, sorted(files)
+
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.log import logger
+
+
+class PendingFile(object):
+    """
+    等待处理的文件
+    """
+    __slots__ = ("mon_path", "event_time", "size", "stable_time")
+
+    def __init__(self, mon_path: str, event_time: float, size: Optional[int]):
+        self.mon_path = mon_path
+        # 最后一次收到事件的时间
+        self.event_time = event_time
+        # 最后一次检查的文件大小
+        self.size = size
+        # 文件大小开始保持不变的时间
+        self.stable_time = event_time
+
+
+class EventCoalescer(object):
+    """
+    目录监控事件合并
+    - 同一文件的多次事件合并为一次
+    - 文件最后一次事件后等待 debounce 秒，且期间文件大小不变才处理，仍在变化时继续等待，避免处理未写完的文件
+    - 就绪的文件按所在目录分组，同一目录的文件在同一个线程中依次处理，不同目录并发处理
+    """
+
+    def __init__(self, handler: Callable[[str, str], None], debounce: float = 3, max_workers: int = 4,
+                 name: str = "DirMonitor"):
+        """
+        :param handler: 处理单个文件的方法，参数为 (文件路径, 监控目录)
+        :param debounce: 等待文件稳定的时间（秒）
+        :param max_workers: 同时处理的目录数
+        """
+        self._handler = handler
+        self._debounce = debounce
+        self._max_workers = max(1, max_workers)
+        self._lock = threading.Lock()
+        # 文件路径 -> 等待处理的文件
+        self._pending: Dict[str, PendingFile] = {}
+        # 正在处理的目录
+        self._active_dirs = set()
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix=f"{name}-Worker")
+        self._dispatcher = threading.Thread(target=self.__dispatch_loop, name=f"{name}-Dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, file_path: str, mon_path: str):
+        """
+        登记文件事件，重复的事件只刷新等待时间
+        """
+        now = time.time()
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            size = None
+        with self._lock:
+            pending = self._pending.get(file_path)
+            if pending:
+                pending.event_time = now
+            else:
+                self._pending[file_path] = PendingFile(mon_path=mon_path, event_time=now, size=size)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def stop(self):
+        """
+        停止处理，未就绪的文件不再处理
+        """
+        self._stop_event.set()
+        self._wakeup.set()
+        self._dispatcher.join(timeout=5)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._pending.clear()
+
+    def __dispatch_loop(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(timeout=min(1.0, self._debounce / 2 or 1.0))
+            self._wakeup.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.__dispatch()
+            except Exception as e:
+                logger.error(f"目录监控事件分发出错：{str(e)}")
+
+    def __dispatch(self):
+        """
+        检查等待中的文件，将已稳定的文件按目录分组提交处理
+        """
+        now = time.time()
+        with self._lock:
+            candidates = [(path, pending) for path, pending in self._pending.items()
+                          if now - pending.event_time >= self._debounce
+                          and os.path.dirname(path) not in self._active_dirs]
+        if not candidates:
+            return
+        groups: Dict[str, List[Tuple[str, str]]] = {}
+        for path, pending in candidates:
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                # 文件已不存在
+                with self._lock:
+                    if self._pending.get(path) is pending:
+                        self._pending.pop(path)
+                continue
+            if size != pending.size:
+                # 文件仍在写入，重新计时
+                pending.size = size
+                pending.stable_time = now
+                continue
+            if now - pending.stable_time < self._debounce:
+                continue
+            groups.setdefault(os.path.dirname(path), []).append((path, pending.mon_path))
+        if not groups:
+            return
+        with self._lock:
+            for parent, files in groups.items():
+                if len(self._active_dirs) >= self._max_workers:
+                    # 线程已满，剩余的目录等待下次分发
+                    break
+                # 分发前又收到事件的文件，等待下一次检查
+                files = [(path, mon_path) for path, mon_path in files
+                         if self._pending.get(path) and now - self._pending[path].event_time >= self._debounce]
+                if not files:
+                    continue
+                for path, _ in files:
+                    self._pending.pop(path, None)
+                self._active_dirs.add(parent)
+                self._executor.submit(self.__process_group, parent, sorted(files))
+
+    def __process_group(self, parent: str, files: List[Tuple[str, str]]):
+        """
+        依次处理同一目录下的文件
+        """
+        try:
+            for path, mon_path in files:
+                if self._stop_event.is_set():
+                    return
+                try:
+                    self._handler(path, mon_path)
+                except Exception as e:
+                    logger.error(f"处理文件 {path} 出错：{str(e)}")
+        finally:
+            with self._lock:
+                self._active_dirs.discard(parent)
+            self._wakeup.set()
@@ -0,0 +1,81 @@
+import re
+import threading
+from typing import Iterable, List, Optional, Pattern, Tuple
+
+from app.log import logger
+
+
+class ExcludeMatcher(object):
+    """
+    文件排除规则，过滤关键字及整理屏蔽词分别合并编译为一个正则，规则未变化时不重新编译
+    未命中时只需各执行一次匹配，命中后再逐个查找具体命中的规则用于日志输出
+    """
+    # 回收站及隐藏的文件
+    _ignore_parts = ('/@Recycle/', '/#recycle/', '/.', '/@eaDir')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[str, Tuple[str, ...]]] = None
+        # (规则名称, 合并后的正则, [(规则, 正则)])
+        self._rules: List[Tuple[str, Optional[Pattern], List[Tuple[str, Pattern]]]] = []
+
+    def update(self, exclude_keywords: str, transfer_exclude_words: Optional[Iterable[str]]):
+        """
+        更新规则，与上次相同时不重新编译
+        :param exclude_keywords: 过滤关键字，每行一个，区分大小写
+        :param transfer_exclude_words: 整理屏蔽词，忽略大小写
+        """
+        key = (exclude_keywords or "", tuple(transfer_exclude_words or ()))
+        if key == self._key:
+            return
+        with self._lock:
+            if key == self._key:
+                return
+            self._rules = [
+                ("过滤关键字", *self.__compile(key[0].split("\n"), 0)),
+                ("整理屏蔽词", *self.__compile(key[1], re.IGNORECASE))
+            ]
+            self._key = key
+
+    @staticmethod
+    def __compile(keywords: Iterable[str], flags: int) -> Tuple[Optional[Pattern], List[Tuple[str, Pattern]]]:
+        """
+        逐个编译规则，跳过无效的正则，再合并为一个正则；含有反向引用等无法合并时逐个匹配
+        """
+        patterns = []
+        for keyword in keywords:
+            if not keyword:
+                continue
+            try:
+                patterns.append((keyword, re.compile(keyword, flags)))
+            except re.error as e:
+                logger.warn(f"排除规则 {keyword} 不是有效的正则表达式：{str(e)}")
+        if not patterns:
+            return None, []
+        # 合并后分组序号会变化，含有反向引用的规则不能合并
+        if any(re.search(r"\\[1-9]|\(\?P=", keyword) for keyword, _ in patterns):
+            return None, patterns
+        try:
+            combined = re.compile("|".join(f"(?:{keyword})" for keyword, _ in patterns), flags)
+        except re.error:
+            combined = None
+        return combined, patterns
+
+    def is_ignored(self, path: str) -> bool:
+        """
+        是否为回收站或隐藏的文件
+        """
+        return any(part in path for part in self._ignore_parts)
+
+    def match(self, path: str) -> Optional[str]:
+        """
+        判断路径是否命中过滤关键字或整理屏蔽词
+        :return: 命中的规则，未命中时返回None
+        """
+        for name, combined, patterns in self._rules:
+            if combined is not None and not combined.search(path):
+                continue
+            for keyword, pattern in patterns:
+                if pattern.search(path):
+                    return f"命中{name} {keyword}"
+        return None
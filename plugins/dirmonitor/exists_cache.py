@@ -0,0 +1,41 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ExistsCache(object):
+    """
+    整理历史是否存在的短期缓存，事件风暴时同一路径只查询一次数据库
+    本插件新增整理历史时同步清除缓存，其它途径产生的变化在缓存过期后生效
+    """
+
+    def __init__(self, ttl: float = 60, max_size: int = 10000):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bool]:
+        """
+        获取缓存的结果，未缓存或已过期时返回None
+        """
+        item = self._items.get(key)
+        if item is None or time.time() - item[1] >= self._ttl:
+            return None
+        return item[0]
+
+    def set(self, key: str, exists: bool):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (exists, time.time())
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,116 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class SyncCheckpoint(object):
+    """
+    全量同步进度，按目录记录已处理完成的目录及其修改时间
+    同步中断后再次同步时跳过已完成且修改时间未变化的目录，全部完成后清空
+    完成的目录先在内存中累积，达到一定数量或间隔后批量写入，避免每个目录提交一次事务
+    """
+
+    def __init__(self, db_path: Path, expire_hours: float = 72, flush_size: int = 500, flush_interval: float = 30):
+        """
+        :param db_path: 数据库文件路径
+        :param expire_hours: 未完成的同步进度保留时间，超过后重新开始
+        :param flush_size: 累积多少个完成的目录后写入
+        :param flush_interval: 距上次写入超过多少秒后写入
+        """
+        self._db_path = db_path
+        self._expire_seconds = expire_hours * 3600
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._lock = threading.RLock()
+        # 目录 -> 修改时间
+        self._done: Dict[str, int] = {}
+        # 尚未写入的完成目录
+        self._pending: Dict[str, int] = {}
+        self._flush_time = time.time()
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self):
+        with self._lock, closing(sqlite3.connect(str(self._db_path), timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def __init_db(self):
+        Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS done_dirs (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL
+                )
+            """)
+
+    def begin(self) -> Optional[float]:
+        """
+        开始同步，存在未过期的未完成进度时继续，否则重新开始
+        :return: 继续的同步的开始时间，重新开始时返回None
+        """
+        with self.__connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'started'").fetchone()
+            started = float(row[0]) if row else None
+            self._pending = {}
+            self._flush_time = time.time()
+            if started and time.time() - started < self._expire_seconds:
+                self._done = dict(conn.execute("SELECT path, mtime_ns FROM done_dirs"))
+                return started
+            conn.execute("DELETE FROM done_dirs")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('started', ?)", (str(time.time()),))
+            self._done = {}
+            return None
+
+    def is_done(self, path: str, mtime_ns: int) -> bool:
+        """
+        目录是否已处理完成且之后没有变化
+        """
+        return self._done.get(path) == mtime_ns
+
+    def mark_done(self, path: str, mtime_ns: int):
+        """
+        记录目录已处理完成，累积到一定数量或间隔后批量写入
+        """
+        with self._lock:
+            self._done[path] = mtime_ns
+            self._pending[path] = mtime_ns
+            if len(self._pending) < self._flush_size and time.time() - self._flush_time < self._flush_interval:
+                return
+            self.flush()
+
+    def flush(self):
+        """
+        写入尚未保存的完成目录
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            with self.__connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO done_dirs (path, mtime_ns) VALUES (?, ?)",
+                                 list(self._pending.items()))
+            self._pending = {}
+            self._flush_time = time.time()
+
+    def finish(self):
+        """
+        同步全部完成，清空进度
+        """
+        with self.__connect() as conn:
+            conn.execute("DELETE FROM done_dirs")
+            conn.execute("DELETE FROM meta WHERE key = 'started'")
+            self._done = {}
+            self._pending = {}
+
+    def __len__(self):
+        return len(self._done)
@@ -2,14 +2,17 @@ import os
 import threading
 import time
 import traceback
+from collections import deque
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Callable, Optional
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 from app.db.transferhistory_oper import TransferHistoryOper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.removelink.inode_index import InodeIndex, InodeKey
+from app.plugins.removelink.inode_snapshot import InodeSnapshot
 from app.schemas import NotificationType
 from app.core.event import eventmanager
 from app.schemas.types import EventType
@@ -17,6 +20,14 @@ from app.schemas.types import EventType
 state_lock = threading.Lock()
 
 
+def get_inode(path: str) -> InodeKey:
+    """
+    获取文件的设备号及inode
+    """
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino
+
+
 class FileMonitorHandler(FileSystemEventHandler):
     """
     目录监控处理
@@ -40,11 +51,7 @@ class FileMonitorHandler(FileSystemEventHandler):
                     logger.info(f"{file_path} 命中过滤关键字 {keyword}，不处理")
                     return
         # 新增文件记录
-        with state_lock:
-            try:
-                self.sync.state_set[str(file_path)] = file_path.stat().st_ino
-            except Exception as e:
-                logger.error(f"新增文件记录失败：{str(e)}")
+        self.sync.submit_event(self.sync.add_file, str(file_path))
 
     def on_moved(self, event):
         if event.is_directory:
@@ -58,9 +65,8 @@ class FileMonitorHandler(FileSystemEventHandler):
                 if keyword and keyword in str(file_path):
                     logger.info(f"{file_path} 命中过滤关键字 {keyword}，不处理")
                     return
-        # 新增文件记录
-        with state_lock:
-            self.sync.state_set[str(file_path)] = file_path.stat().st_ino
+        # 移动文件记录
+        self.sync.submit_event(self.sync.move_file, event.src_path, str(file_path))
 
     def on_deleted(self, event):
         file_path = Path(event.src_path)
@@ -83,31 +89,34 @@ class FileMonitorHandler(FileSystemEventHandler):
                     logger.info(f"{file_path} 命中过滤关键字 {keyword}，不处理")
                     return
         # 删除硬链接文件
-        self.sync.handle_deleted(file_path)
+        self.sync.submit_event(self.sync.handle_deleted, file_path)
 
 
-def updateState(monitor_dirs: List[str]):
+def updateState(monitor_dirs: List[str]) -> InodeIndex:
     """
-    更新监控目录的文件列表
+    完整遍历监控目录，更新文件列表
     """
     # 记录开始时间
     start_time = time.time()
-    state_set = {}
+    inode_index = InodeIndex()
     for mon_path in monitor_dirs:
+        if not mon_path:
+            continue
         for root, dirs, files in os.walk(mon_path):
             for file in files:
-                file = Path(root) / file
-                if not file.exists():
+                file = os.path.join(root, file)
+                try:
+                    # 记录文件inode
+                    inode_index.add(file, get_inode(file))
+                except OSError:
                     continue
-                # 记录文件inode
-                state_set[str(file)] = file.stat().st_ino
     # 记录结束时间
     end_time = time.time()
     # 计算耗时
     elapsed_time = end_time - start_time
-    logger.info(f"更新文件列表完成，共计{len(state_set)}个文件，耗时：{elapsed_time}秒")
+    logger.info(f"更新文件列表完成，共计{len(inode_index)}个文件，耗时：{elapsed_time}秒")
 
-    return state_set
+    return inode_index
 
 
 class RemoveLink(_PluginBase):
@@ -118,7 +127,7 @@ class RemoveLink(_PluginBase):
     # 插件图标
     plugin_icon = "Ombi_A.png"
     # 插件版本
-    plugin_version = "2.2"
+    plugin_version = "2.4"
     # 插件作者
     plugin_author = "DzAvril"
     # 作者主页
@@ -141,8 +150,18 @@ class RemoveLink(_PluginBase):
     _delete_history = False
     _transferhistory = None
     _observer = []
-    # 监控目录的文件列表
-    state_set: Dict[str, int] = {}
+    # 监控目录的文件索引
+    inode_index: InodeIndex = InodeIndex()
+    # 文件索引快照
+    _snapshot: Optional[InodeSnapshot] = None
+    # 刷新文件索引期间的监控事件，刷新完成后依次处理
+    _pending_events = deque()
+    _refreshing = False
+    _refresh_lock = threading.Lock()
+    # 刷新批次，插件重新初始化后旧的刷新结果不再使用
+    _refresh_id = 0
+    # 刷新时发现已不存在的文件，用于处理刷新期间的删除事件
+    _vanished: Dict[str, InodeKey] = {}
 
     def init_plugin(self, config: dict = None):
         logger.info(f"Hello, RemoveLink! config {config}")
@@ -166,6 +185,11 @@ class RemoveLink(_PluginBase):
             logger.info(f"监控目录：{monitor_dirs}")
             if not monitor_dirs:
                 return
+            # 刷新完成前的监控事件先排队
+            with self._refresh_lock:
+                self._refreshing = True
+                self._pending_events = deque()
+                self._refresh_id += 1
             for mon_path in monitor_dirs:
                 # 格式源目录:目的目录
                 if not mon_path:
@@ -183,9 +207,79 @@ class RemoveLink(_PluginBase):
                     err_msg = str(e)
                     logger.error(f"{mon_path} 启动目录监控失败：{err_msg}")
                     self.systemmessage.put(f"{mon_path} 启动目录监控失败：{err_msg}", title="清理硬链接")
-            # 更新监控集合
-            with state_lock:
-                self.state_set = updateState(monitor_dirs)
+            # 后台增量刷新监控集合
+            if not self._snapshot:
+                self._snapshot = InodeSnapshot(self.get_data_path() / "inode_snapshot.db")
+            threading.Thread(target=self.refresh_state, args=(monitor_dirs, self._refresh_id), daemon=True).start()
+
+    def refresh_state(self, monitor_dirs: List[str], refresh_id: int):
+        """
+        根据快照增量刷新监控目录的文件索引，刷新失败时完整遍历，完成后处理排队的监控事件
+        """
+        start_time = time.time()
+        vanished = {}
+        try:
+            inode_index, vanished, stats = self._snapshot.refresh(
+                monitor_dirs, is_current=lambda: refresh_id == self._refresh_id)
+            logger.info(f"更新文件列表完成，共计{stats.get('files')}个文件，{stats.get('dirs')}个目录，"
+                        f"其中{stats.get('rescanned')}个目录有变化，耗时：{time.time() - start_time}秒")
+        except Exception as e:
+            logger.error(f"增量更新文件列表失败：{str(e)}，开始完整更新")
+            self._snapshot.clear()
+            inode_index = updateState(monitor_dirs)
+        with self._refresh_lock:
+            if refresh_id != self._refresh_id:
+                return
+            self.inode_index, self._vanished = inode_index, vanished
+        # 处理刷新期间排队的事件，处理期间新产生的事件继续排队，保证顺序
+        while True:
+            with self._refresh_lock:
+                if refresh_id != self._refresh_id:
+                    return
+                if not self._pending_events:
+                    self._refreshing = False
+                    self._vanished = {}
+                    break
+                events = list(self._pending_events)
+                self._pending_events.clear()
+            logger.info(f"处理刷新期间的监控事件：{len(events)}个")
+            for func, args in events:
+                self.__run_event(func, *args)
+
+    def submit_event(self, func: Callable, *args):
+        """
+        处理监控事件，文件索引刷新期间事件排队等待
+        """
+        with self._refresh_lock:
+            if self._refreshing:
+                self._pending_events.append((func, args))
+                return
+        self.__run_event(func, *args)
+
+    @staticmethod
+    def __run_event(func: Callable, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"处理监控事件失败：{str(e)} - {traceback.format_exc()}")
+
+    def add_file(self, path: str):
+        """
+        新增文件记录
+        """
+        try:
+            self.inode_index.add(path, get_inode(path))
+        except Exception as e:
+            logger.error(f"新增文件记录失败：{str(e)}")
+
+    def move_file(self, src_path: str, dest_path: str):
+        """
+        移动文件记录
+        """
+        try:
+            self.inode_index.move(src_path, dest_path, get_inode(dest_path))
+        except Exception as e:
+            logger.error(f"新增文件记录失败：{str(e)}")
 
     def __update_config(self):
         """
@@ -557,39 +651,47 @@ class RemoveLink(_PluginBase):
             # 删除历史记录
             self.delete_history(str(file_path))
             # 删除的文件inode
-            deleted_inode = self.state_set.get(str(file_path))
+            deleted_inode = self.inode_index.remove(str(file_path)) or self._vanished.pop(str(file_path), None)
             if not deleted_inode:
                 logger.info(f"文件 {file_path} 未在监控列表中，不处理")
                 return
-            else:
-                self.state_set.pop(str(file_path))
             try:
-                # 在current_set中查找与deleted_inode有相同inode的文件并删除
-                for path, inode in self.state_set.copy().items():
-                    if inode == deleted_inode:
-                        file = Path(path)
-                        if self.__is_excluded(file):
-                            logger.info(f"文件 {file} 在不删除目录中，不处理")
-                            continue
-                        # 删除硬链接文件
-                        logger.info(f"删除硬链接文件：{path}， inode: {inode}")
-                        file.unlink()
-                        # 清理刮削文件
-                        self.delete_scrap_infos(file_path)
-                        if self._delete_torrents:
-                            # 发送事件
-                            eventmanager.send_event(
-                                EventType.DownloadFileDeleted, {"src": str(file_path)}
-                            )
-                        # 删除历史记录
-                        self.delete_history(str(file_path))
-                        if self._notify:
-                            self.post_message(
-                                mtype=NotificationType.SiteMessage,
-                                title=f"【清理硬链接】",
-                                text=f"监控到删除源文件：[{file_path}]\n"
-                                     f"同步删除硬链接文件：[{path}]",
-                            )
+                # 通过inode索引查找与删除文件硬链接的其它文件并删除
+                for path in self.inode_index.get_paths(deleted_inode):
+                    file = Path(path)
+                    if self.__is_excluded(file):
+                        logger.info(f"文件 {file} 在不删除目录中，不处理")
+                        continue
+                    # 索引中的inode可能已过期，删除前重新确认仍是同一个文件，避免inode被复用时误删其它文件
+                    try:
+                        current_inode = get_inode(path)
+                    except OSError:
+                        self.inode_index.remove(path)
+                        continue
+                    if current_inode != deleted_inode:
+                        logger.warn(f"文件 {path} 的inode已变化，不是删除文件的硬链接，不处理")
+                        self.inode_index.add(path, current_inode)
+                        continue
+                    # 删除硬链接文件
+                    logger.info(f"删除硬链接文件：{path}， inode: {deleted_inode[1]}")
+                    file.unlink()
+                    self.inode_index.remove(path)
+                    # 清理刮削文件
+                    self.delete_scrap_infos(file_path)
+                    if self._delete_torrents:
+                        # 发送事件
+                        eventmanager.send_event(
+                            EventType.DownloadFileDeleted, {"src": str(file_path)}
+                        )
+                    # 删除历史记录
+                    self.delete_history(str(file_path))
+                    if self._notify:
+                        self.post_message(
+                            mtype=NotificationType.SiteMessage,
+                            title=f"【清理硬链接】",
+                            text=f"监控到删除源文件：[{file_path}]\n"
+                                 f"同步删除硬链接文件：[{path}]",
+                        )
             except Exception as e:
                 logger.error(
                     "删除硬链接文件发生错误：%s - %s" % (str(e), traceback.format_exc())
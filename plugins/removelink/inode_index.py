@@ -0,0 +1,67 @@
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+# 文件标识，(设备号, inode)，不同设备上的inode可能相同
+InodeKey = Tuple[int, int]
+
+
+class InodeIndex(object):
+    """
+    监控目录的文件索引，同时维护 路径 -> inode 及 inode -> 路径集合，
+    查找与某个文件硬链接的其它文件时无需遍历全部文件
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths: Dict[str, InodeKey] = {}
+        self._inodes: Dict[InodeKey, Set[str]] = {}
+
+    def add(self, path: str, inode: InodeKey):
+        """
+        新增或更新文件记录
+        """
+        with self._lock:
+            self.__remove(path)
+            self._paths[path] = inode
+            self._inodes.setdefault(inode, set()).add(path)
+
+    def remove(self, path: str) -> Optional[InodeKey]:
+        """
+        删除文件记录，返回文件原来的inode
+        """
+        with self._lock:
+            return self.__remove(path)
+
+    def move(self, src_path: str, dest_path: str, inode: InodeKey):
+        """
+        文件移动或重命名
+        """
+        with self._lock:
+            self.__remove(src_path)
+            self.__remove(dest_path)
+            self._paths[dest_path] = inode
+            self._inodes.setdefault(inode, set()).add(dest_path)
+
+    def __remove(self, path: str) -> Optional[InodeKey]:
+        inode = self._paths.pop(path, None)
+        if inode is None:
+            return None
+        paths = self._inodes.get(inode)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                del self._inodes[inode]
+        return inode
+
+    def get(self, path: str) -> Optional[InodeKey]:
+        return self._paths.get(path)
+
+    def get_paths(self, inode: InodeKey) -> Set[str]:
+        """
+        获取inode对应的全部文件路径
+        """
+        with self._lock:
+            return set(self._inodes.get(inode) or ())
+
+    def __len__(self):
+        return len(self._paths)
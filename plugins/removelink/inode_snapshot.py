@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.log import logger
+from app.plugins.removelink.inode_index import InodeIndex
+
+
+class DirRecord(object):
+    """
+    单个目录的扫描结果，只记录直接包含的文件及子目录
+    """
+    __slots__ = ("mtime_ns", "files", "subdirs")
+
+    def __init__(self, mtime_ns: int, files: Dict[str, Tuple[int, int]], subdirs: List[str]):
+        # 目录修改时间，目录内新增、删除、重命名文件或子目录时会变化
+        self.mtime_ns = mtime_ns
+        # 文件名 -> (设备号, inode)
+        self.files = files
+        # 子目录名
+        self.subdirs = subdirs
+
+
+class InodeSnapshot(object):
+    """
+    监控目录的inode快照，按目录保存到数据库
+    刷新时逐个比较目录修改时间，只重新读取发生变化的目录，未变化的目录直接使用快照中的文件记录
+    快照中的inode可能与实际不一致（如恢复目录修改时间的同步工具），删除文件前需重新确认
+    """
+    # 修改时间距扫描时间过近的目录，同一时间精度内可能还会变化，下次刷新时重新读取
+    _mtime_guard_ns = 2 * 10 ** 9
+
+    def __init__(self, db_path: Path):
+        self._db_path = db_path
+        self._lock = threading.RLock()
+        # 同一时间只执行一次刷新，避免并发刷新读取相同的快照后相互覆盖
+        self._refresh_lock = threading.Lock()
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self):
+        with self._lock, closing(sqlite3.connect(str(self._db_path), timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def __init_db(self):
+        Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS dirs (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    files TEXT NOT NULL,
+                    subdirs TEXT NOT NULL
+                )
+            """)
+            # 监控目录所在的设备号，重新挂载等导致设备号变化时，该目录的快照失效
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS roots (
+                    path TEXT PRIMARY KEY,
+                    dev INTEGER NOT NULL
+                )
+            """)
+
+    def __load(self) -> Tuple[Dict[str, DirRecord], Dict[str, int]]:
+        records = {}
+        with self.__connect() as conn:
+            roots = dict(conn.execute("SELECT path, dev FROM roots"))
+            for path, mtime_ns, files, subdirs in conn.execute("SELECT path, mtime_ns, files, subdirs FROM dirs"):
+                records[path] = DirRecord(mtime_ns=mtime_ns,
+                                          files={name: tuple(inode) for name, inode in json.loads(files).items()},
+                                          subdirs=json.loads(subdirs))
+        return records, roots
+
+    def __save(self, changed: Dict[str, DirRecord], removed: Iterable[str], roots: Dict[str, int]):
+        with self.__connect() as conn:
+            conn.execute("DELETE FROM roots")
+            conn.executemany("INSERT INTO roots (path, dev) VALUES (?, ?)", list(roots.items()))
+            conn.executemany("DELETE FROM dirs WHERE path = ?", [(path,) for path in removed])
+            conn.executemany("INSERT OR REPLACE INTO dirs (path, mtime_ns, files, subdirs) VALUES (?, ?, ?, ?)",
+                             [(path, record.mtime_ns, json.dumps(record.files, ensure_ascii=False),
+                               json.dumps(record.subdirs, ensure_ascii=False))
+                              for path, record in changed.items()])
+
+    def clear(self):
+        with self.__connect() as conn:
+            conn.execute("DELETE FROM dirs")
+            conn.execute("DELETE FROM roots")
+
+    def __scan_dir(self, path: str, mtime_ns: int, scan_time_ns: int) -> Optional[DirRecord]:
+        """
+        读取目录，获取直接包含的文件inode及子目录，不进入符号链接目录
+        """
+        files = {}
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_dir():
+                            # 指向目录的符号链接
+                            continue
+                        else:
+                            stat = entry.stat()
+                            files[entry.name] = (stat.st_dev, stat.st_ino)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warn(f"读取目录 {path} 失败：{str(e)}")
+            return None
+        if scan_time_ns - mtime_ns < self._mtime_guard_ns:
+            mtime_ns = -1
+        return DirRecord(mtime_ns=mtime_ns, files=files, subdirs=subdirs)
+
+    def refresh(self, monitor_dirs: List[str],
+                is_current: Callable[[], bool] = None) -> Tuple[InodeIndex, Dict[str, Tuple[int, int]], Dict[str, int]]:
+        """
+        增量刷新监控目录的文件索引，并保存快照
+        :param is_current: 保存快照前调用，返回False时说明已有更新的刷新，不再保存
+        :return: 文件索引，快照中有但已不存在的文件 {路径: inode}，统计信息
+        """
+        with self._refresh_lock:
+            return self.__refresh(monitor_dirs=monitor_dirs, is_current=is_current)
+
+    def __refresh(self, monitor_dirs: List[str],
+                  is_current: Callable[[], bool] = None) -> Tuple[InodeIndex, Dict[str, Tuple[int, int]], Dict[str, int]]:
+        records, saved_roots = self.__load()
+        roots = {}
+        discarded = set()
+        for mon_path in monitor_dirs:
+            if not mon_path:
+                continue
+            try:
+                roots[mon_path] = os.stat(mon_path).st_dev
+            except OSError:
+                # 暂时无法访问，保留原设备号
+                if mon_path in saved_roots:
+                    roots[mon_path] = saved_roots[mon_path]
+                continue
+            if mon_path in saved_roots and saved_roots[mon_path] != roots[mon_path]:
+                # 设备号变化，快照中的inode不再可信，丢弃该目录的快照重新读取
+                logger.info(f"监控目录 {mon_path} 设备号发生变化，重新读取全部文件")
+                prefix = os.path.join(mon_path, "")
+                for path in [path for path in records if path == mon_path or path.startswith(prefix)]:
+                    records.pop(path)
+                    discarded.add(path)
+        scan_time_ns = time.time_ns()
+        index = InodeIndex()
+        vanished: Dict[str, Tuple[int, int]] = {}
+        changed: Dict[str, DirRecord] = {}
+        visited = set()
+        stats = {"dirs": 0, "rescanned": 0, "files": 0}
+        stack = [mon_path for mon_path in monitor_dirs if mon_path]
+        while stack:
+            path = stack.pop()
+            if path in visited:
+                continue
+            try:
+                # 先获取修改时间再读取目录，读取期间发生的变化在下次刷新时处理
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            record = records.get(path)
+            if not record or record.mtime_ns != mtime_ns:
+                new_record = self.__scan_dir(path, mtime_ns, scan_time_ns)
+                if new_record is None:
+                    continue
+                if record:
+                    vanished.update((os.path.join(path, name), inode) for name, inode in record.files.items()
+                                    if name not in new_record.files)
+                record = changed[path] = new_record
+                stats["rescanned"] += 1
+            visited.add(path)
+            stats["dirs"] += 1
+            for name, inode in record.files.items():
+                index.add(os.path.join(path, name), inode)
+            stack.extend(os.path.join(path, name) for name in record.subdirs)
+        stats["files"] = len(index)
+        # 已删除的目录
+        for path in records.keys() - visited:
+            vanished.update((os.path.join(path, name), inode) for name, inode in records[path].files.items())
+        if is_current is None or is_current():
+            self.__save(changed=changed, removed=(records.keys() | discarded) - visited, roots=roots)
+        return index, vanished, stats